@@ -0,0 +1,453 @@
+"""本地模拟的飞书开放平台，仅实现 FeishuClient 用到的接口，用于基准测试
+
+支持可调的接口延迟、导入任务耗时(含"任务成功但 token 尚未就绪"的情况)、限流和随机失败注入。
+导入任务的成功状态沿用 FeishuClient 的约定(job_status == 2)。
+"""
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 导入任务为每个图片语法(包括远程图片)生成一个图片块
+_IMAGE_RE = re.compile(rb'!\[[^\]]*\]\(\s*[^)\s]+')
+
+
+class MockFeishuState:
+    """模拟服务的全部状态，所有方法在请求线程中调用，由一把锁保护"""
+
+    def __init__(
+        self,
+        latency=0.0,
+        jitter=0.0,
+        import_latency=1.0,
+        import_latency_per_kb=0.0,
+        token_delay_polls=0,
+        rate_limit=0,
+        failure_rate=0.0,
+        seed=None,
+    ):
+        """
+        Args:
+            latency: 每个请求的基础延迟(秒)
+            jitter: 在基础延迟上叠加的随机延迟上限(秒)
+            import_latency: 导入任务完成所需时间(秒)
+            import_latency_per_kb: 导入任务按文件大小额外增加的时间(秒/KB)
+            token_delay_polls: 导入任务成功后，前几次查询不返回文档 token
+            rate_limit: 每个接口每秒允许的请求数，超过时返回限流错误，0 表示不限流
+            failure_rate: 随机返回业务错误的概率
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.import_latency = import_latency
+        self.import_latency_per_kb = import_latency_per_kb
+        self.token_delay_polls = token_delay_polls
+        self.rate_limit = rate_limit
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空云空间与统计数据"""
+        with self.lock:
+            self._ids = itertools.count(1)
+            self.folders = {}  # token -> {'name', 'parent'}
+            self.files = {}  # token -> {'name', 'parent', 'type', 'size', 'images'}
+            self.uploads = {}  # upload_id -> {'name', 'parent', 'size', 'media'}
+            self.tasks = {}  # ticket -> {'file_token', 'folder', 'done_at', 'polls'}
+            self.docs = {}  # document_id -> {block_id: block}
+            self.calls = {}
+            self.throttled = 0
+            self.failed = 0
+            self.bytes_received = 0
+            self._windows = {}
+
+    def new_id(self, prefix):
+        return f'{prefix}_{next(self._ids):06d}'
+
+    def stats(self):
+        with self.lock:
+            return {
+                'calls': dict(self.calls),
+                'total_calls': sum(self.calls.values()),
+                'throttled': self.throttled,
+                'failed': self.failed,
+                'bytes_received': self.bytes_received,
+                'documents': len(self.docs),
+                'folders': len(self.folders),
+            }
+
+    def admit(self, route):
+        """记录调用并决定是否注入限流或失败
+        Returns:
+            None 或 (http 状态码, 响应体, 额外响应头)
+        """
+        with self.lock:
+            self.calls[route] = self.calls.get(route, 0) + 1
+            if route == 'auth':
+                return None
+
+            if self.rate_limit:
+                now = time.monotonic()
+                window = self._windows.setdefault(route, [])
+                while window and window[0] <= now - 1:
+                    window.pop(0)
+                if len(window) >= self.rate_limit:
+                    self.throttled += 1
+                    return 429, {'code': 99991400, 'msg': 'request trigger frequency limit'}, {'x-ogw-ratelimit-reset': '1'}
+                window.append(now)
+
+            if self.failure_rate and self.random.random() < self.failure_rate:
+                self.failed += 1
+                return 200, {'code': 1061001, 'msg': 'mock injected failure'}, {}
+        return None
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(self.latency + self.random.uniform(0, self.jitter))
+
+    # ---- 文档块 ----
+
+    def create_doc(self, folder, title, image_count=0):
+        """创建文档，导入任务生成的文档包含一个文本块和 image_count 个空图片块"""
+        doc_id = self.new_id('doc')
+        root = {'block_id': doc_id, 'block_type': 1, 'parent_id': '', 'children': [], 'page': {'elements': []}}
+        blocks = {doc_id: root}
+        if image_count:
+            text_id = self.new_id('blk')
+            blocks[text_id] = {'block_id': text_id, 'block_type': 2, 'parent_id': doc_id, 'text': {'elements': []}}
+            root['children'].append(text_id)
+            for _ in range(image_count):
+                image_id = self.new_id('blk')
+                blocks[image_id] = {'block_id': image_id, 'block_type': 27, 'parent_id': doc_id, 'image': {}}
+                root['children'].append(image_id)
+        self.docs[doc_id] = blocks
+        self.files[doc_id] = {'name': title, 'parent': folder, 'type': 'docx', 'size': 0}
+        return doc_id
+
+    def ordered_blocks(self, doc_id):
+        blocks = self.docs[doc_id]
+        result = []
+
+        def visit(block_id):
+            block = blocks[block_id]
+            result.append(block)
+            for child_id in block.get('children', []):
+                visit(child_id)
+
+        visit(doc_id)
+        return result
+
+    def insert_children(self, doc_id, parent_id, block_ids, index):
+        children = self.docs[doc_id][parent_id].setdefault('children', [])
+        if index is None or index < 0 or index > len(children):
+            index = len(children)
+        children[index:index] = block_ids
+
+    def delete_subtree(self, doc_id, block_id):
+        blocks = self.docs[doc_id]
+        block = blocks.pop(block_id, None)
+        for child_id in (block or {}).get('children', []):
+            self.delete_subtree(doc_id, child_id)
+
+
+class MockFeishuHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    routes = [
+        ('POST', r'/open-apis/auth/v3/(tenant|app)_access_token/internal', 'auth'),
+        ('POST', r'/open-apis/drive/v1/files/create_folder', 'create_folder'),
+        ('GET', r'/open-apis/drive/v1/files', 'list_files'),
+        ('POST', r'/open-apis/drive/v1/(files|medias)/upload_all', 'upload_all'),
+        ('POST', r'/open-apis/drive/v1/(files|medias)/upload_prepare', 'upload_prepare'),
+        ('POST', r'/open-apis/drive/v1/(files|medias)/upload_part', 'upload_part'),
+        ('POST', r'/open-apis/drive/v1/(files|medias)/upload_finish', 'upload_finish'),
+        ('DELETE', r'/open-apis/drive/v1/files/(?P<token>[^/]+)', 'delete_file'),
+        ('POST', r'/open-apis/drive/v1/import_tasks', 'create_import_task'),
+        ('GET', r'/open-apis/drive/v1/import_tasks/(?P<ticket>[^/]+)', 'get_import_task'),
+        ('POST', r'/open-apis/docx/v1/documents', 'create_document'),
+        ('GET', r'/open-apis/docx/v1/documents/(?P<doc>[^/]+)/blocks', 'list_blocks'),
+        ('PATCH', r'/open-apis/docx/v1/documents/(?P<doc>[^/]+)/blocks/batch_update', 'batch_update'),
+        ('POST', r'/open-apis/docx/v1/documents/(?P<doc>[^/]+)/blocks/(?P<block>[^/]+)/children', 'create_children'),
+        ('POST', r'/open-apis/docx/v1/documents/(?P<doc>[^/]+)/blocks/(?P<block>[^/]+)/descendant', 'create_descendants'),
+        (
+            'DELETE',
+            r'/open-apis/docx/v1/documents/(?P<doc>[^/]+)/blocks/(?P<block>[^/]+)/children/batch_delete',
+            'batch_delete',
+        ),
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PATCH(self):
+        self._dispatch('PATCH')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        self.query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        self.body = self.rfile.read(length) if length else b''
+        with self.state.lock:
+            self.state.bytes_received += len(self.body)
+
+        for route_method, pattern, name in self.routes:
+            match = re.fullmatch(pattern, url.path)
+            if route_method == method and match:
+                break
+        else:
+            return self._send(404, {'code': 404, 'msg': f'not found: {method} {url.path}'})
+
+        self.state.delay()
+        rejected = self.state.admit(name)
+        if rejected:
+            return self._send(*rejected)
+
+        try:
+            with self.state.lock:
+                data = getattr(self, f'_{name}')(**match.groupdict())
+        except KeyError as e:
+            return self._send(200, {'code': 1061003, 'msg': f'not found: {e}'})
+        if name == 'auth':
+            return self._send(200, data)
+        self._send(200, {'code': 0, 'msg': 'success', 'data': data})
+
+    def _send(self, status, payload, headers=None):
+        content = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _json(self):
+        return json.loads(self.body or b'{}')
+
+    def _form_field(self, name):
+        """从 multipart 表单中取出一个普通字段"""
+        match = re.search(rb'name="' + name.encode() + rb'"\r\n\r\n(.*?)\r\n', self.body, re.S)
+        return match.group(1).decode('utf-8') if match else None
+
+    # ---- 接口实现 ----
+
+    def _auth(self):
+        return {'code': 0, 'msg': 'ok', 'tenant_access_token': 't-mock', 'app_access_token': 'a-mock', 'expire': 7200}
+
+    def _create_folder(self):
+        body = self._json()
+        token = self.state.new_id('fld')
+        self.state.folders[token] = {'name': body.get('name'), 'parent': body.get('folder_token') or ''}
+        return {'token': token, 'url': f'https://mock.feishu.cn/drive/folder/{token}'}
+
+    def _list_files(self):
+        parent = self.query.get('folder_token', '')
+        files = [
+            {'token': token, 'name': folder['name'], 'type': 'folder', 'parent_token': parent}
+            for token, folder in self.state.folders.items()
+            if folder['parent'] == parent
+        ]
+        files += [
+            {'token': token, 'name': info['name'], 'type': info['type'], 'parent_token': parent}
+            for token, info in self.state.files.items()
+            if info['parent'] == parent
+        ]
+        return {'files': files, 'has_more': False}
+
+    def _upload_all(self):
+        token = self.state.new_id('file')
+        self.state.files[token] = {
+            'name': self._form_field('file_name'),
+            'parent': self._form_field('parent_node') if self._form_field('parent_type') == 'explorer' else None,
+            'type': 'file',
+            'size': int(self._form_field('size') or 0),
+            'images': len(_IMAGE_RE.findall(self.body)),
+        }
+        return {'file_token': token}
+
+    def _upload_prepare(self):
+        body = self._json()
+        upload_id = self.state.new_id('upload')
+        block_size = 4 * 1024 * 1024
+        self.state.uploads[upload_id] = {
+            'name': body.get('file_name'),
+            'parent': body.get('parent_node') if body.get('parent_type') == 'explorer' else None,
+            'size': body.get('size', 0),
+            'images': 0,
+        }
+        return {'upload_id': upload_id, 'block_size': block_size, 'block_num': -(-body.get('size', 0) // block_size)}
+
+    def _upload_part(self):
+        upload = self.state.uploads[self._form_field('upload_id')]
+        upload['images'] += len(_IMAGE_RE.findall(self.body))
+        return {}
+
+    def _upload_finish(self):
+        upload = self.state.uploads.pop(self._json()['upload_id'])
+        token = self.state.new_id('file')
+        self.state.files[token] = {**upload, 'type': 'file'}
+        return {'file_token': token}
+
+    def _delete_file(self, token):
+        self.state.files.pop(token, None)
+        self.state.folders.pop(token, None)
+        self.state.docs.pop(token, None)
+        return {}
+
+    def _create_import_task(self):
+        body = self._json()
+        file_info = self.state.files[body['file_token']]
+        ticket = self.state.new_id('ticket')
+        self.state.tasks[ticket] = {
+            'file_token': body['file_token'],
+            'name': body.get('file_name'),
+            'folder': (body.get('point') or {}).get('mount_key'),
+            'images': file_info.get('images', 0),
+            'done_at': time.monotonic()
+            + self.state.import_latency
+            + self.state.import_latency_per_kb * file_info.get('size', 0) / 1024,
+            'polls_after_done': 0,
+            'doc_token': None,
+        }
+        return {'ticket': ticket}
+
+    def _get_import_task(self, ticket):
+        task = self.state.tasks[ticket]
+        result = {'ticket': ticket, 'type': 'docx', 'job_error_msg': 'success'}
+        if time.monotonic() < task['done_at']:
+            return {'result': {**result, 'job_status': 1}}
+
+        if task['doc_token'] is None:
+            task['doc_token'] = self.state.create_doc(task['folder'], task['name'], task['images'])
+        task['polls_after_done'] += 1
+        if task['polls_after_done'] <= self.state.token_delay_polls:
+            # 模拟任务已成功但 token 尚未写入结果
+            return {'result': {**result, 'job_status': 2, 'token': ''}}
+        token = task['doc_token']
+        return {'result': {**result, 'job_status': 2, 'token': token, 'url': f'https://mock.feishu.cn/docx/{token}'}}
+
+    def _create_document(self):
+        body = self._json()
+        doc_id = self.state.create_doc(body.get('folder_token'), body.get('title'))
+        return {'document': {'document_id': doc_id, 'revision_id': 1, 'title': body.get('title')}}
+
+    def _list_blocks(self, doc):
+        blocks = self.state.ordered_blocks(doc)
+        page_size = int(self.query.get('page_size', 500))
+        start = int(self.query.get('page_token') or 0)
+        end = start + page_size
+        return {
+            'items': blocks[start:end],
+            'has_more': end < len(blocks),
+            'page_token': str(end) if end < len(blocks) else '',
+        }
+
+    def _batch_update(self, doc):
+        blocks = self.state.docs[doc]
+        updated = []
+        for request in self._json().get('requests', []):
+            block = blocks[request['block_id']]
+            if 'replace_image' in request:
+                block['image'] = request['replace_image']
+            if 'update_text_elements' in request:
+                field = next((key for key in block if key not in ('block_id', 'block_type', 'parent_id', 'children')), 'text')
+                block[field] = {**block.get(field, {}), 'elements': request['update_text_elements']['elements']}
+            updated.append(block)
+        return {'blocks': updated}
+
+    def _create_children(self, doc, block):
+        body = self._json()
+        created = []
+        for child in body.get('children', []):
+            child = {**child, 'block_id': self.state.new_id('blk'), 'parent_id': block}
+            self.state.docs[doc][child['block_id']] = child
+            created.append(child)
+        self.state.insert_children(doc, block, [child['block_id'] for child in created], body.get('index'))
+        return {'children': created, 'document_revision_id': 1}
+
+    def _create_descendants(self, doc, block):
+        body = self._json()
+        id_map = {item['block_id']: self.state.new_id('blk') for item in body.get('descendants', [])}
+        created = {}
+        for item in body.get('descendants', []):
+            real_id = id_map[item['block_id']]
+            created[real_id] = {
+                **item,
+                'block_id': real_id,
+                'children': [id_map[child] for child in item.get('children', [])],
+            }
+        for real_id, item in created.items():
+            for child_id in item['children']:
+                created[child_id]['parent_id'] = real_id
+        top_ids = [id_map[child] for child in body.get('children_id', [])]
+        for top_id in top_ids:
+            created[top_id]['parent_id'] = block
+        self.state.docs[doc].update(created)
+        self.state.insert_children(doc, block, top_ids, body.get('index'))
+        return {
+            'children': [created[top_id] for top_id in top_ids],
+            'block_id_relations': [{'temporary_block_id': tmp, 'block_id': real} for tmp, real in id_map.items()],
+        }
+
+    def _batch_delete(self, doc, block):
+        body = self._json()
+        children = self.state.docs[doc][block]['children']
+        removed = children[body['start_index']:body['end_index']]
+        del children[body['start_index']:body['end_index']]
+        for block_id in removed:
+            self.state.delete_subtree(doc, block_id)
+        return {'document_revision_id': 1}
+
+
+class MockFeishuServer:
+    """在后台线程中运行的模拟服务
+
+    用法:
+        with MockFeishuServer(latency=0.05) as server:
+            os.environ['FEISHU_DOMAIN'] = server.url
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, **options):
+        self.state = MockFeishuState(**options)
+        self.httpd = ThreadingHTTPServer((host, port), MockFeishuHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = self.state
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,203 @@
+"""迁移吞吐量基准测试
+
+在本地启动模拟飞书服务，生成合成的 Markdown 目录树，以不同的并发度/文档生成方式运行完整迁移(main.main())，
+报告每分钟迁移文档数、每个文档的 API 调用次数和峰值内存。
+
+    python -m benchmarks.run_benchmark --files 200 --images 3 --depth 3 --concurrency 1,5,10
+
+每组配置都在独立子进程中运行，保证配置加载和峰值内存互不影响。
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.mock_feishu import MockFeishuServer
+from benchmarks.synthetic import generate_tree
+
+ROOT_FOLDER_TOKEN = 'fld_root'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='基于本地模拟飞书服务的迁移吞吐量基准测试')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+
+    tree = parser.add_argument_group('合成目录树')
+    tree.add_argument('--files', type=int, default=100, help='Markdown 文件数')
+    tree.add_argument('--images', type=int, default=2, help='每个文件引用的图片数')
+    tree.add_argument('--depth', type=int, default=2, help='目录层数')
+    tree.add_argument('--doc-kb', type=int, default=4, help='每个文档的大致大小(KB)')
+    tree.add_argument('--image-size', type=int, default=64, help='图片边长(像素)')
+
+    run = parser.add_argument_group('迁移配置')
+    run.add_argument('--concurrency', default='1,5', help='逗号分隔的 MIGRATION_CONCURRENCY 取值')
+    run.add_argument('--engine', default='import', help='逗号分隔的 DOCX_ENGINE 取值(import/direct)')
+    run.add_argument('--rate-limits', default='', help='客户端限流配额，同 FEISHU_RATE_LIMITS')
+
+    server = parser.add_argument_group('模拟服务')
+    server.add_argument('--latency', type=float, default=0.02, help='每个请求的基础延迟(秒)')
+    server.add_argument('--jitter', type=float, default=0.0, help='随机附加延迟上限(秒)')
+    server.add_argument('--import-latency', type=float, default=0.5, help='导入任务耗时(秒)')
+    server.add_argument('--import-latency-per-kb', type=float, default=0.0, help='导入任务按大小增加的耗时(秒/KB)')
+    server.add_argument('--token-delay-polls', type=int, default=0, help='导入成功后前几次查询不返回 token')
+    server.add_argument('--server-rate-limit', type=int, default=0, help='服务端每接口每秒请求上限, 0 不限流')
+    server.add_argument('--failure-rate', type=float, default=0.0, help='随机业务错误概率')
+    server.add_argument('--seed', type=int, default=0, help='随机种子')
+
+    parser.add_argument('--output', help='把结果写入 JSON 文件')
+    return parser.parse_args(argv)
+
+
+def run_worker(result_path):
+    """子进程: 按环境变量中的配置运行一次完整迁移"""
+    import main
+
+    sys.argv = ['main.py']
+    start = time.monotonic()
+    # 迁移过程的调试输出量很大，基准测试时丢弃
+    with redirect_stdout(io.StringIO()):
+        main.main()
+    elapsed = time.monotonic() - start
+
+    try:
+        import resource
+
+        # Linux 上 ru_maxrss 单位为 KB
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:  # Windows
+        peak_rss_mb = None
+
+    with open(os.environ['METRICS_REPORT_PATH'], encoding='utf-8') as f:
+        report = json.load(f)
+    with open(result_path, 'w', encoding='utf-8') as f:
+        json.dump({'elapsed': elapsed, 'peak_rss_mb': peak_rss_mb, 'report': report}, f)
+
+
+def run_case(server, markdown_dir, work_dir, engine, concurrency, rate_limits):
+    """在子进程中运行一组配置，返回汇总结果"""
+    server.state.reset()
+    case_dir = os.path.join(work_dir, f'{engine}_{concurrency}')
+    os.makedirs(case_dir, exist_ok=True)
+    result_path = os.path.join(case_dir, 'result.json')
+
+    env = {
+        **os.environ,
+        'FEISHU_APP_ID': 'cli_benchmark',
+        'FEISHU_APP_SECRET': 'benchmark_secret',
+        'FEISHU_DOMAIN': server.url,
+        'LOCAL_MARKDOWN_DIR': markdown_dir,
+        'DEFAULT_PARENT_FOLDER_TOKEN': ROOT_FOLDER_TOKEN,
+        'MIGRATION_CONCURRENCY': str(concurrency),
+        'DOCX_ENGINE': engine,
+        'STATE_DIR': os.path.join(case_dir, 'state'),
+        'INCREMENTAL_SYNC': 'false',
+        'METRICS_REPORT_PATH': os.path.join(case_dir, 'report.json'),
+        'PROMETHEUS_TEXTFILE': '',
+    }
+    if rate_limits:
+        env['FEISHU_RATE_LIMITS'] = rate_limits
+
+    subprocess.run(
+        [sys.executable, '-m', 'benchmarks.run_benchmark', '--worker', result_path],
+        cwd=PROJECT_ROOT,
+        env=env,
+        check=True,
+    )
+    with open(result_path, encoding='utf-8') as f:
+        worker = json.load(f)
+
+    stats = server.state.stats()
+    result = worker['report'].get('result', {})
+    migrated = result.get('succeeded', 0)
+    counters = worker['report'].get('counters', {})
+    return {
+        'engine': engine,
+        'concurrency': concurrency,
+        'succeeded': migrated,
+        'failed': result.get('failed', 0),
+        'elapsed': round(worker['elapsed'], 3),
+        'docs_per_min': round(migrated / worker['elapsed'] * 60, 1) if worker['elapsed'] else None,
+        'api_calls': stats['total_calls'],
+        'api_calls_per_doc': round(stats['total_calls'] / migrated, 2) if migrated else None,
+        'throttled': stats['throttled'],
+        'injected_failures': stats['failed'],
+        'retries': sum(counters.get('retries', {}).values()) if isinstance(counters.get('retries'), dict) else 0,
+        'peak_rss_mb': round(worker['peak_rss_mb'], 1) if worker['peak_rss_mb'] is not None else None,
+        'calls': stats['calls'],
+    }
+
+
+def print_table(results):
+    columns = [
+        ('engine', '引擎'),
+        ('concurrency', '并发'),
+        ('succeeded', '成功'),
+        ('failed', '失败'),
+        ('elapsed', '耗时(s)'),
+        ('docs_per_min', '文档/分钟'),
+        ('api_calls_per_doc', '调用/文档'),
+        ('throttled', '限流'),
+        ('retries', '重试'),
+        ('peak_rss_mb', '峰值内存(MB)'),
+    ]
+    rows = [[str(result[key]) for key, _ in columns] for result in results]
+    widths = [max(len(title), *(len(row[i]) for row in rows)) for i, (_, title) in enumerate(columns)]
+    print('  '.join(title.ljust(width) for (_, title), width in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(value.ljust(width) for value, width in zip(row, widths)))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.worker:
+        return run_worker(args.worker)
+
+    engines = [engine.strip() for engine in args.engine.split(',') if engine.strip()]
+    concurrencies = [int(value) for value in args.concurrency.split(',') if value.strip()]
+
+    with tempfile.TemporaryDirectory(prefix='md2feishu_bench_') as work_dir:
+        markdown_dir = os.path.join(work_dir, 'markdown')
+        tree = generate_tree(
+            markdown_dir, args.files, args.images, args.depth, doc_kb=args.doc_kb, image_size=args.image_size
+        )
+        print(
+            f"合成目录树: {tree['files']} 个文件, {tree['images']} 张图片, "
+            f"{tree['folders']} 个目录, {tree['bytes'] / 1024 / 1024:.1f} MB"
+        )
+
+        server = MockFeishuServer(
+            latency=args.latency,
+            jitter=args.jitter,
+            import_latency=args.import_latency,
+            import_latency_per_kb=args.import_latency_per_kb,
+            token_delay_polls=args.token_delay_polls,
+            rate_limit=args.server_rate_limit,
+            failure_rate=args.failure_rate,
+            seed=args.seed,
+        )
+        results = []
+        with server:
+            for engine in engines:
+                for concurrency in concurrencies:
+                    print(f"运行: DOCX_ENGINE={engine}, MIGRATION_CONCURRENCY={concurrency} ...")
+                    results.append(run_case(server, markdown_dir, work_dir, engine, concurrency, args.rate_limits))
+
+    print()
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'tree': tree, 'args': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""生成用于基准测试的 Markdown 目录树"""
+import os
+import struct
+import zlib
+
+
+def make_png(width, height, seed):
+    """生成纯色 PNG，颜色由 seed 决定，保证每张图片内容不同"""
+    color = bytes(((seed * 37) % 256, (seed * 91) % 256, (seed * 53) % 256))
+    raw = b''.join(b'\x00' + color * width for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b'')
+
+
+def generate_tree(root, files=100, images=2, depth=2, doc_kb=4, image_size=64):
+    """生成 files 个 Markdown 文件，每个引用 images 张本地图片，分布在 depth 层的目录中
+    Args:
+        root: 输出目录
+        doc_kb: 每个文档正文的大致大小(KB)
+        image_size: 图片边长(像素)
+    Returns:
+        dict: {'files', 'images', 'folders', 'bytes'}
+    """
+    folders = set()
+    total_bytes = 0
+    paragraph = '这是用于基准测试的示例段落, 包含 **粗体**、*斜体* 和 `行内代码`。' * 4
+
+    for index in range(files):
+        # 按二进制位把文件分散到各层目录，形成一棵满二叉目录树
+        parts = [f'level{level}_{(index >> level) % 2}' for level in range(depth)]
+        folder = os.path.join(root, *parts)
+        os.makedirs(os.path.join(folder, 'images'), exist_ok=True)
+        folders.update(os.path.join(*parts[:n]) for n in range(1, depth + 1))
+
+        lines = [f'# 文档 {index}', '']
+        image_count = 0
+        while len('\n'.join(lines).encode('utf-8')) < doc_kb * 1024 or image_count < images:
+            lines += [f'## 小节 {len(lines)}', '', paragraph, '', '- 列表项一', '- 列表项二', '']
+            if image_count < images:
+                image_name = f'doc{index:05d}_{image_count}.png'
+                with open(os.path.join(folder, 'images', image_name), 'wb') as f:
+                    png = make_png(image_size, image_size, index * 1000 + image_count)
+                    f.write(png)
+                    total_bytes += len(png)
+                lines += [f'![图片 {image_count}](images/{image_name})', '']
+                image_count += 1
+
+        content = '\n'.join(lines).encode('utf-8')
+        with open(os.path.join(folder, f'doc{index:05d}.md'), 'wb') as f:
+            f.write(content)
+        total_bytes += len(content)
+
+    return {'files': files, 'images': files * images, 'folders': len(folders), 'bytes': total_bytes}
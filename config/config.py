@@ -6,5 +6,56 @@ load_dotenv()
 # 飞书配置
 FEISHU_APP_ID = os.getenv('FEISHU_APP_ID')
 FEISHU_APP_SECRET = os.getenv('FEISHU_APP_SECRET')
+FEISHU_DOMAIN = os.getenv('FEISHU_DOMAIN', 'https://open.feishu.cn')  # 开放平台地址，基准测试时指向本地模拟服务
 LOCAL_MARKDOWN_DIR = os.getenv('LOCAL_MARKDOWN_DIR')
+
+# 文件发现: 逗号分隔的 .gitignore 风格模式，路径相对 LOCAL_MARKDOWN_DIR
+INCLUDE_PATTERNS = [p.strip() for p in os.getenv('INCLUDE_PATTERNS', '').split(',') if p.strip()]
+EXCLUDE_PATTERNS = [p.strip() for p in os.getenv('EXCLUDE_PATTERNS', '').split(',') if p.strip()]
+IGNORE_FILES = [p.strip() for p in os.getenv('IGNORE_FILES', '.gitignore,.md2feishuignore').split(',') if p.strip()]
 DEFAULT_PARENT_FOLDER_TOKEN = os.getenv('DEFAULT_PARENT_FOLDER_TOKEN')
+
+# 迁移配置
+MIGRATION_CONCURRENCY = int(os.getenv('MIGRATION_CONCURRENCY', '5'))  # 同时处理的文档数量
+IMAGE_UPLOAD_CONCURRENCY = int(os.getenv('IMAGE_UPLOAD_CONCURRENCY', '8'))  # 单个文档同时上传的图片数量
+MULTIPART_THRESHOLD_MB = int(os.getenv('MULTIPART_THRESHOLD_MB', '20'))  # 超过该大小(MB)的文件使用分片上传
+UPLOAD_PART_CONCURRENCY = int(os.getenv('UPLOAD_PART_CONCURRENCY', '4'))  # 单个文件同时上传的分片数量
+DOCX_ENGINE = os.getenv('DOCX_ENGINE', 'import').lower()  # 文档生成方式: import 导入任务, direct 本地解析后直接写入文档块
+SPLIT_MAX_KB = int(os.getenv('SPLIT_MAX_KB', '1024'))  # 导入时超过该大小(KB)的 md 按标题拆分为多个文档，0 表示不限制
+SPLIT_MAX_BLOCKS = int(os.getenv('SPLIT_MAX_BLOCKS', '3000'))  # 导入时估算块数超过该值的 md 同样拆分，0 表示不限制
+FEISHU_RATE_LIMITS = os.getenv('FEISHU_RATE_LIMITS', '')  # 覆盖接口配额，如 drive.upload=5,docx.block=3
+
+# 本地状态目录，存放迁移清单等持久化数据
+STATE_DIR = os.getenv('STATE_DIR', '.md2feishu')
+MANIFEST_PATH = os.getenv('MANIFEST_PATH', os.path.join(STATE_DIR, 'manifest.db'))
+JOURNAL_PATH = os.getenv('JOURNAL_PATH', os.path.join(STATE_DIR, 'journal.jsonl'))
+FOLDER_STORE_PATH = os.getenv('FOLDER_STORE_PATH', os.path.join(STATE_DIR, 'folders.db'))
+CLEANUP_STORE_PATH = os.getenv('CLEANUP_STORE_PATH', os.path.join(STATE_DIR, 'cleanup.db'))  # 待删除的中间态文件
+SCHEDULE_ORDER = os.getenv('SCHEDULE_ORDER', 'cost').lower()  # 文档派发顺序: cost 按预计耗时从长到短, discovery 按发现顺序
+SCHEDULE_WINDOW = int(os.getenv('SCHEDULE_WINDOW', '200'))  # 按耗时派发时已发现、等待派发的文档数上限
+COST_MODEL_PATH = os.getenv('COST_MODEL_PATH', os.path.join(STATE_DIR, 'costs.json'))  # 历史迁移耗时，用于估算
+CLEANUP_WORKERS = int(os.getenv('CLEANUP_WORKERS', '2'))  # 后台删除中间态文件的并发数
+TOKEN_CACHE_PATH = os.getenv('TOKEN_CACHE_PATH', os.path.join(STATE_DIR, 'token.json'))  # 租户访问令牌缓存
+TOKEN_REFRESH_MARGIN = int(os.getenv('TOKEN_REFRESH_MARGIN', '300'))  # 在令牌过期前多少秒刷新
+INCREMENTAL_SYNC = os.getenv('INCREMENTAL_SYNC', 'true').lower() == 'true'  # 跳过内容未变化的文档
+DIFF_UPDATE = os.getenv('DIFF_UPDATE', 'false').lower() == 'true'  # 直接写入模式生成的文档内容变化时按块级差异更新
+REWRITE_LINKS = os.getenv('REWRITE_LINKS', 'true').lower() == 'true'  # 把文档间的相对 .md 链接改写为飞书文档地址
+DOC_URL_PREFIX = os.getenv('DOC_URL_PREFIX', 'https://feishu.cn/docx/')  # 飞书文档地址前缀，建议改为企业域名
+DELETE_REMOVED_DOCS = os.getenv('DELETE_REMOVED_DOCS', 'false').lower() == 'true'  # 同步删除本地已删除的文档
+METRICS_REPORT_PATH = os.getenv('METRICS_REPORT_PATH', os.path.join(STATE_DIR, 'report.json'))  # JSON 运行报告，为空不输出
+PROMETHEUS_TEXTFILE = os.getenv('PROMETHEUS_TEXTFILE', '')  # Prometheus textfile 输出路径，为空不输出
+
+# 图片预处理
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', os.path.join(STATE_DIR, 'image_cache'))
+IMAGE_FORMAT = os.getenv('IMAGE_FORMAT', '')  # 重新编码为 webp 或 jpeg，为空时保持原格式
+IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', '85'))  # 有损编码质量(1-100)
+IMAGE_MAX_WIDTH = int(os.getenv('IMAGE_MAX_WIDTH', '0'))  # 超过该宽度的图片等比缩小，0 表示不缩放
+IMAGE_PROCESS_WORKERS = int(os.getenv('IMAGE_PROCESS_WORKERS', '0')) or None  # 图片处理进程数，默认 CPU 数
+
+# 远程图片: 下载后按本地图片上传，下载结果缓存在磁盘上
+REMOTE_IMAGES = os.getenv('REMOTE_IMAGES', 'true').lower() == 'true'  # 为 false 时不下载远程图片
+REMOTE_IMAGE_CACHE_DIR = os.getenv('REMOTE_IMAGE_CACHE_DIR', os.path.join(STATE_DIR, 'remote_images'))
+REMOTE_IMAGE_CONCURRENCY = int(os.getenv('REMOTE_IMAGE_CONCURRENCY', '8'))  # 同时下载的图片数量(所有文档共用)
+REMOTE_IMAGE_TIMEOUT = float(os.getenv('REMOTE_IMAGE_TIMEOUT', '30'))  # 单个下载请求的超时时间(秒)
+REMOTE_IMAGE_MAX_MB = int(os.getenv('REMOTE_IMAGE_MAX_MB', '20'))  # 单张远程图片的大小上限(MB)
+REMOTE_IMAGE_MAX_AGE = int(os.getenv('REMOTE_IMAGE_MAX_AGE', '86400'))  # 缓存在该秒数内不再向源站验证
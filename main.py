@@ -1,20 +1,229 @@
+import argparse
+import asyncio
+import glob
+import json
 import os
 import shutil
+import sys
 from dotenv import load_dotenv
 from src.markdown_parser import MarkdownParser
 from src.feishu_client import FeishuClient
-from config.config import LOCAL_MARKDOWN_DIR, DEFAULT_PARENT_FOLDER_TOKEN
+from src.migration_engine import MigrationEngine
+from src.manifest import Manifest
+from src.journal import Journal
+from src.folder_tree import FolderStore, FolderTree
+from src.cleanup_queue import CleanupQueue, CleanupStore
+from src.sweeper import OrphanSweeper
+from src.planner import MigrationPlan
+from src.scheduler import CostModel
+from src.link_index import LinkIndex
+from src.metrics import merge_reports
+from src.sharding import parse_shard, shard_label, shard_path
+from src.rate_limiter import parse_rate_limits
+from config.config import (
+    LOCAL_MARKDOWN_DIR,
+    DEFAULT_PARENT_FOLDER_TOKEN,
+    MIGRATION_CONCURRENCY,
+    DOCX_ENGINE,
+    MANIFEST_PATH,
+    JOURNAL_PATH,
+    FOLDER_STORE_PATH,
+    CLEANUP_STORE_PATH,
+    CLEANUP_WORKERS,
+    SCHEDULE_ORDER,
+    SCHEDULE_WINDOW,
+    COST_MODEL_PATH,
+    INCREMENTAL_SYNC,
+    DELETE_REMOVED_DOCS,
+    REWRITE_LINKS,
+    DOC_URL_PREFIX,
+    DIFF_UPDATE,
+    INCLUDE_PATTERNS,
+    EXCLUDE_PATTERNS,
+    IGNORE_FILES,
+    METRICS_REPORT_PATH,
+    PROMETHEUS_TEXTFILE,
+    MULTIPART_THRESHOLD_MB,
+    FEISHU_RATE_LIMITS,
+    REMOTE_IMAGES,
+    SPLIT_MAX_KB,
+    SPLIT_MAX_BLOCKS,
+)
 
 # 加载环境变量
 load_dotenv()
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="将本地 Markdown 文档批量导入飞书云文档")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=["run", "plan", "sweep", "merge-report"],
+        default="run",
+        help="run: 执行迁移(默认); plan: 只遍历目录，估算接口调用、上传量和耗时，不访问网络; "
+             "sweep: 清理目标文件夹中本工具遗留的中间态 md 和未完成的文档; "
+             "merge-report: 合并各分片的运行报告",
+    )
+    parser.add_argument(
+        "reports",
+        nargs="*",
+        help="merge-report 时要合并的报告文件，默认为 METRICS_REPORT_PATH 旁的所有分片报告",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="从上次中断处继续: 跳过断点日志中已完成的上传、导入和图片更新阶段",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="sweep 时只列出要删除的文件，不实际删除",
+    )
+    parser.add_argument(
+        "--include-untracked",
+        action="store_true",
+        help="sweep 时同时删除未登记的疑似遗留文件(任意 .md 文件、与已迁移文档同名的文档)，删除前需要确认",
+    )
+    parser.add_argument(
+        "--shard",
+        help="分片运行 i/N(i 从 0 开始): 按路径哈希只迁移属于第 i 个分片的文件，"
+             "多个进程或主机共用 FOLDER_STORE_PATH 指向的文件夹映射",
+    )
+    return parser.parse_args()
+
+
+def write_reports(metrics, result, shard=None):
+    """输出运行报告，失败不影响迁移结果；分片运行时每个分片写入各自的文件"""
+    extra = {'shard': shard_label(shard)} if shard else {}
+    if result is not None:
+        extra.update({
+            'result': {key: len(value) for key, value in result.items()},
+            'failed': [{'path': file_path, 'error': error} for file_path, error in result['failed']],
+        })
+    report_path = shard_path(METRICS_REPORT_PATH, shard)
+    try:
+        if report_path:
+            metrics.write_json(report_path, extra)
+            print(f"运行报告已写入: {report_path}")
+        if PROMETHEUS_TEXTFILE:
+            metrics.write_prometheus(shard_path(PROMETHEUS_TEXTFILE, shard))
+    except Exception as e:
+        print(f"写入运行报告失败: {str(e)}")
+
+
+def merge_report(report_paths):
+    """合并各分片的运行报告，写入 METRICS_REPORT_PATH"""
+    if not report_paths:
+        root, ext = os.path.splitext(METRICS_REPORT_PATH)
+        report_paths = sorted(glob.glob(f"{glob.escape(root)}.shard-*-of-*{ext}"))
+    if not report_paths:
+        print(f"没有找到分片报告: {METRICS_REPORT_PATH}")
+        return
+
+    reports = []
+    for path in report_paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            reports.append(json.load(f))
+
+    merged = merge_reports(reports)
+    counts = {int(label.split('/')[1]) for label in merged['shards'] if label}
+    if len(counts) == 1:
+        missing = sorted(set(range(counts.pop())) - {int(label.split('/')[0]) for label in merged['shards']})
+        if missing:
+            print(f"注意: 缺少分片 {', '.join(map(str, missing))} 的报告")
+
+    with open(METRICS_REPORT_PATH, 'w', encoding='utf-8') as f:
+        json.dump(merged, f, ensure_ascii=False, indent=2)
+    result = merged.get('result', {})
+    print(
+        f"已合并 {len(reports)} 份报告: 成功 {result.get('succeeded', 0)} 个, 跳过 {result.get('skipped', 0)} 个, "
+        f"失败 {result.get('failed', 0)} 个, 总耗时 {merged['duration']} 秒"
+    )
+    print(f"合并报告已写入: {METRICS_REPORT_PATH}")
+
+
+def plan(markdown_parser, root_folder_token):
+    """只读取本地文件和状态目录，输出迁移计划"""
+    # 状态文件不存在时不创建，plan 不留下任何痕迹
+    manifest = Manifest(MANIFEST_PATH) if INCREMENTAL_SYNC and os.path.exists(MANIFEST_PATH) else None
+    folder_mapping = {}
+    if os.path.exists(FOLDER_STORE_PATH):
+        folder_store = FolderStore(FOLDER_STORE_PATH)
+        folder_mapping = folder_store.load(root_folder_token)
+        folder_store.close()
+
+    try:
+        MigrationPlan(
+            markdown_parser,
+            docx_engine=DOCX_ENGINE,
+            concurrency=MIGRATION_CONCURRENCY,
+            rate_limits=parse_rate_limits(FEISHU_RATE_LIMITS),
+            multipart_threshold=MULTIPART_THRESHOLD_MB * 1024 * 1024,
+            manifest=manifest,
+            folder_mapping=folder_mapping,
+            remote_images=REMOTE_IMAGES,
+            split_max_bytes=SPLIT_MAX_KB * 1024,
+            split_max_blocks=SPLIT_MAX_BLOCKS,
+        ).build().print_summary()
+    finally:
+        if manifest is not None:
+            manifest.close()
+
+
+def confirm_untracked(files):
+    """删除未登记的文件前在终端确认，非交互运行时视为不确认"""
+    if not sys.stdin.isatty():
+        return False
+    try:
+        answer = input(f"确认删除以上 {len(files)} 个未登记的文件? 这些文件可能是手动创建的 [y/N]: ")
+    except EOFError:
+        return False
+    return answer.strip().lower() in ('y', 'yes')
+
+
+def sweep(feishu_client, root_folder_token, dry_run=False, shard=None, include_untracked=False):
+    """列出目标文件夹树，批量删除本工具登记过的遗留文件(应在没有迁移运行时执行)"""
+    manifest = Manifest(MANIFEST_PATH) if os.path.exists(MANIFEST_PATH) else None
+    # 以恢复模式打开断点日志，读取未完成的文档，不清空日志
+    journal = Journal(shard_path(JOURNAL_PATH, shard), resume=True)
+    cleanup_store = CleanupStore(shard_path(CLEANUP_STORE_PATH, shard))
+    # 清理时不再有正在进行的迁移，登记为使用中的文件也一并删除
+    cleanup_queue = CleanupQueue(feishu_client, cleanup_store, CLEANUP_WORKERS, include_in_use=True)
+    try:
+        sweeper = OrphanSweeper(feishu_client, root_folder_token, cleanup_queue, manifest=manifest, journal=journal)
+        orphans = asyncio.run(
+            sweeper.sweep(dry_run=dry_run, include_untracked=include_untracked, confirm=confirm_untracked)
+        )
+        if dry_run:
+            print(f"找到 {len(orphans)} 个遗留文件(预览模式, 未删除)")
+        else:
+            print(f"清理完成: 删除 {len(cleanup_queue.deleted)} 个文件, 失败 {len(cleanup_queue.failed)} 个")
+    finally:
+        feishu_client.token_manager.close()
+        cleanup_store.close()
+        journal.close()
+        if manifest is not None:
+            manifest.close()
+
+
 def main():
+    args = parse_args()
+
+    if args.command == "merge-report":
+        return merge_report(args.reports)
+
+    shard = parse_shard(args.shard) if args.shard else None
+
     # 获取配置
     markdown_dir = LOCAL_MARKDOWN_DIR
 
-    # 初始化客户端
-    feishu_client = FeishuClient()
-    markdown_parser = MarkdownParser(markdown_dir)
+    markdown_parser = MarkdownParser(
+        markdown_dir,
+        include_patterns=INCLUDE_PATTERNS,
+        exclude_patterns=EXCLUDE_PATTERNS,
+        ignore_files=IGNORE_FILES,
+        shard=shard,
+    )
     
     # 默认根文件夹
     root_folder_token = DEFAULT_PARENT_FOLDER_TOKEN
@@ -22,61 +231,98 @@ def main():
     if not markdown_dir or not os.path.exists(markdown_dir):
         print(f"请在.env文件中设置正确的LOCAL_MARKDOWN_DIR，并确保目录存在")
         return
-        
+
+    if args.command == "plan":
+        return plan(markdown_parser, root_folder_token)
+
     if os.getenv('FEISHU_APP_ID') == 'your_feishu_app_id' or os.getenv('FEISHU_APP_SECRET') == 'your_feishu_app_secret':
         print("请在.env文件中设置正确的FEISHU_APP_ID和FEISHU_APP_SECRET")
         return
+
+    # 初始化客户端(本地检查都通过后再导入 SDK 并获取访问令牌)
+    feishu_client = FeishuClient()
+
+    if args.command == "sweep":
+        return sweep(
+            feishu_client, root_folder_token, dry_run=args.dry_run, shard=shard,
+            include_untracked=args.include_untracked,
+        )
+
+    # 中间态文件的后台删除队列；不从断点恢复时，上次运行中途遗留的文件也一并清理
+    # 分片运行时断点日志、删除队列和运行报告每个分片各用一份，清单和文件夹映射共用
+    cleanup_store = CleanupStore(shard_path(CLEANUP_STORE_PATH, shard))
+    feishu_client.cleanup_queue = CleanupQueue(
+        feishu_client, cleanup_store, CLEANUP_WORKERS, include_in_use=not args.resume
+    )
     
+    # 增量同步清单
+    manifest = Manifest(MANIFEST_PATH) if INCREMENTAL_SYNC else None
+    # 阶段断点日志
+    journal = Journal(shard_path(JOURNAL_PATH, shard), resume=args.resume)
+    # 持久化的文件夹映射，重复运行时复用已创建的文件夹
+    folder_store = FolderStore(FOLDER_STORE_PATH)
+    # 按预计耗时从长到短派发文档，耗时模型由每次运行的实际耗时校准
+    cost_model = CostModel(shard_path(COST_MODEL_PATH, shard)) if SCHEDULE_ORDER == 'cost' else None
+    result = None
+
     try:
         print(f"开始从本地Markdown文件迁移到飞书...")
         
-        # 获取所有Markdown文件
-        markdown_files = markdown_parser.get_markdown_files()
-        print(f"找到{len(markdown_files)}个Markdown文件")
-        
-        # 创建文件夹映射，用于记录已创建的文件夹
-        folder_mapping = {'': root_folder_token}
-        
-        # 处理每个Markdown文件
-        for file_info in markdown_files:
-            file_path = file_info['path']
-            file_name = file_info['name'].rsplit(' ', 1)[0]
-            folder_path = file_info['folder']
-            
-            print(f"正在处理: {file_path}")
-            
-            # 确保目标文件夹存在
-            parent_token = root_folder_token
-            if folder_path:
-                # 创建嵌套文件夹
-                folder_parts = folder_path.split(os.sep)
-                current_path = ''
-                
-                for part in folder_parts:
-                    if not part:
-                        continue
-                        
-                    current_path = os.path.join(current_path, part)
-                    
-                    if current_path not in folder_mapping:
-                        # 创建新文件夹
-                        parent = folder_mapping.get(os.path.dirname(current_path), root_folder_token)
-                        folder_token = feishu_client.create_folder(part, parent)
-                        folder_mapping[current_path] = folder_token
-                        print(f"  创建文件夹: {current_path}")
-                    
-                parent_token = folder_mapping[current_path]
-
-            # 上传markdown文件为飞书文档
-            feishu_client.import_md_to_docx(file_path, file_name, parent_token)
-            
-            print(f"  文档上传完成: {file_name}")
-            
+        # 边遍历目录边迁移，不必等待整个目录树扫描完成
+        markdown_files = markdown_parser.iter_markdown_files()
+
+        # 并发处理所有Markdown文件
+        engine = MigrationEngine(
+            feishu_client,
+            root_folder_token,
+            concurrency=MIGRATION_CONCURRENCY,
+            manifest=manifest,
+            delete_removed=DELETE_REMOVED_DOCS,
+            journal=journal,
+            folder_tree=FolderTree(feishu_client, root_folder_token, folder_store),
+            docx_engine=DOCX_ENGINE,
+            diff_update=DIFF_UPDATE,
+            shard=shard,
+            cost_model=cost_model,
+            schedule_window=SCHEDULE_WINDOW,
+            # 文档间的相对链接在所有文档完成后统一改写
+            link_index=LinkIndex(DOC_URL_PREFIX, manifest) if REWRITE_LINKS else None,
+        )
+        if shard:
+            print(f"分片运行: 第 {shard_label(shard)} 片")
+        result = asyncio.run(engine.run(markdown_files))
+        print(f"共找到{sum(len(result[k]) for k in ('succeeded', 'skipped', 'failed'))}个Markdown文件")
+
+        if result['skipped']:
+            print(f"跳过{len(result['skipped'])}个未变化的文档")
+        if result['removed']:
+            print(f"删除{len(result['removed'])}个本地已不存在的文档")
+
+        if result['failed']:
+            print(f"迁移完成: 成功{len(result['succeeded'])}个, 失败{len(result['failed'])}个")
+            for file_path, error in result['failed']:
+                print(f"  失败: {file_path} - {error}")
+            return
+
         print(f"所有文档迁移完成！")
         
     except Exception as e:
         print(f"迁移过程中发生错误: {str(e)}")
     finally:
+        write_reports(feishu_client.metrics, result, shard)
+        if cost_model is not None:
+            try:
+                cost_model.save()
+            except Exception as e:
+                print(f"保存迁移耗时记录失败: {str(e)}")
+        feishu_client.token_manager.close()
+        feishu_client.image_pipeline.close()
+        journal.close()
+        folder_store.close()
+        cleanup_store.close()
+        if manifest is not None:
+            manifest.close()
+
         # 清理临时文件
         temp_dir = "./temp"
         if os.path.exists(temp_dir):
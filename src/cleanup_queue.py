@@ -0,0 +1,182 @@
+import asyncio
+import os
+import sqlite3
+import time
+
+# 删除失败达到该次数后放弃，避免已被手动删除的文件在每次运行中反复重试
+MAX_ATTEMPTS = 5
+
+
+class CleanupStore:
+    """待删除的飞书文件列表(SQLite)
+
+    中间态 md 上传成功后立即登记(ready=0，仍在使用)，导入完成或失败后标记为可删除(ready=1)，
+    删除成功后移除。进程中途崩溃时，登记过的文件在下次运行时仍能被清理。
+    """
+
+    def __init__(self, db_path):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pending_deletions (
+                token TEXT NOT NULL,
+                file_type TEXT NOT NULL,
+                reason TEXT,
+                ready INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL,
+                PRIMARY KEY (token, file_type)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def track(self, token, file_type='file', reason=''):
+        """登记一个仍在使用、之后需要删除的文件"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO pending_deletions (token, file_type, reason, created_at) VALUES (?, ?, ?, ?)",
+                (token, file_type, reason, time.time()),
+            )
+
+    def mark_ready(self, token, file_type='file', reason=''):
+        """标记文件可以删除"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO pending_deletions (token, file_type, reason, ready, created_at) VALUES (?, ?, ?, 1, ?) "
+                "ON CONFLICT (token, file_type) DO UPDATE SET ready = 1",
+                (token, file_type, reason, time.time()),
+            )
+
+    def pending(self, include_in_use=False):
+        """返回待删除的 (token, file_type, reason)
+        Args:
+            include_in_use: 是否包括仍标记为使用中的文件(上次运行崩溃时遗留)
+        """
+        sql = "SELECT token, file_type, reason FROM pending_deletions"
+        if not include_in_use:
+            sql += " WHERE ready = 1"
+        return self.conn.execute(sql + " ORDER BY created_at").fetchall()
+
+    def remove(self, token, file_type='file'):
+        with self.conn:
+            self.conn.execute("DELETE FROM pending_deletions WHERE token = ? AND file_type = ?", (token, file_type))
+
+    def record_failure(self, token, file_type='file'):
+        """删除失败次数加一，达到 MAX_ATTEMPTS 后不再重试
+        Returns:
+            bool: 是否已放弃
+        """
+        with self.conn:
+            self.conn.execute(
+                "UPDATE pending_deletions SET attempts = attempts + 1 WHERE token = ? AND file_type = ?",
+                (token, file_type),
+            )
+            row = self.conn.execute(
+                "SELECT attempts FROM pending_deletions WHERE token = ? AND file_type = ?", (token, file_type)
+            ).fetchone()
+            if row is None or row[0] < MAX_ATTEMPTS:
+                return False
+            self.conn.execute("DELETE FROM pending_deletions WHERE token = ? AND file_type = ?", (token, file_type))
+            return True
+
+    def close(self):
+        self.conn.close()
+
+
+class CleanupQueue:
+    """后台删除队列
+
+    删除中间态 md、失败残留文档等操作不在单个文档迁移的关键路径上执行，而是先写入 CleanupStore，
+    再由若干后台 worker 并发删除；运行结束前 drain() 等待队列清空。
+    """
+
+    def __init__(self, feishu_client, store=None, workers=2, include_in_use=False):
+        """
+        Args:
+            feishu_client: FeishuClient 实例，使用其 _del_file 删除文件
+            store: 可选的 CleanupStore，持久化待删除列表
+            workers: 并发删除的 worker 数
+            include_in_use: 启动时是否同时清理上次运行中登记后未完成的文件(不从断点恢复时，这些文件已无用)
+        """
+        self.feishu_client = feishu_client
+        self.store = store
+        self.workers = max(1, workers)
+        self.include_in_use = include_in_use
+        self.deleted = []
+        self.failed = []
+        self._queue = None
+        self._queued = set()
+        self._tasks = []
+
+    @property
+    def running(self):
+        return self._queue is not None
+
+    def track(self, token, file_type='file', reason=''):
+        """登记一个之后需要删除的文件，进程崩溃时下次运行仍能清理"""
+        if self.store is not None:
+            self.store.track(token, file_type, reason)
+
+    def untrack(self, token, file_type='file'):
+        """文件转为正式使用(如文档迁移成功)，不再需要删除"""
+        if self.store is not None:
+            self.store.remove(token, file_type)
+
+    def enqueue(self, token, file_type='file', reason=''):
+        """把文件加入删除队列，立即返回"""
+        if self.store is not None:
+            self.store.mark_ready(token, file_type, reason)
+        if self._queue is None:
+            raise Exception("删除队列尚未启动")
+        # 同一个文件只删除一次(例如清理命令同时从待删除列表和文件夹中找到它)
+        if (token, file_type) not in self._queued:
+            self._queued.add((token, file_type))
+            self._queue.put_nowait((token, file_type, reason))
+
+    def start(self):
+        """启动后台 worker，并把上次运行遗留的待删除文件放入队列"""
+        self._queue = asyncio.Queue()
+        if self.store is not None:
+            leftovers = self.store.pending(self.include_in_use)
+            if leftovers:
+                print(f"[DEBUG] 清理上次运行遗留的 {len(leftovers)} 个文件")
+            for token, file_type, reason in leftovers:
+                self.enqueue(token, file_type, reason)
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        return self
+
+    async def _worker(self):
+        metrics = self.feishu_client.metrics
+        while True:
+            token, file_type, reason = await self._queue.get()
+            try:
+                with metrics.timer('cleanup'):
+                    await self.feishu_client._del_file(token, file_type=file_type)
+                if self.store is not None:
+                    self.store.remove(token, file_type)
+                self.deleted.append((token, file_type, reason))
+                metrics.inc('cleanup_deleted')
+            except Exception as e:
+                print(f"[DEBUG] 后台删除失败: {token} ({file_type}) - {str(e)}")
+                if self.store is not None and self.store.record_failure(token, file_type):
+                    print(f"[DEBUG] 多次删除失败，不再重试: {token}")
+                self.failed.append((token, file_type, reason))
+                metrics.inc('cleanup_failed')
+            finally:
+                self._queue.task_done()
+
+    async def drain(self):
+        """等待队列中的文件全部处理完，然后停止 worker"""
+        if self._queue is None:
+            return
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._queued = set()
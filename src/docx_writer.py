@@ -0,0 +1,762 @@
+import os
+import re
+from difflib import SequenceMatcher
+from urllib.parse import quote, unquote
+
+# lark_oapi 导入较慢，SDK 的模型类在构造请求的函数中导入，解析 Markdown(plan 命令、拆分统计等)不需要加载 SDK
+from src.manifest import cached_file_hash
+from src.markdown_parser import closes_fence, default_path_cache, open_fence
+
+# 飞书文档块类型
+BLOCK_TYPE_TEXT = 2
+BLOCK_TYPE_HEADING1 = 3  # heading1 ~ heading9 依次为 3 ~ 11
+BLOCK_TYPE_BULLET = 12
+BLOCK_TYPE_ORDERED = 13
+BLOCK_TYPE_CODE = 14
+BLOCK_TYPE_TODO = 17
+BLOCK_TYPE_DIVIDER = 22
+BLOCK_TYPE_IMAGE = 27
+BLOCK_TYPE_TABLE = 31
+BLOCK_TYPE_TABLE_CELL = 32
+BLOCK_TYPE_QUOTE_CONTAINER = 34
+
+# 带文本内容的块类型及其在 Block 中的字段名
+TEXT_BLOCK_FIELDS = {
+    BLOCK_TYPE_TEXT: 'text',
+    **{BLOCK_TYPE_HEADING1 + level: f'heading{level + 1}' for level in range(9)},
+    BLOCK_TYPE_BULLET: 'bullet',
+    BLOCK_TYPE_ORDERED: 'ordered',
+    BLOCK_TYPE_CODE: 'code',
+    BLOCK_TYPE_TODO: 'todo',
+}
+
+# 创建子块接口单次最多 50 个块，创建嵌套块接口单次最多 1000 个块
+CHILDREN_BATCH_LIMIT = 50
+DESCENDANT_BATCH_LIMIT = 1000
+
+# 代码块语言(飞书 CodeLanguage 枚举)，未列出的语言按纯文本处理
+CODE_LANGUAGES = {
+    'bash': 7, 'sh': 7, 'csharp': 8, 'cs': 8, 'c++': 9, 'cpp': 9, 'c': 10, 'css': 12,
+    'dart': 15, 'dockerfile': 18, 'go': 22, 'golang': 22, 'groovy': 23, 'html': 24, 'http': 26,
+    'haskell': 27, 'json': 28, 'java': 29, 'javascript': 30, 'js': 30, 'julia': 31, 'kotlin': 32,
+    'latex': 33, 'tex': 33, 'lua': 36, 'matlab': 37, 'makefile': 38, 'markdown': 39, 'md': 39,
+    'nginx': 40, 'objective-c': 41, 'objc': 41, 'php': 43, 'perl': 44, 'powershell': 46,
+    'protobuf': 48, 'proto': 48, 'python': 49, 'py': 49, 'r': 50, 'ruby': 52, 'rb': 52,
+    'rust': 53, 'rs': 53, 'scss': 55, 'sql': 56, 'scala': 57, 'shell': 60, 'zsh': 60,
+    'swift': 61, 'thrift': 62, 'typescript': 63, 'ts': 63, 'xml': 66, 'yaml': 67, 'yml': 67,
+    'cmake': 68, 'diff': 69, 'graphql': 71,
+}
+
+_HEADING_RE = re.compile(r'^\s{0,3}(#{1,6})(?:\s+(.*?))?\s*#*\s*$')
+_HR_RE = re.compile(r'^\s{0,3}([-*_])(?:\s*\1){2,}\s*$')
+_LIST_RE = re.compile(r'^(\s*)([-*+]|\d{1,9}[.)])\s+(.*)$')
+_TODO_RE = re.compile(r'^\[([ xX])\]\s+(.*)$')
+_QUOTE_RE = re.compile(r'^\s{0,3}>\s?(.*)$')
+_TABLE_SEP_RE = re.compile(r'^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$')
+# 独占一行的图片，尖括号内的地址可以含空格
+_IMAGE_LINE_RE = re.compile(r'^\s*!\[([^\]]*)\]\(\s*(?:<([^>]*)>|([^)\s]*))(?:\s+"[^"]*")?\s*\)\s*$')
+
+_INLINE_RE = re.compile(
+    r'\\(?P<escaped>[\\`*_{}\[\]()#+\-.!~|<>])'
+    r'|(?P<ticks>`+)(?P<code>.+?)(?P=ticks)'
+    r'|!\[(?P<img_alt>[^\]]*)\]\((?P<img_src>[^)\s]*)(?:\s+"[^"]*")?\)'
+    r'|\[(?P<link_text>[^\]]+)\]\((?P<link_url>[^)\s]*)(?:\s+"[^"]*")?\)'
+    r'|<(?P<autolink>https?://[^>\s]+)>'
+    r'|(?P<strong_mark>\*\*|__)(?P<strong>.+?)(?P=strong_mark)'
+    r'|~~(?P<strike>.+?)~~'
+    r'|(?P<em_mark>[*_])(?P<em>[^\s*_](?:.*?[^\s])?)(?P=em_mark)'
+)
+
+
+def parse_inlines(text, style=None):
+    """解析行内样式
+    Returns:
+        list: [(文本, 样式 dict)]，样式键为 bold/italic/strikethrough/inline_code/link
+    """
+    style = style or {}
+    inlines = []
+    pos = 0
+    for m in _INLINE_RE.finditer(text):
+        if m.start() > pos:
+            inlines.append((text[pos:m.start()], style))
+        pos = m.end()
+
+        if m.group('escaped'):
+            inlines.append((m.group('escaped'), style))
+        elif m.group('code') is not None:
+            inlines.append((m.group('code').strip(), {**style, 'inline_code': True}))
+        elif m.group('img_src') is not None:
+            # 行内图片无法放进文本块，保留替代文本
+            inlines.append((m.group('img_alt') or m.group('img_src'), style))
+        elif m.group('link_text') is not None:
+            inlines.extend(parse_inlines(m.group('link_text'), {**style, 'link': m.group('link_url')}))
+        elif m.group('autolink'):
+            inlines.append((m.group('autolink'), {**style, 'link': m.group('autolink')}))
+        elif m.group('strong') is not None:
+            inlines.extend(parse_inlines(m.group('strong'), {**style, 'bold': True}))
+        elif m.group('strike') is not None:
+            inlines.extend(parse_inlines(m.group('strike'), {**style, 'strikethrough': True}))
+        elif m.group('em') is not None:
+            inlines.extend(parse_inlines(m.group('em'), {**style, 'italic': True}))
+
+    if pos < len(text):
+        inlines.append((text[pos:], style))
+    return [(content, s) for content, s in inlines if content]
+
+
+def _split_table_row(line):
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|') and not line.endswith('\\|'):
+        line = line[:-1]
+    cells = re.split(r'(?<!\\)\|', line)
+    return [cell.strip().replace('\\|', '|') for cell in cells]
+
+
+def parse_markdown(md_text):
+    """把 Markdown 解析为块节点列表
+
+    节点为 dict，type 取值: heading/text/bullet/ordered/todo/code/quote/divider/image/table，
+    列表项与引用带 children。只有独占一段的图片会成为 image 节点，其 src 为 Markdown 中的原始地址。
+    """
+    return _parse_lines(md_text.replace('\r\n', '\n').replace('\r', '\n').split('\n'))
+
+
+def _parse_lines(lines):
+    nodes = []
+    paragraph = []
+
+    def flush_paragraph():
+        if paragraph:
+            nodes.extend(_paragraph_nodes(paragraph))
+            paragraph.clear()
+
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+
+        # 代码块
+        fence = open_fence(line)
+        if fence:
+            flush_paragraph()
+            # 信息字符串的第一个词为语言
+            info = line.lstrip()[len(fence):].split()
+            language = info[0].split('`')[0].lower() if info else ''
+            code_lines = []
+            i += 1
+            while i < len(lines) and not closes_fence(lines[i], fence):
+                code_lines.append(lines[i])
+                i += 1
+            nodes.append({'type': 'code', 'language': language, 'content': '\n'.join(code_lines)})
+            i += 1
+            continue
+
+        if not line.strip():
+            flush_paragraph()
+            i += 1
+            continue
+
+        # Setext 标题: 段落下一行是 === 或 ---
+        if paragraph and re.match(r'^\s{0,3}(=+|-+)\s*$', line):
+            level = 1 if line.strip().startswith('=') else 2
+            nodes.append({'type': 'heading', 'level': level, 'inlines': parse_inlines(' '.join(paragraph))})
+            paragraph.clear()
+            i += 1
+            continue
+
+        heading = _HEADING_RE.match(line)
+        if heading:
+            flush_paragraph()
+            nodes.append({
+                'type': 'heading',
+                'level': len(heading.group(1)),
+                'inlines': parse_inlines(heading.group(2) or ''),
+            })
+            i += 1
+            continue
+
+        if _HR_RE.match(line):
+            flush_paragraph()
+            nodes.append({'type': 'divider'})
+            i += 1
+            continue
+
+        # 表格: 表头行 + 分隔行
+        if '|' in line and i + 1 < len(lines) and _TABLE_SEP_RE.match(lines[i + 1]) and '-' in lines[i + 1]:
+            flush_paragraph()
+            header = _split_table_row(line)
+            rows = [header]
+            i += 2
+            while i < len(lines) and '|' in lines[i] and lines[i].strip():
+                row = _split_table_row(lines[i])
+                rows.append((row + [''] * len(header))[:len(header)])
+                i += 1
+            nodes.append({'type': 'table', 'rows': [[parse_inlines(cell) for cell in row] for row in rows]})
+            continue
+
+        # 引用
+        if _QUOTE_RE.match(line):
+            flush_paragraph()
+            quote_lines = []
+            while i < len(lines) and lines[i].strip() and _QUOTE_RE.match(lines[i]):
+                quote_lines.append(_QUOTE_RE.match(lines[i]).group(1))
+                i += 1
+            nodes.append({'type': 'quote', 'children': _nested_only(_parse_lines(quote_lines))})
+            continue
+
+        # 列表
+        if _LIST_RE.match(line):
+            flush_paragraph()
+            i = _parse_list(lines, i, nodes)
+            continue
+
+        paragraph.append(line.strip())
+        i += 1
+
+    flush_paragraph()
+    return nodes
+
+
+def _paragraph_nodes(paragraph):
+    """段落: 独占一行的图片拆成图片节点，其余行合并为文本节点"""
+    nodes = []
+    text_lines = []
+    for line in paragraph:
+        image = _IMAGE_LINE_RE.match(line)
+        if image:
+            if text_lines:
+                nodes.append({'type': 'text', 'inlines': parse_inlines('\n'.join(text_lines))})
+                text_lines = []
+            src = image.group(2) if image.group(2) is not None else image.group(3)
+            nodes.append({'type': 'image', 'alt': image.group(1), 'src': src})
+        else:
+            text_lines.append(line)
+    if text_lines:
+        nodes.append({'type': 'text', 'inlines': parse_inlines('\n'.join(text_lines))})
+    return nodes
+
+
+def _nested_only(nodes):
+    """嵌套在列表/引用中的图片无法单独成块，降级为文本"""
+    result = []
+    for node in nodes:
+        if node['type'] == 'image':
+            node = {'type': 'text', 'inlines': [(node['alt'] or node['src'], {})]}
+        elif 'children' in node:
+            node = {**node, 'children': _nested_only(node['children'])}
+        result.append(node)
+    return result
+
+
+def _parse_list(lines, i, nodes):
+    """解析一个列表(含嵌套)，返回列表结束后的行号"""
+    stack = []  # [(缩进, 节点)]
+    while i < len(lines):
+        line = lines[i]
+        item = _LIST_RE.match(line)
+        if item:
+            indent = len(item.group(1).expandtabs(4))
+            marker = item.group(2)
+            content = item.group(3)
+
+            node = {'type': 'bullet' if marker in '-*+' else 'ordered', 'children': []}
+            todo = _TODO_RE.match(content)
+            if todo and node['type'] == 'bullet':
+                node = {'type': 'todo', 'done': todo.group(1) != ' ', 'children': []}
+                content = todo.group(2)
+            node['lines'] = [content]
+
+            while stack and stack[-1][0] >= indent:
+                stack.pop()
+            if stack:
+                stack[-1][1]['children'].append(node)
+            else:
+                nodes.append(node)
+            stack.append((indent, node))
+            i += 1
+        elif line.strip() and line.startswith((' ', '\t')) and stack:
+            # 列表项的续行
+            stack[-1][1]['lines'].append(line.strip())
+            i += 1
+        elif not line.strip() and i + 1 < len(lines) and _LIST_RE.match(lines[i + 1]):
+            # 列表项之间的空行
+            i += 1
+        else:
+            break
+
+    def finish(node):
+        node['inlines'] = parse_inlines('\n'.join(node.pop('lines')))
+        for child in node['children']:
+            finish(child)
+
+    for node in nodes:
+        if node['type'] in ('bullet', 'ordered', 'todo') and 'lines' in node:
+            finish(node)
+    return i
+
+
+def _text_elements(inlines):
+    from lark_oapi.api.docx.v1 import Link, TextElement, TextElementStyle, TextRun
+
+    elements = []
+    for content, style in inlines:
+        style_builder = TextElementStyle.builder()
+        if style.get('bold'):
+            style_builder = style_builder.bold(True)
+        if style.get('italic'):
+            style_builder = style_builder.italic(True)
+        if style.get('strikethrough'):
+            style_builder = style_builder.strikethrough(True)
+        if style.get('inline_code'):
+            style_builder = style_builder.inline_code(True)
+        link = style.get('link')
+        if link and link.startswith(('http://', 'https://')):
+            # 飞书要求链接地址做 URL 编码；相对链接无法直接使用，保留为普通文本
+            style_builder = style_builder.link(Link.builder().url(quote(link, safe='')).build())
+        elements.append(
+            TextElement.builder()
+            .text_run(TextRun.builder().content(content).text_element_style(style_builder.build()).build())
+            .build()
+        )
+    if not elements:
+        elements.append(TextElement.builder().text_run(TextRun.builder().content('').build()).build())
+    return elements
+
+
+def _text(inlines, style=None):
+    from lark_oapi.api.docx.v1 import Text
+
+    builder = Text.builder().elements(_text_elements(inlines))
+    if style is not None:
+        builder = builder.style(style)
+    return builder.build()
+
+
+def _node_inlines(node):
+    if node['type'] == 'code':
+        return [(node['content'], {})]
+    return node['inlines']
+
+
+def build_block(node, block_id=None, children=None):
+    """把单个节点转换为 SDK 的 Block(不含子块内容)"""
+    from lark_oapi.api.docx.v1 import (
+        Block, Divider, Image, QuoteContainer, Table, TableCell, TableProperty, TextStyle,
+    )
+
+    builder = Block.builder()
+    if block_id:
+        builder = builder.block_id(block_id)
+    if children:
+        builder = builder.children(children)
+
+    node_type = node['type']
+    if node_type == 'heading':
+        level = min(node['level'], 9)
+        builder = builder.block_type(BLOCK_TYPE_HEADING1 + level - 1)
+        builder = getattr(builder, f'heading{level}')(_text(node['inlines']))
+    elif node_type == 'bullet':
+        builder = builder.block_type(BLOCK_TYPE_BULLET).bullet(_text(node['inlines']))
+    elif node_type == 'ordered':
+        builder = builder.block_type(BLOCK_TYPE_ORDERED).ordered(_text(node['inlines']))
+    elif node_type == 'todo':
+        builder = builder.block_type(BLOCK_TYPE_TODO).todo(
+            _text(node['inlines'], TextStyle.builder().done(node['done']).build())
+        )
+    elif node_type == 'code':
+        language = CODE_LANGUAGES.get(node['language'], 1)
+        builder = builder.block_type(BLOCK_TYPE_CODE).code(
+            _text(_node_inlines(node), TextStyle.builder().language(language).wrap(False).build())
+        )
+    elif node_type == 'divider':
+        builder = builder.block_type(BLOCK_TYPE_DIVIDER).divider(Divider.builder().build())
+    elif node_type == 'image':
+        # 先创建空图片块，上传图片后再填入 token
+        builder = builder.block_type(BLOCK_TYPE_IMAGE).image(Image.builder().build())
+    elif node_type == 'quote':
+        builder = builder.block_type(BLOCK_TYPE_QUOTE_CONTAINER).quote_container(QuoteContainer.builder().build())
+    elif node_type == 'table':
+        rows = node['rows']
+        builder = builder.block_type(BLOCK_TYPE_TABLE).table(
+            Table.builder()
+            .property(
+                TableProperty.builder().row_size(len(rows)).column_size(len(rows[0])).header_row(True).build()
+            )
+            .build()
+        )
+    elif node_type == 'table_cell':
+        builder = builder.block_type(BLOCK_TYPE_TABLE_CELL).table_cell(TableCell.builder().build())
+    else:
+        builder = builder.block_type(BLOCK_TYPE_TEXT).text(_text(node['inlines']))
+    return builder.build()
+
+
+def is_nested(node):
+    """需要通过嵌套块接口创建的节点"""
+    return node['type'] in ('table', 'quote') or bool(node.get('children'))
+
+
+def count_blocks(node):
+    """节点展开后的块数量"""
+    if node['type'] == 'table':
+        return 1 + sum(2 * len(row) for row in node['rows'])
+    return 1 + sum(count_blocks(child) for child in node.get('children', []))
+
+
+def split_table(node, limit=DESCENDANT_BATCH_LIMIT):
+    """单个表格超过嵌套块接口上限时，按行拆成多个表格，每个都带表头"""
+    rows = node['rows']
+    if count_blocks(node) <= limit or len(rows) < 2:
+        return [node]
+    rows_per_table = max(1, (limit - 1) // (2 * len(rows[0])) - 1)
+    header, body = rows[0], rows[1:]
+    return [
+        {'type': 'table', 'rows': [header] + body[start:start + rows_per_table]}
+        for start in range(0, len(body), rows_per_table)
+    ]
+
+
+def flatten_descendants(node, id_prefix):
+    """把嵌套节点展开为嵌套块接口需要的 (顶层临时 id, [Block])"""
+    descendants = []
+    counter = [0]
+
+    def new_id():
+        counter[0] += 1
+        return f'{id_prefix}_{counter[0]}'
+
+    def visit(node):
+        block_id = new_id()
+        if node['type'] == 'table':
+            cell_ids = []
+            cell_blocks = []
+            for row in node['rows']:
+                for cell_inlines in row:
+                    cell_id, text_id = new_id(), new_id()
+                    cell_ids.append(cell_id)
+                    cell_blocks.append(build_block({'type': 'table_cell'}, cell_id, [text_id]))
+                    cell_blocks.append(build_block({'type': 'text', 'inlines': cell_inlines}, text_id))
+            descendants.append(build_block(node, block_id, cell_ids))
+            descendants.extend(cell_blocks)
+            return block_id
+
+        index = len(descendants)
+        descendants.append(None)  # 占位，保证父块排在子块之前
+        child_ids = [visit(child) for child in node.get('children', [])]
+        descendants[index] = build_block(node, block_id, child_ids)
+        return block_id
+
+    return visit(node), descendants
+
+
+def _elements_signature(elements):
+    """文本元素的比较键: 相邻且样式相同的文本合并，忽略空文本"""
+    runs = []
+    for element in elements or []:
+        text_run = element.text_run
+        if text_run is None:
+            # 提及、公式等非文本元素，本工具不会生成，只要存在就视为与新内容不同
+            runs.append((None, type(element).__name__))
+            continue
+        style = text_run.text_element_style
+        link = style.link.url if style is not None and style.link is not None else None
+        key = (
+            bool(style and style.bold),
+            bool(style and style.italic),
+            bool(style and style.strikethrough),
+            bool(style and style.inline_code),
+            unquote(link) if link else None,
+        )
+        if not text_run.content:
+            continue
+        if runs and runs[-1][1] == key:
+            runs[-1] = (runs[-1][0] + text_run.content, key)
+        else:
+            runs.append((text_run.content, key))
+    return tuple(runs)
+
+
+def block_signature(block, blocks_by_id, image_key):
+    """块的比较键，包含块类型、文本及样式、表格尺寸、图片内容和所有子块
+    Args:
+        blocks_by_id: {block_id: Block}，用于查找子块
+        image_key: 根据图片块返回其图片内容标识的函数
+    Returns:
+        tuple: (块类型, 文本样式, 文本, 附加信息, 子块比较键)
+    """
+    style_key = text_key = extra = None
+    field = TEXT_BLOCK_FIELDS.get(block.block_type)
+    text = getattr(block, field, None) if field else None
+    if text is not None:
+        text_key = _elements_signature(text.elements)
+        style = text.style
+        if block.block_type == BLOCK_TYPE_CODE:
+            style_key = style.language if style is not None else None
+        elif block.block_type == BLOCK_TYPE_TODO:
+            style_key = bool(style and style.done)
+    elif block.block_type == BLOCK_TYPE_IMAGE:
+        extra = image_key(block)
+    elif block.block_type == BLOCK_TYPE_TABLE and block.table is not None and block.table.property is not None:
+        extra = (block.table.property.row_size, block.table.property.column_size)
+
+    children = tuple(
+        block_signature(blocks_by_id[child_id], blocks_by_id, image_key)
+        for child_id in block.children or []
+        if child_id in blocks_by_id
+    )
+    return block.block_type, style_key, text_key, extra, children
+
+
+def node_signature(node, file_path, image_hash):
+    """新节点的比较键，与 block_signature 的结果可直接比较
+    Args:
+        image_hash: 根据本地图片路径返回内容哈希的函数
+    """
+    if node['type'] == 'image':
+        return BLOCK_TYPE_IMAGE, None, None, image_hash(resolve_image_path(file_path, node['src'])), ()
+    if is_nested(node):
+        top_id, blocks = flatten_descendants(node, 'sig')
+        blocks_by_id = {block.block_id: block for block in blocks}
+        return block_signature(blocks_by_id[top_id], blocks_by_id, lambda block: None)
+    return block_signature(build_block(node), {}, lambda block: None)
+
+
+def prepare_nodes(nodes, file_path):
+    """写入前的整理: 未下载的远程图片或找不到的本地图片降级为链接文本，超大表格拆分"""
+    prepared = []
+    for node in nodes:
+        if node['type'] == 'image' and resolve_image_path(file_path, node['src']) is None:
+            # 未下载的远程图片或找不到的本地图片，保留为链接文本
+            node = {'type': 'text', 'inlines': [(node['alt'] or node['src'], {'link': node['src']})]}
+        prepared.extend(split_table(node) if node['type'] == 'table' else [node])
+    return prepared
+
+
+def resolve_image_path(file_path, src):
+    """解析图片的本地路径，远程图片或文件不存在时返回 None"""
+    return default_path_cache.resolve(os.path.dirname(file_path), src)
+
+
+class DocxWriter:
+    """直接写入模式: 本地把 Markdown 解析为文档块，直接创建文档并批量写入
+
+    不再经过 上传 md → 导入任务 → 轮询 → 列出块匹配图片 的流程。图片块先以空块创建，
+    根据创建接口返回的 block_id 上传图片，再批量填入图片 token。
+    """
+
+    def __init__(self, feishu_client):
+        self.feishu_client = feishu_client
+
+    async def write(self, file_path, title, folder_token, checkpoint=None):
+        """
+        Returns:
+            str: 创建的云文档 token
+        """
+        client = self.feishu_client
+        with open(file_path, 'r', encoding='utf-8') as f:
+            nodes = parse_markdown(f.read())
+        nodes = await self._localize_remote_images(nodes)
+
+        # 上次中断时已创建但未写完的文档无法续写，删除后重新创建
+        if checkpoint is not None and checkpoint.doc_token:
+            print(f"[DEBUG] 删除上次未写完的文档: {checkpoint.doc_token}")
+            try:
+                await client._discard_file(checkpoint.doc_token, "docx", title)
+            except Exception as e:
+                print(f"[DEBUG] 删除未写完的文档失败: {str(e)}")
+            checkpoint.reset()
+
+        doc_token = await client._create_document(title, folder_token)
+        client._track_file(doc_token, "docx", title)
+        if checkpoint is not None:
+            checkpoint.doc_resolved(doc_token)
+
+        try:
+            with client.metrics.timer('write_blocks'):
+                image_paths, image_block_ids = await self.write_nodes(doc_token, doc_token, nodes, file_path)
+            if image_paths:
+                await client._patch_image_blocks(doc_token, image_paths, image_block_ids, checkpoint)
+        except Exception as e:
+            print(f"[ERROR] 写入文档 '{title}' 时发生错误: {str(e)}")
+            try:
+                await client._discard_file(doc_token, "docx", title)
+                print(f"  - 已清理残留 Doc 文档: {doc_token}")
+            except:
+                pass
+            if checkpoint is not None:
+                checkpoint.reset()
+            raise e
+
+        client._untrack_file(doc_token, "docx")
+        if checkpoint is not None:
+            checkpoint.md_deleted()
+        return doc_token
+
+    async def _localize_remote_images(self, nodes):
+        """下载远程图片，图片节点的地址换成本地缓存路径；下载失败的保持原样，写入时降级为链接文本"""
+        urls = [node['src'] for node in nodes if node['type'] == 'image']
+        remote_paths = await self.feishu_client._fetch_remote_images(urls)
+        if not remote_paths:
+            return nodes
+        return [
+            {**node, 'src': remote_paths[node['src']]} if node['type'] == 'image' and node['src'] in remote_paths else node
+            for node in nodes
+        ]
+
+    async def write_nodes(self, doc_token, parent_block_id, nodes, file_path, index=-1):
+        """按顺序把节点写入 parent_block_id 之下
+        Args:
+            index: 插入位置，-1 表示追加到末尾
+        Returns:
+            (image_paths, image_block_ids): 需要上传的本地图片及其对应的图片块
+        """
+        client = self.feishu_client
+        image_paths = []
+        image_block_ids = []
+
+        # 按顺序把节点分组: 连续的简单节点一批，连续的嵌套节点一批
+        groups = []
+        for node in prepare_nodes(nodes, file_path):
+            nested = is_nested(node)
+            size = count_blocks(node) if nested else 1
+            limit = DESCENDANT_BATCH_LIMIT if nested else CHILDREN_BATCH_LIMIT
+            if groups and groups[-1][0] == nested and groups[-1][1] + size <= limit:
+                groups[-1][2].append(node)
+                groups[-1][1] += size
+            else:
+                groups.append([nested, size, [node]])
+
+        position = index
+        for group_index, (nested, _, group_nodes) in enumerate(groups):
+            if nested:
+                children_ids = []
+                descendants = []
+                for node_index, node in enumerate(group_nodes):
+                    top_id, blocks = flatten_descendants(node, f'tmp{group_index}_{node_index}')
+                    children_ids.append(top_id)
+                    descendants.extend(blocks)
+                await client._create_descendants(doc_token, parent_block_id, children_ids, descendants, position)
+            else:
+                created = await client._create_children(
+                    doc_token, parent_block_id, [build_block(node) for node in group_nodes], position
+                )
+                for node, block in zip(group_nodes, created):
+                    if node['type'] == 'image':
+                        image_paths.append(resolve_image_path(file_path, node['src']))
+                        image_block_ids.append(block.block_id)
+
+            if position != -1:
+                position += len(group_nodes)
+
+        return image_paths, image_block_ids
+
+    async def update(self, file_path, doc_token, image_hashes=None):
+        """块级增量更新已有文档
+
+        列出文档现有的顶层块，与新 Markdown 解析出的块逐一比较(比较键见 block_signature)，
+        只删除、插入发生变化的部分: 仅文本变化的块原地更新文本，仅图片变化的图片块重新上传图片，
+        其余块保持不动，文档 token、链接和评论均得以保留。
+        Args:
+            image_hashes: {图片块 block_id: 图片内容哈希}，上次写入时记录；缺失的图片块视为已变化
+        Returns:
+            str: 文档 token(与传入的相同)
+        """
+        from lark_oapi.api.docx.v1 import UpdateBlockRequest, UpdateTextElementsRequest
+
+        from src.feishu_client import BATCH_UPDATE_LIMIT
+
+        client = self.feishu_client
+        image_hashes = image_hashes or {}
+        with open(file_path, 'r', encoding='utf-8') as f:
+            nodes = parse_markdown(f.read())
+        nodes = prepare_nodes(await self._localize_remote_images(nodes), file_path)
+
+        with client.metrics.timer('list_blocks'):
+            blocks = await client._list_document_blocks(doc_token)
+        blocks_by_id = {block.block_id: block for block in blocks}
+        if doc_token not in blocks_by_id:
+            raise Exception(f"文档缺少根块: {doc_token}")
+        old_ids = [block_id for block_id in blocks_by_id[doc_token].children or [] if block_id in blocks_by_id]
+
+        file_hashes = {}
+
+        def image_hash(path):
+            if path not in file_hashes:
+                file_hashes[path] = cached_file_hash(path)
+            return file_hashes[path]
+
+        old_keys = [
+            block_signature(blocks_by_id[block_id], blocks_by_id, lambda block: image_hashes.get(block.block_id))
+            for block_id in old_ids
+        ]
+        new_keys = [node_signature(node, file_path, image_hash) for node in nodes]
+
+        image_paths = []
+        image_block_ids = []
+        text_updates = []
+        retained_images = {}
+        stats = {'deleted': 0, 'inserted': 0}
+
+        async def delete(start, end):
+            await client._delete_children(doc_token, doc_token, start, end)
+            stats['deleted'] += end - start
+
+        async def insert(new_nodes, index):
+            with client.metrics.timer('write_blocks'):
+                paths, block_ids = await self.write_nodes(doc_token, doc_token, new_nodes, file_path, index)
+            image_paths.extend(paths)
+            image_block_ids.extend(block_ids)
+            stats['inserted'] += len(new_nodes)
+
+        # 从后往前应用差异，前面块的下标不受影响
+        opcodes = SequenceMatcher(None, old_keys, new_keys, autojunk=False).get_opcodes()
+        for tag, i1, i2, j1, j2 in reversed(opcodes):
+            if tag == 'equal':
+                for block_id, node in zip(old_ids[i1:i2], nodes[j1:j2]):
+                    if node['type'] == 'image':
+                        retained_images[block_id] = resolve_image_path(file_path, node['src'])
+                continue
+
+            # 替换区间内一一对应的块尽量原地更新，多出的旧块删除、多出的新块插入
+            paired = min(i2 - i1, j2 - j1) if tag == 'replace' else 0
+            if i2 - i1 > paired:
+                await delete(i1 + paired, i2)
+            if j2 - j1 > paired:
+                await insert(nodes[j1 + paired:j2], i1 + paired)
+
+            for k in reversed(range(paired)):
+                block_id, node = old_ids[i1 + k], nodes[j1 + k]
+                old_key, new_key = old_keys[i1 + k], new_keys[j1 + k]
+                if node['type'] == 'image' and old_key[0] == BLOCK_TYPE_IMAGE:
+                    # 图片内容变化: 重新上传到原图片块
+                    image_paths.append(resolve_image_path(file_path, node['src']))
+                    image_block_ids.append(block_id)
+                elif old_key[2] is not None and old_key[:2] == new_key[:2] and not old_key[4] and not new_key[4]:
+                    # 块类型和样式相同，只有文本变化
+                    text_updates.append(
+                        UpdateBlockRequest.builder()
+                        .block_id(block_id)
+                        .update_text_elements(
+                            UpdateTextElementsRequest.builder().elements(_text_elements(_node_inlines(node))).build()
+                        )
+                        .build()
+                    )
+                else:
+                    await delete(i1 + k, i1 + k + 1)
+                    await insert([node], i1 + k)
+
+        for start in range(0, len(text_updates), BATCH_UPDATE_LIMIT):
+            with client.metrics.timer('patch'):
+                await client._batch_update_blocks(doc_token, text_updates[start:start + BATCH_UPDATE_LIMIT])
+
+        if image_paths:
+            await client._patch_image_blocks(doc_token, image_paths, image_block_ids)
+        # 未变化的图片块也记录下来，供下次比较
+        client.image_blocks.setdefault(doc_token, {}).update(retained_images)
+
+        print(
+            f"[DEBUG] 增量更新文档 {doc_token}: 共 {len(old_ids)} 块, 删除 {stats['deleted']} 块, "
+            f"新增 {stats['inserted']} 块, 更新文本 {len(text_updates)} 块, 上传图片 {len(image_paths)} 张"
+        )
+        return doc_token
@@ -1,38 +1,157 @@
+import asyncio
+import contextlib
+import importlib
 import json
+import mmap
 import os
-import time
 import io
+import time
+import zlib
 from typing import List
-import lark_oapi as lark
-from lark_oapi.api.auth.v3 import *
-from lark_oapi.api.drive.v1 import *
-from lark_oapi.api.docx.v1 import *
-from PIL import Image
 
-from config.config import FEISHU_APP_ID, FEISHU_APP_SECRET, DEFAULT_PARENT_FOLDER_TOKEN
-from src.markdown_parser import MarkdownParser
+from config.config import (
+    FEISHU_APP_ID,
+    FEISHU_APP_SECRET,
+    FEISHU_DOMAIN,
+    DEFAULT_PARENT_FOLDER_TOKEN,
+    FEISHU_RATE_LIMITS,
+    IMAGE_UPLOAD_CONCURRENCY,
+    MIGRATION_CONCURRENCY,
+    IMAGE_CACHE_DIR,
+    IMAGE_FORMAT,
+    IMAGE_QUALITY,
+    IMAGE_MAX_WIDTH,
+    IMAGE_PROCESS_WORKERS,
+    MULTIPART_THRESHOLD_MB,
+    UPLOAD_PART_CONCURRENCY,
+    TOKEN_CACHE_PATH,
+    TOKEN_REFRESH_MARGIN,
+    REMOTE_IMAGES,
+    REMOTE_IMAGE_CACHE_DIR,
+    REMOTE_IMAGE_CONCURRENCY,
+    REMOTE_IMAGE_TIMEOUT,
+    REMOTE_IMAGE_MAX_MB,
+    REMOTE_IMAGE_MAX_AGE,
+    SPLIT_MAX_KB,
+    SPLIT_MAX_BLOCKS,
+    DOC_URL_PREFIX,
+)
+from src.markdown_parser import scan_image_refs
+from src.md_splitter import split_markdown
+from src.import_poller import ImportTaskPoller
+from src.image_pipeline import ImagePipeline
+from src.journal import DocumentCheckpoint
+from src.metrics import Metrics
+from src.remote_images import RemoteImageFetcher
+from src.token_manager import TenantTokenManager, TOKEN_INVALID_CODES
+from src.rate_limiter import RateLimiter, parse_rate_limits, is_rate_limited, get_retry_after, is_transient_error
+
+
+# docx 批量更新块接口单次请求的最大块数
+BATCH_UPDATE_LIMIT = 200
+
+# 拆分导入时，单个部分导入失败后的重试次数
+SPLIT_PART_RETRIES = 1
+
+# upload_all 单次上传的文件大小上限，超过时改用分片上传
+MULTIPART_THRESHOLD = MULTIPART_THRESHOLD_MB * 1024 * 1024
+
+# 进程内共享的限流器，所有 FeishuClient 实例共用同一份配额
+default_rate_limiter = RateLimiter(parse_rate_limits(FEISHU_RATE_LIMITS))
+
+# lark_oapi 导入耗时约 1 秒，推迟到第一次创建客户端时再导入
+lark = None
+SDK_MODULES = ("lark_oapi.api.auth.v3", "lark_oapi.api.drive.v1", "lark_oapi.api.docx.v1")
+
+
+def _load_sdk():
+    """导入 lark_oapi，并把 auth/drive/docx 的请求与模型类放入本模块命名空间(相当于延迟执行 import *)"""
+    global lark
+    if lark is not None:
+        return
+
+    module_globals = globals()
+    for module_name in SDK_MODULES:
+        module = importlib.import_module(module_name)
+        names = getattr(module, "__all__", None) or [name for name in vars(module) if not name.startswith("_")]
+        module_globals.update({name: getattr(module, name) for name in names if name not in module_globals})
+    lark = importlib.import_module("lark_oapi")
+
+
+@contextlib.contextmanager
+def _open_upload_source(source):
+    """把待上传内容统一成可切片的缓冲区: 文件以只读内存映射打开，按分片读取时才占用内存"""
+    if isinstance(source, (bytes, bytearray)):
+        yield source
+        return
+
+    with open(source, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
 
 
 class FeishuClient:
-    def __init__(self):
+    def __init__(self, rate_limiter=None, image_pipeline=None, metrics=None, token_manager=None, remote_images=None):
         self.app_id = FEISHU_APP_ID
         self.app_secret = FEISHU_APP_SECRET
         self.default_parent_folder_token = DEFAULT_PARENT_FOLDER_TOKEN
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        # 各阶段、各接口的耗时与计数
+        self.metrics = metrics or Metrics()
+        # 所有导入任务共用一个轮询器
+        self.import_poller = ImportTaskPoller(self._query_import_task)
+        # 上传前的图片预处理
+        self.image_pipeline = image_pipeline or ImagePipeline(
+            IMAGE_CACHE_DIR,
+            output_format=IMAGE_FORMAT,
+            quality=IMAGE_QUALITY,
+            max_width=IMAGE_MAX_WIDTH,
+            workers=IMAGE_PROCESS_WORKERS,
+        )
+        # 远程图片下载，所有文档共用连接池和磁盘缓存；REMOTE_IMAGES=false 时为 None
+        self.remote_images = remote_images
+        if self.remote_images is None and REMOTE_IMAGES:
+            self.remote_images = RemoteImageFetcher(
+                REMOTE_IMAGE_CACHE_DIR,
+                concurrency=REMOTE_IMAGE_CONCURRENCY,
+                timeout=REMOTE_IMAGE_TIMEOUT,
+                max_bytes=REMOTE_IMAGE_MAX_MB * 1024 * 1024,
+                max_age=REMOTE_IMAGE_MAX_AGE,
+                metrics=self.metrics,
+            )
+        # 本次运行中写入图片的图片块 {doc_token: {block_id: 本地图片路径}}，由调用方取走后记入清单
+        self.image_blocks = {}
+        # 本次运行中拆分导入的文档 {索引文档 token: [各部分文档 token]}，由调用方取走后记入清单
+        self.document_parts = {}
+        # 可选的后台删除队列(CleanupQueue)，由调用方设置；为 None 时在关键路径上同步删除
+        self.cleanup_queue = None
+        # 拆分导入时所有文档共用的部分导入并发数上限，(事件循环, Semaphore)
+        self._split_slots = None
 
-        # 初始化 SDK 客户端
+        # 初始化 SDK 客户端，访问令牌由 token_manager 统一管理后随请求传入
+        _load_sdk()
         self.client = (
             lark.Client.builder()
             .app_id(self.app_id)
             .app_secret(self.app_secret)
+            .domain(FEISHU_DOMAIN)
+            .enable_set_token(True)
             .log_level(lark.LogLevel.INFO)
             .build()
         )
 
-        # 获取访问令牌
-        self.access_token = self._get_access_token()
+        # 获取访问令牌: 磁盘缓存仍有效时不发请求，之后由后台线程在过期前刷新
+        self.token_manager = token_manager or TenantTokenManager(
+            self.app_id, self._get_access_token, TOKEN_CACHE_PATH, TOKEN_REFRESH_MARGIN
+        )
+        self.token_manager.get()
+        self.token_manager.start()
 
     def _get_access_token(self):
-        """获取飞书访问令牌"""
+        """请求新的飞书租户访问令牌
+        Returns:
+            (token, 有效期秒数)
+        """
         request: InternalTenantAccessTokenRequest = (
             InternalTenantAccessTokenRequest.builder()
             .request_body(
@@ -43,14 +162,88 @@ class FeishuClient:
             )
             .build()
         )
+        self.rate_limiter.acquire("auth")
         resp: InternalTenantAccessTokenResponse = self.client.auth.v3.tenant_access_token.internal(request)
         if resp.code != 0:
             print(f"[DEBUG] 获取访问令牌失败: code={resp.code}, msg={resp.msg}")
             raise Exception(f"获取访问令牌失败: code={resp.code}, msg={resp.msg}")
 
-        return json.loads(resp.raw.content).get("tenant_access_token")
+        self.metrics.inc("token_refreshes")
+        content = json.loads(resp.raw.content)
+        return content.get("tenant_access_token"), int(content.get("expire", 7200))
+
+    async def _acall(self, endpoint, method, request, stream=None, retry_on_error=False, max_retries=3):
+        """经过共享限流器调用飞书 API，限流与网络抖动时带抖动退避重试
+        Args:
+            endpoint: 限流器中的接口配额名称，如 drive.upload
+            method: SDK 的异步请求方法
+            request: SDK 请求对象
+            stream: 请求中携带的文件流，重试前需要回到开头
+            retry_on_error: 业务错误码(非限流)时是否也重试
+            max_retries: 最大重试次数
+        Returns:
+            SDK 响应对象，code 是否为 0 由调用方判断
+        """
+        for attempt in range(max_retries + 1):
+            await self.rate_limiter.aacquire(endpoint)
+            if stream is not None:
+                self.metrics.inc("bytes_sent", stream.seek(0, io.SEEK_END), endpoint)
+                stream.seek(0)
+
+            token = await self.token_manager.aget()
+            option = lark.RequestOption.builder().tenant_access_token(token).build()
+
+            start = time.monotonic()
+            try:
+                resp = await method(request, option)
+            except Exception as e:
+                self.metrics.observe_api(endpoint, time.monotonic() - start)
+                self.metrics.inc("network_errors", endpoint=endpoint)
+                # 捕获 JSON 解析错误或其他网络异常请求
+                if attempt < max_retries and is_transient_error(e):
+                    self.metrics.inc("retries", endpoint=endpoint)
+                    wait_time = self.rate_limiter.backoff_delay(attempt)
+                    print(f"[DEBUG] [NETWORK_ISSUE] {endpoint} 网络异常，等待 {wait_time:.1f}s 后重试: {str(e)}")
+                    await asyncio.sleep(wait_time)
+                    continue
+                raise
+
+            self.metrics.observe_api(endpoint, time.monotonic() - start)
+            if resp.code in TOKEN_INVALID_CODES and attempt < max_retries:
+                # 令牌被提前吊销或过期，作废后用新令牌重试
+                print(f"[DEBUG] {endpoint} 访问令牌无效(code={resp.code})，刷新后重试")
+                self.metrics.inc("retries", endpoint=endpoint)
+                self.token_manager.invalidate(token)
+                continue
+            if is_rate_limited(resp):
+                self.metrics.inc("throttles", endpoint=endpoint)
+                if attempt < max_retries:
+                    self.metrics.inc("retries", endpoint=endpoint)
+                    # 暂停整个接口的令牌发放，所有并发调用方一起退避
+                    wait_time = self.rate_limiter.penalize(endpoint, attempt, get_retry_after(resp))
+                    print(f"[DEBUG] {endpoint} 触发限流(code={resp.code})，暂停 {wait_time:.1f}s 后重试")
+                    continue
+            elif resp.code != 0 and retry_on_error and attempt < max_retries:
+                self.metrics.inc("retries", endpoint=endpoint)
+                wait_time = self.rate_limiter.backoff_delay(attempt)
+                print(f"[DEBUG] {endpoint} 调用失败: code={resp.code}, msg={resp.msg}，等待 {wait_time:.1f}s 后重试")
+                await asyncio.sleep(wait_time)
+                continue
+
+            if resp.code != 0:
+                self.metrics.inc("api_errors", endpoint=endpoint)
+            return resp
+
+    @staticmethod
+    def folder_display_name(folder_name):
+        """本地目录名对应的飞书文件夹名: 从右侧按空格拆分一次，取第一部分"""
+        return folder_name.rsplit(" ", 1)[0]
 
     def create_folder(self, folder_name, parent_token=None):
+        """同步创建飞书云文档文件夹，参数与返回值同 acreate_folder"""
+        return asyncio.run(self.acreate_folder(folder_name, parent_token))
+
+    async def acreate_folder(self, folder_name, parent_token=None):
         """创建飞书云文档文件夹
         Args:
             folder_name: 文件夹名称
@@ -58,7 +251,7 @@ class FeishuClient:
         Returns:
             str: 创建的文件夹 token
         """
-        folder_name = folder_name.rsplit(" ", 1)[0]  # 从右侧按空格拆分一次，取第一部分
+        folder_name = self.folder_display_name(folder_name)
 
         req = (
             CreateFolderFileRequest.builder()
@@ -71,21 +264,29 @@ class FeishuClient:
             .build()
         )
 
-        resp: CreateFolderFileResponse = self.client.drive.v1.file.create_folder(req)
+        resp: CreateFolderFileResponse = await self._acall("drive.folder", self.client.drive.v1.file.acreate_folder, req)
         if resp.code != 0:
             raise Exception(f"创建文件夹失败: {resp}")
 
         return resp.data.token
 
-    def _upload_md_to_cloud(self, title, file_size, folder_token, md_content_bytes) -> str:
-        """md文件导入飞书文档"""
-        print(f"[DEBUG] 开始上传MD文件")
-        print(f"[DEBUG] 文件名: {title}.md")
-        print(f"[DEBUG] 声明大小: {file_size} bytes")
-        print(f"[DEBUG] 目标文件夹token: {folder_token}")
+    async def _upload_md_to_cloud(self, title, file_size, folder_token, md_source) -> str:
+        """md文件导入飞书文档
+        Args:
+            md_source: md 内容的 bytes，或内容与上传字节完全一致的文件路径
+        """
+        print(f"[DEBUG] 开始上传MD文件: {title}.md, {file_size} bytes, 目标文件夹token: {folder_token}")
+
+        # 超过单次上传上限的文件走分片上传
+        if file_size > MULTIPART_THRESHOLD:
+            return await self._upload_multipart(md_source, title + ".md", file_size, "explorer", folder_token)
 
         # 将 bytes 包装成流对象，SDK 对流对象的兼容性更好
-        md_stream = io.BytesIO(md_content_bytes)
+        if isinstance(md_source, (bytes, bytearray)):
+            md_stream = io.BytesIO(md_source)
+        else:
+            with open(md_source, "rb") as f:
+                md_stream = io.BytesIO(f.read())
 
         file_req: UploadAllFileRequest = (
             UploadAllFileRequest.builder()
@@ -101,19 +302,139 @@ class FeishuClient:
             .build()
         )
 
-        file_resp: UploadAllFileResponse = self.client.drive.v1.file.upload_all(file_req)
-
-        # 打印详细响应信息
-        print(f"[DEBUG] 响应code: {file_resp.code}")
-        print(f"[DEBUG] 响应msg: {file_resp.msg}")
-        if hasattr(file_resp, "raw") and file_resp.raw:
-            print(f"[DEBUG] 原始响应: {file_resp.raw.content}")
+        file_resp: UploadAllFileResponse = await self._acall(
+            "drive.upload", self.client.drive.v1.file.aupload_all, file_req, stream=md_stream
+        )
 
         if file_resp.code != 0:
+            print(f"[DEBUG] 上传md文件失败: code={file_resp.code}, msg={file_resp.msg}")
             raise Exception(f"上传md文件失败: code={file_resp.code}, msg={file_resp.msg}")
         return file_resp.data.file_token
 
-    def _create_import_task(self, file_token, title, folder_token) -> str:
+    async def alist_folder(self, folder_token):
+        """列出文件夹下的所有文件(自动翻页)
+        Args:
+            folder_token: 文件夹 token
+        Returns:
+            list: SDK 的 File 对象列表，包含 token/name/type 等字段
+        """
+        files = []
+        page_token = None
+        while True:
+            builder = ListFileRequest.builder().folder_token(folder_token).page_size(200)
+            if page_token:
+                builder = builder.page_token(page_token)
+
+            resp: ListFileResponse = await self._acall("drive.list", self.client.drive.v1.file.alist, builder.build())
+            if resp.code != 0:
+                print(f"[DEBUG] 获取文件夹内容失败: code={resp.code}, msg={resp.msg}")
+                raise Exception(f"获取文件夹内容失败: code={resp.code}, msg={resp.msg}")
+
+            files.extend(resp.data.files or [])
+            if not resp.data.has_more:
+                return files
+            page_token = resp.data.next_page_token
+
+    async def _upload_multipart(self, source, file_name, file_size, parent_type, parent_node, extra=None) -> str:
+        """分片上传: upload_prepare → 并发 upload_part → upload_finish
+        Args:
+            source: 文件路径(以内存映射方式按分片读取)或 bytes
+            file_name: 上传后的文件名
+            file_size: 文件字节数
+            parent_type: explorer 上传到云空间，其他值(如 docx_image)上传为素材
+            parent_node: 父节点 token
+            extra: 素材上传的额外参数(JSON 字符串)
+        Returns:
+            str: 上传后的文件 token
+        """
+        is_media = parent_type != "explorer"
+        api = self.client.drive.v1.media if is_media else self.client.drive.v1.file
+
+        # 1. 预上传，获取 upload_id 与分片大小
+        if is_media:
+            upload_info = (
+                MediaUploadInfo.builder()
+                .file_name(file_name)
+                .parent_type(parent_type)
+                .parent_node(parent_node)
+                .size(file_size)
+            )
+            if extra:
+                upload_info = upload_info.extra(extra)
+            prepare_req = UploadPrepareMediaRequest.builder().request_body(upload_info.build()).build()
+        else:
+            prepare_req = (
+                UploadPrepareFileRequest.builder()
+                .request_body(
+                    FileUploadInfo.builder()
+                    .file_name(file_name)
+                    .parent_type(parent_type)
+                    .parent_node(parent_node)
+                    .size(file_size)
+                    .build()
+                )
+                .build()
+            )
+
+        prepare_resp = await self._acall("drive.upload", api.aupload_prepare, prepare_req)
+        if prepare_resp.code != 0:
+            print(f"[DEBUG] 分片上传预处理失败: code={prepare_resp.code}, msg={prepare_resp.msg}")
+            raise Exception(f"分片上传预处理失败: code={prepare_resp.code}, msg={prepare_resp.msg}")
+
+        upload_id = prepare_resp.data.upload_id
+        block_size = prepare_resp.data.block_size
+        block_num = prepare_resp.data.block_num
+        print(f"[DEBUG] 开始分片上传 {file_name}: 共 {block_num} 片, 每片 {block_size} bytes")
+
+        # 2. 并发上传分片，同时在内存中的分片数不超过并发数
+        semaphore = asyncio.Semaphore(UPLOAD_PART_CONCURRENCY)
+        body_builder = UploadPartMediaRequestBody.builder if is_media else UploadPartFileRequestBody.builder
+        request_builder = UploadPartMediaRequest.builder if is_media else UploadPartFileRequest.builder
+
+        with _open_upload_source(source) as buffer:
+
+            async def upload_part(seq):
+                async with semaphore:
+                    chunk = buffer[seq * block_size:(seq + 1) * block_size]
+                    part_stream = io.BytesIO(chunk)
+                    part_req = (
+                        request_builder()
+                        .request_body(
+                            body_builder()
+                            .upload_id(upload_id)
+                            .seq(seq)
+                            .size(len(chunk))
+                            .checksum(str(zlib.adler32(chunk)))
+                            .file(part_stream)
+                            .build()
+                        )
+                        .build()
+                    )
+                    part_resp = await self._acall(
+                        "drive.upload", api.aupload_part, part_req, stream=part_stream, retry_on_error=True
+                    )
+                if part_resp.code != 0:
+                    print(f"[DEBUG] 上传分片 {seq} 失败: code={part_resp.code}, msg={part_resp.msg}")
+                    raise Exception(f"上传分片失败: seq={seq}, code={part_resp.code}, msg={part_resp.msg}")
+
+            await asyncio.gather(*(upload_part(seq) for seq in range(block_num)))
+
+        # 3. 完成上传
+        finish_body_builder = UploadFinishMediaRequestBody.builder if is_media else UploadFinishFileRequestBody.builder
+        finish_request_builder = UploadFinishMediaRequest.builder if is_media else UploadFinishFileRequest.builder
+        finish_req = (
+            finish_request_builder()
+            .request_body(finish_body_builder().upload_id(upload_id).block_num(block_num).build())
+            .build()
+        )
+        finish_resp = await self._acall("drive.upload", api.aupload_finish, finish_req)
+        if finish_resp.code != 0:
+            print(f"[DEBUG] 完成分片上传失败: code={finish_resp.code}, msg={finish_resp.msg}")
+            raise Exception(f"完成分片上传失败: code={finish_resp.code}, msg={finish_resp.msg}")
+
+        return finish_resp.data.file_token
+
+    async def _create_import_task(self, file_token, title, folder_token) -> str:
         """创建md文件导入为云文档任务
         args:
             file_token: md文件的token
@@ -137,119 +458,164 @@ class FeishuClient:
             .build()
         )
 
-        import_resp: CreateImportTaskResponse = self.client.drive.v1.import_task.create(import_req)
+        import_resp: CreateImportTaskResponse = await self._acall(
+            "drive.import_task", self.client.drive.v1.import_task.acreate, import_req
+        )
         if import_resp.code != 0:
             print(f"[DEBUG] 创建导入任务失败: code={import_resp.code}, msg={import_resp.msg}")
             raise Exception(f"创建导入任务失败: code={import_resp.code}, msg={import_resp.msg}")
         return import_resp.data.ticket
 
-    def _get_import_docx_token(self, ticket) -> str:
-        """轮询导入任务状态，获取导入文档的token
+    async def _get_import_docx_token(self, ticket, file_size=0) -> str:
+        """等待导入任务完成，获取导入文档的token
         args:
             ticket: 导入任务的ticket
+            file_size: 导入文件大小，用于估算轮询间隔
         returns:
             docx_token: 导入文档的token
         """
+        return await self.import_poller.submit(ticket, file_size)
+
+    async def _query_import_task(self, ticket):
+        """查询一次导入任务状态
+        args:
+            ticket: 导入任务的ticket
+        returns:
+            (job_status, doc_token, job_error_msg)
+        """
         request: GetImportTaskRequest = GetImportTaskRequest.builder().ticket(ticket).build()
+        response: GetImportTaskResponse = await self._acall(
+            "drive.import_task", self.client.drive.v1.import_task.aget, request
+        )
+        if response.code != 0:
+            print(f"[DEBUG] 获取导入任务状态失败: code={response.code}, msg={response.msg}")
+            raise Exception(f"获取导入任务状态失败: code={response.code}, msg={response.msg}")
 
-        while True:
-            response: GetImportTaskResponse = self.client.drive.v1.import_task.get(request)
-            if response.code != 0:
-                print(f"[DEBUG] 获取导入任务状态失败: code={response.code}, msg={response.msg}")
-                raise Exception(f"获取导入任务状态失败: code={response.code}, msg={response.msg}")
-
-            job_status = response.data.result.job_status
-            if job_status == 2:  # 处理成功
-                # [核心修正] 针对 MD 导入 Docx 存在的异步延迟问题，增加重试获取 token 机制
-                # 任务刚成功时 token 可能尚未就绪，先等待 5 秒
-                time.sleep(5)
-                doc_token = None
-                retry_count = 0
-                while retry_count < 5:
-                    raw_content = response.raw.content.decode("utf-8") if hasattr(response, "raw") else "{}"
-                    result = response.data.result
-
-                    # 尝试多种路径获取 token
-                    doc_token = getattr(result, "token", None) or getattr(result, "file_token", None)
-                    if not doc_token:
-                        try:
-                            resp_json = json.loads(raw_content)
-                            res_data = resp_json.get("data", {}).get("result", {})
-                            doc_token = (
-                                res_data.get("token")
-                                or res_data.get("file_token")
-                                or res_data.get("obj_token")
-                            )
-                            if not doc_token and res_data.get("url"):
-                                doc_token = res_data.get("url").split("/")[-1].split("?")[0]
-                        except:
-                            pass
-
-                    if doc_token:
-                        break
+        result = response.data.result
+        if result.job_status != 2:
+            return result.job_status, None, result.job_error_msg
+
+        # [核心修正] 针对 MD 导入 Docx 存在的异步延迟问题，尝试多种路径获取 token
+        doc_token = getattr(result, "token", None) or getattr(result, "file_token", None)
+        if not doc_token:
+            try:
+                raw_content = response.raw.content.decode("utf-8") if hasattr(response, "raw") else "{}"
+                res_data = json.loads(raw_content).get("data", {}).get("result", {})
+                doc_token = res_data.get("token") or res_data.get("file_token") or res_data.get("obj_token")
+                if not doc_token and res_data.get("url"):
+                    doc_token = res_data.get("url").split("/")[-1].split("?")[0]
+            except:
+                pass
 
-                    print(f"[DEBUG] 任务成功但未检测到 token，等待 2s 后重试 ({retry_count + 1}/5)...")
-                    time.sleep(2)
-                    response = self.client.drive.v1.import_task.get(request)
-                    retry_count += 1
+        return result.job_status, doc_token, None
 
-                print(
-                    f"[DEBUG] 导入任务最终响应内容: {response.raw.content.decode('utf-8') if hasattr(response, 'raw') else 'None'}"
-                )
-                print(f"[DEBUG] 导入文档成功, doc_token: {doc_token}")
-                return doc_token
-            elif job_status == 0 or job_status == 1:  # 初始化或处理中
-                print("任务处理中...")
-            else:  # job_status == 3，处理失败
-                raise Exception(f"任务处理失败：{response.data.result.job_error_msg}")
-
-            # 等待一段时间后再次查询状态
-            time.sleep(2)
-
-    def import_md_to_docx(self, file_path, title, folder_token):
-        """md文件导入飞书文档"""
+    def import_md_to_docx(self, file_path, title, folder_token, checkpoint=None):
+        """同步导入md文件为飞书文档，参数同 aimport_md_to_docx"""
+        return asyncio.run(self.aimport_md_to_docx(file_path, title, folder_token, checkpoint))
+
+    async def aimport_md_to_docx(self, file_path, title, folder_token, checkpoint=None):
+        """md文件导入飞书文档，超过 SPLIT_MAX_KB / SPLIT_MAX_BLOCKS 的文件按标题拆分为多个文档导入
+        Args:
+            file_path: md文件路径
+            title: 文档标题
+            folder_token: 目标文件夹token
+            checkpoint: 可选的 DocumentCheckpoint，记录各阶段进度，并跳过断点中已完成的阶段
+        Returns:
+            str: 导入生成的云文档 token(拆分导入时为索引文档的 token)
+        """
+        if checkpoint is None:
+            checkpoint = DocumentCheckpoint(None, file_path, None)
+
+        # 文本模式读取：用于解析图片路径和判断是否需要拆分
+        with open(file_path, "r", encoding="utf-8") as f:
+            md_text = f.read()
+
+        parts = split_markdown(md_text, SPLIT_MAX_KB * 1024, SPLIT_MAX_BLOCKS)
+        if parts:
+            del md_text
+            return await self._import_split_document(file_path, title, folder_token, parts, checkpoint)
+        return await self._import_markdown(file_path, md_text, title, folder_token, checkpoint)
+
+    async def _import_markdown(self, file_path, md_text, title, folder_token, checkpoint, whole_file=True):
+        """上传 md、创建导入任务、等待导入完成并填入图片
+        Args:
+            file_path: md文件路径，相对图片地址基于其所在目录解析
+            md_text: 要导入的 Markdown 文本
+            checkpoint: DocumentCheckpoint
+            whole_file: md_text 是否为文件的完整内容；为 True 且与磁盘字节一致时直接从文件上传
+        Returns:
+            str: 导入生成的云文档 token
+        """
         # 初始化记录，用于失败后的清理
-        uploaded_md_token = None
-        created_doc_token = None
+        uploaded_md_token = checkpoint.file_token
+        created_doc_token = checkpoint.doc_token
+        remote_task = None
 
         try:
-            # 1. 文本模式读取：仅用于解析图片路径
-            with open(file_path, "r", encoding="utf-8") as f:
-                md_text = f.read()
-
-            # 2. 将归一化后的文本转回字节流，确保大小一致
+            # 1. 将归一化后的文本转回字节流，确保大小一致
             md_content_normalized = md_text.encode("utf-8")
             real_file_size = len(md_content_normalized)
 
-            # 提取出markdown的所有图片路径
-            img_path_list: List = MarkdownParser.extract_images_from_markdown(file_path, md_text)
-
-            # 3. 上传md文件, 获取file_token
-            uploaded_md_token = self._upload_md_to_cloud(
-                title, real_file_size, folder_token, md_content_normalized
+            # 按文档顺序提取所有图片引用(包括远程图片)，与导入后文档中的图片块一一对应
+            image_refs: List = scan_image_refs(file_path, md_text)
+            del md_text
+            # 远程图片在上传、导入期间同时下载
+            remote_task = asyncio.ensure_future(
+                self._fetch_remote_images([ref.src for ref in image_refs if ref.remote])
             )
 
-            # 4. 创建md文件导入为云文档, 获取ticket
-            ticket = self._create_import_task(uploaded_md_token, title, folder_token)
+            # 磁盘上的字节与归一化结果一致(无 \r\n)时直接从文件上传，不再常驻一份内存副本
+            if whole_file and os.path.getsize(file_path) == real_file_size:
+                md_source = file_path
+            else:
+                md_source = md_content_normalized
+            del md_content_normalized
+
+            if not created_doc_token:
+                # 2. 上传md文件, 获取file_token
+                if not uploaded_md_token:
+                    with self.metrics.timer("upload"):
+                        uploaded_md_token = await self._upload_md_to_cloud(
+                            title, real_file_size, folder_token, md_source
+                        )
+                    self._track_file(uploaded_md_token, reason=f"{title}.md")
+                    checkpoint.uploaded(uploaded_md_token)
 
-            # 5. 轮询导入任务状态，获取导入文档的token
-            created_doc_token = self._get_import_docx_token(ticket)
+                # 3. 创建md文件导入为云文档, 获取ticket
+                ticket = checkpoint.ticket
+                if not ticket:
+                    ticket = await self._create_import_task(uploaded_md_token, title, folder_token)
+                    checkpoint.ticket_created(ticket)
 
-            # 6. 把markdown中记录的图片路径，上传图片到飞书文档，更新image block of the image_key
-            if img_path_list:
-                self._update_document_images(created_doc_token, img_path_list)
+                # 4. 轮询导入任务状态，获取导入文档的token
+                with self.metrics.timer("import_wait"):
+                    created_doc_token = await self._get_import_docx_token(ticket, real_file_size)
+                self._track_file(created_doc_token, "docx", title)
+                checkpoint.doc_resolved(created_doc_token)
 
-            # 7. 任务成功，删除上传的中间态 md 文件
-            self._del_file(uploaded_md_token)
+            # 5. 把markdown中记录的图片路径，上传图片到飞书文档，更新image block of the image_key
+            remote_paths = await remote_task
+            if any(ref.path or ref.src in remote_paths for ref in image_refs):
+                await self._update_document_images(created_doc_token, image_refs, checkpoint, remote_paths)
+
+            # 6. 任务成功，删除上传的中间态 md 文件(有删除队列时在后台删除)
+            self._untrack_file(created_doc_token, "docx")
+            if uploaded_md_token:
+                await self._discard_file(uploaded_md_token, reason=f"{title}.md")
+            checkpoint.md_deleted()
+
+            return created_doc_token
 
         except Exception as e:
             print(f"[ERROR] 迁移文档 '{title}' 时发生错误: {str(e)}")
+            if remote_task is not None:
+                remote_task.cancel()
             # 失败补救：清理飞书上的残留文件
             print(f"[DEBUG] 正在尝试清理由于错误产生的飞书残留文件...")
 
             if uploaded_md_token:
                 try:
-                    self._del_file(uploaded_md_token)
+                    await self._discard_file(uploaded_md_token, reason=f"{title}.md")
                     print(f"  - 已清理残留 MD 文件: {uploaded_md_token}")
                 except:
                     pass
@@ -257,170 +623,485 @@ class FeishuClient:
             if created_doc_token:
                 try:
                     # 飞书云文档新版(docx)删除时类型必须指定为 'docx'
-                    self._del_file(created_doc_token, file_type="docx")
+                    await self._discard_file(created_doc_token, "docx", title)
                     print(f"  - 已清理残留 Doc 文档: {created_doc_token}")
                 except:
                     pass
 
+            # 残留已清理，断点作废，下次从头开始
+            checkpoint.reset()
+
             # 重新抛出异常，让主流程感知失败
             raise e
 
-    def _update_document_images(self, doc_token, img_path_list: List):
+    async def _import_split_document(self, file_path, title, folder_token, parts, checkpoint):
+        """把拆分出的各部分并行导入为子文档，再创建链接到各部分的索引文档
+        Args:
+            parts: split_markdown 的结果
+            checkpoint: DocumentCheckpoint；各部分不记录阶段，中断后整体重新导入
+        Returns:
+            str: 索引文档的 token
+        """
+        print(f"[DEBUG] 文档过大，按标题拆分为 {len(parts)} 个部分导入: {title}")
+        self.metrics.inc("documents_split")
+        self.metrics.inc("document_parts", len(parts))
+
+        # 上次未拆分时中断留下的中间态文件无法续用
+        if checkpoint.file_token or checkpoint.doc_token:
+            for token, file_type in ((checkpoint.file_token, "file"), (checkpoint.doc_token, "docx")):
+                if token:
+                    try:
+                        await self._discard_file(token, file_type, title)
+                    except Exception as e:
+                        print(f"[DEBUG] 删除上次未完成的文件失败: {token} - {str(e)}")
+            checkpoint.reset()
+
+        width = len(str(len(parts)))
+        slots = self._split_semaphore()
+        failed = asyncio.Event()
+        imported = {}  # 部分序号 -> 文档 token
+
+        async def import_part(index, part):
+            part_title = f"{title} ({index + 1:0{width}d}/{len(parts)})" + (f" {part.title}" if part.title else "")
+            # 与其他文档的拆分部分共用 MIGRATION_CONCURRENCY 个名额，同一时刻只有这么多部分在上传和导入、占用内存
+            async with slots:
+                for attempt in range(SPLIT_PART_RETRIES + 1):
+                    if failed.is_set():
+                        # 其他部分已失败，整个文档会重新导入，不再开始新的部分
+                        return
+                    try:
+                        # 每个部分单独上传和导入，图片按该部分中的顺序对应导入后的图片块
+                        token = await self._import_markdown(
+                            file_path, part.text, part_title, folder_token,
+                            DocumentCheckpoint(None, file_path, None), whole_file=False,
+                        )
+                        break
+                    except Exception as e:
+                        if attempt == SPLIT_PART_RETRIES:
+                            failed.set()
+                            raise e
+                        print(f"[DEBUG] 导入第 {index + 1} 部分失败，重试: {str(e)}")
+            # 索引文档创建成功前各部分仍登记为中间态文件，进程中断时下次运行可以清理
+            self._track_file(token, "docx", part_title)
+            imported[index] = token
+
+        results = await asyncio.gather(*(import_part(index, part) for index, part in enumerate(parts)), return_exceptions=True)
+        part_tokens = [imported[index] for index in sorted(imported)]
+        errors = [error for error in results if isinstance(error, BaseException)]
+
+        index_token = None
+        try:
+            if errors:
+                raise Exception(f"{len(errors)}/{len(parts)} 个部分导入失败: {str(errors[0])}")
+            index_token = await self._create_split_index(file_path, title, folder_token, parts, part_tokens)
+        except Exception as e:
+            print(f"[ERROR] 拆分导入文档 '{title}' 时发生错误: {str(e)}")
+            # 删除已导入成功的部分，不留下孤立的子文档
+            for token in part_tokens + ([index_token] if index_token else []):
+                try:
+                    await self._discard_file(token, "docx", title)
+                    print(f"  - 已清理已导入的部分: {token}")
+                except Exception as cleanup_error:
+                    print(f"[DEBUG] 清理已导入的部分失败: {token} - {str(cleanup_error)}")
+            checkpoint.reset()
+            raise e
+
+        for token in part_tokens:
+            self._untrack_file(token, "docx")
+        self.document_parts[index_token] = part_tokens
+        checkpoint.md_deleted()
+        return index_token
+
+    def _split_semaphore(self):
+        """拆分导入的部分并发数上限，按事件循环创建(同步接口每次调用使用新的事件循环)"""
+        loop = asyncio.get_running_loop()
+        if self._split_slots is None or self._split_slots[0] is not loop:
+            self._split_slots = (loop, asyncio.Semaphore(max(1, MIGRATION_CONCURRENCY)))
+        return self._split_slots[1]
+
+    async def _create_split_index(self, file_path, title, folder_token, parts, part_tokens):
+        """创建索引文档，按顺序链接到各部分
+        Returns:
+            str: 索引文档 token
+        """
+        from src.docx_writer import DocxWriter, parse_markdown
+
+        lines = [f"本文档内容较多，已按章节拆分为 {len(parts)} 个文档:", ""]
+        for index, (part, token) in enumerate(zip(parts, part_tokens), 1):
+            name = (part.title or f"第 {index} 部分").replace("[", "").replace("]", "")
+            lines.append(f"{index}. [{name}]({DOC_URL_PREFIX.rstrip('/')}/{token})")
+
+        doc_token = await self._create_document(title, folder_token)
+        self._track_file(doc_token, "docx", title)
+        try:
+            await DocxWriter(self).write_nodes(doc_token, doc_token, parse_markdown("\n".join(lines)), file_path)
+        except Exception:
+            await self._discard_file(doc_token, "docx", title)
+            raise
+        self._untrack_file(doc_token, "docx")
+        return doc_token
+
+    async def _update_document_images(self, doc_token, image_refs: List, checkpoint=None, remote_paths=None):
         """更新文档中的图片
         Args:
             doc_token: 文档token
-            ima_path_list: markdown中记录的图片地址列表
+            image_refs: markdown中按顺序记录的所有图片引用(ImageRef)
+            checkpoint: 可选的 DocumentCheckpoint，跳过已更新过的图片并记录新完成的图片
+            remote_paths: {远程图片地址: 下载到本地的路径}
         """
-        print(f"[DEBUG] 开始获取文档块, doc_token: {doc_token}")
-        # 获取文档所有块
-        request: ListDocumentBlockRequest = (
-            ListDocumentBlockRequest.builder().document_id(doc_token).page_size(500).build()
+        remote_paths = remote_paths or {}
+        # 1. 按顺序找出与图片引用一一对应的图片块，远程图片也占一个图片块
+        image_block_ids = await self._list_image_block_ids(doc_token, len(image_refs))
+
+        # 2. 上传本地图片和已下载的远程图片，下载失败的远程图片与找不到的本地图片对应的块保持原样
+        pairs = [
+            (ref.path or remote_paths.get(ref.src), block_id)
+            for ref, block_id in zip(image_refs, image_block_ids)
+            if ref.path or ref.src in remote_paths
+        ]
+        await self._patch_image_blocks(
+            doc_token, [path for path, _ in pairs], [block_id for _, block_id in pairs], checkpoint
         )
-        # 访问img_path_list的索引位置
-        img_path_index = 0
 
-        while True:
-            resp: ListDocumentBlockResponse = self.client.docx.v1.document_block.list(request)
+    async def _fetch_remote_images(self, urls):
+        """下载远程图片
+        Returns:
+            dict: {url: 本地缓存路径}，只包含下载成功的图片；未启用远程图片时为空
+        """
+        if self.remote_images is None or not urls:
+            return {}
+        return await self.remote_images.fetch_all(urls)
+
+    async def _patch_image_blocks(self, doc_token, img_path_list: List, image_block_ids: List, checkpoint=None):
+        """并发上传图片，再批量把图片填入对应的图片块
+        Args:
+            doc_token: 文档token
+            img_path_list: 图片路径列表
+            image_block_ids: 与 img_path_list 一一对应的图片块 block_id
+            checkpoint: 可选的 DocumentCheckpoint，跳过已更新过的图片并记录新完成的图片
+        """
+        patched_images = checkpoint.patched_images if checkpoint else set()
+        # 断点恢复：按图片块跳过上次运行中已更新的图片；远程图片下载结果不同时，本次要上传的图片列表
+        # 与上次不一致，按序号记录会跳过错误的块
+        pending = [
+            (index, block_id)
+            for index, block_id in enumerate(image_block_ids)
+            if block_id not in patched_images
+        ]
+        if not pending:
+            return
+
+        # 并发上传图片，速率由限流器控制
+        semaphore = asyncio.Semaphore(IMAGE_UPLOAD_CONCURRENCY)
+
+        async def upload(index, block_id):
+            img_path = img_path_list[index]
+            async with semaphore:
+                print(f"[DEBUG] [IMAGE_STEP] 正在处理第 {index + 1} 张图片: {img_path}")
+                # 预处理：读取尺寸，按配置缩放/重新编码
+                with self.metrics.timer("image_process"):
+                    image = await self.image_pipeline.process(img_path)
+                # 上传时保留原文件名，扩展名以实际上传的文件为准
+                file_name = os.path.splitext(os.path.basename(img_path))[0] + os.path.splitext(image.path)[1]
+                with self.metrics.timer("image_upload"):
+                    image_token = await self._upload_image_to_doc(image.path, block_id, doc_token, file_name)
+            return self._build_replace_image_request(block_id, image_token, image.width, image.height)
+
+        try:
+            update_requests = await asyncio.gather(*(upload(index, block_id) for index, block_id in pending))
+        except Exception as img_err:
+            print(f"[DEBUG] [IMAGE_ERROR] 处理图片时发生错误: {str(img_err)}")
+            raise img_err
+
+        # 批量更新图片块的 image_key
+        for start in range(0, len(pending), BATCH_UPDATE_LIMIT):
+            with self.metrics.timer("patch"):
+                await self._batch_update_blocks(doc_token, update_requests[start:start + BATCH_UPDATE_LIMIT])
+            doc_image_blocks = self.image_blocks.setdefault(doc_token, {})
+            for index, block_id in pending[start:start + BATCH_UPDATE_LIMIT]:
+                doc_image_blocks[block_id] = img_path_list[index]
+                if checkpoint:
+                    checkpoint.image_patched(block_id)
+
+    async def _list_image_block_ids(self, doc_token, image_count):
+        """按文档顺序获取前 image_count 个图片块的 block_id，找齐后不再继续翻页"""
+        print(f"[DEBUG] 开始获取文档块, doc_token: {doc_token}")
+        block_ids = []
+        page_token = None
+
+        while len(block_ids) < image_count:
+            # 分页参数需要通过 builder 设置才会写入查询串
+            builder = ListDocumentBlockRequest.builder().document_id(doc_token).page_size(500)
+            if page_token:
+                builder = builder.page_token(page_token)
+            request: ListDocumentBlockRequest = builder.build()
+
+            resp: ListDocumentBlockResponse = await self._acall(
+                "docx.block", self.client.docx.v1.document_block.alist, request
+            )
             if resp.code != 0:
                 print(f"[DEBUG] 获取文档块失败: code={resp.code}, msg={resp.msg}")
-                if hasattr(resp, "raw") and resp.raw:
-                    print(f"[DEBUG] 原始响应: {resp.raw.content}")
                 raise Exception(f"获取文档块失败: code={resp.code}, msg={resp.msg}")
 
-            # 遍历所有块
-            for block in resp.data.items:
-                # 检查是否为图片块
-                if block.block_type == 27 and img_path_index < len(img_path_list):  # 图片块
-                    # 上传图片到飞书文档指定的 block 中
-                    img_path = img_path_list[img_path_index]
-                    print(f"[DEBUG] [IMAGE_STEP] 正在处理第 {img_path_index + 1} 张图片: {img_path}")
-
-                    try:
-                        image_token = self._upload_image_to_doc(img_path, block.block_id, doc_token)
-                        # 更新图片块的image_key
-                        self._update_doc_image_block(img_path, block.block_id, doc_token, image_token)
-                        img_path_index += 1
-
-                        # [频率控制] 避免请求过快触发飞书 API 限制
-                        time.sleep(1)
-                    except Exception as img_err:
-                        print(f"[DEBUG] [IMAGE_ERROR] 处理图片时发生错误: {str(img_err)}")
-                        raise img_err
+            for block in resp.data.items or []:
+                if block.block_type == 27:  # 图片块
+                    block_ids.append(block.block_id)
 
             # 检查是否还有更多块
             if not resp.data.has_more:
                 break
 
-            # 更新请求参数，获取下一页
-            request.page_token = resp.data.page_token
+            # 获取下一页
+            page_token = resp.data.page_token
+
+        return block_ids[:image_count]
 
-    def _upload_image_to_doc(self, file_path, block_id, document_id):
-        """上传图片到飞书文档，带重试机制"""
-        file_name = os.path.basename(file_path)
+    async def _upload_image_to_doc(self, file_path, block_id, document_id, file_name=None):
+        """上传图片到飞书文档，限流及网络抖动时自动重试"""
+        file_name = file_name or os.path.basename(file_path)
         file_size = os.path.getsize(file_path)
+        extra: dict = {"drive_route_token": document_id}
 
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                with open(file_path, "rb") as image_content:
-                    extra: dict = {"drive_route_token": document_id}
-                    request: UploadAllMediaRequest = (
-                        UploadAllMediaRequest.builder()
-                        .request_body(
-                            UploadAllMediaRequestBody.builder()
-                            .file_name(file_name)
-                            .parent_node(block_id)
-                            .parent_type("docx_image")
-                            .size(file_size)
-                            .extra(json.dumps(extra, ensure_ascii=False, indent=2))
-                            .file(image_content)
-                            .build()
-                        )
-                        .build()
-                    )
+        # 超过单次上传上限的图片走分片上传
+        if file_size > MULTIPART_THRESHOLD:
+            image_token = await self._upload_multipart(
+                file_path, file_name, file_size, "docx_image", block_id,
+                extra=json.dumps(extra, ensure_ascii=False),
+            )
+            print(f"上传图片到云文档成功: {image_token}")
+            return image_token
 
-                    print(
-                        f"[DEBUG] [API_CALL] 开始调用 media.upload_all (尝试 {attempt + 1}/{max_retries})..."
-                    )
-                    resp: UploadAllMediaResponse = self.client.drive.v1.media.upload_all(request)
-
-                    if resp.code != 0:
-                        # 如果是频率限制或其他可重试错误，可以在此判断
-                        print(f"[DEBUG] 上传图片到云文档失败: code={resp.code}, msg={resp.msg}")
-                        if attempt < max_retries - 1:
-                            wait_time = (attempt + 1) * 2
-                            print(f"[DEBUG] 等待 {wait_time}s 后重试...")
-                            time.sleep(wait_time)
-                            continue
-                        raise Exception(f"上传图片到云文档失败: code={resp.code}, msg={resp.msg}")
-
-                    print(f"上传图片到云文档成功: {resp.data.file_token}")
-                    return resp.data.file_token
-            except Exception as e:
-                # 捕获 JSON 解析错误或其他网络异常请求
-                if "Expecting value" in str(e) or "char 0" in str(e):
-                    print(f"[DEBUG] [NETWORK_ISSUE] 捕获到可能的空响应错误: {str(e)}")
-                    if attempt < max_retries - 1:
-                        wait_time = (attempt + 1) * 2
-                        print(f"[DEBUG] 服务器返回异常或网络抖动，等待 {wait_time}s 后重试...")
-                        time.sleep(wait_time)
-                        continue
-                raise e
-
-    def _update_doc_image_block(self, file_path, block_id, document_id, image_token):
-        """更新文档中的图片块，带重试机制"""
-        # 获取图片尺寸
-        with Image.open(file_path) as img:
-            width, height = img.size
-            print(f"图片尺寸: {width}x{height}")
-
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                # 更新图片块的image_key
-                request: PatchDocumentBlockRequest = (
-                    PatchDocumentBlockRequest.builder()
-                    .document_id(document_id)
-                    .block_id(block_id)
-                    .request_body(
-                        UpdateBlockRequest.builder()
-                        .replace_image(
-                            ReplaceImageRequest.builder()
-                            .token(image_token)
-                            .width(width)
-                            .height(height)
-                            .build()
-                        )
-                        .build()
-                    )
+        with open(file_path, "rb") as image_content:
+            request: UploadAllMediaRequest = (
+                UploadAllMediaRequest.builder()
+                .request_body(
+                    UploadAllMediaRequestBody.builder()
+                    .file_name(file_name)
+                    .parent_node(block_id)
+                    .parent_type("docx_image")
+                    .size(file_size)
+                    .extra(json.dumps(extra, ensure_ascii=False, indent=2))
+                    .file(image_content)
                     .build()
                 )
+                .build()
+            )
 
-                print(
-                    f"[DEBUG] [API_CALL] 开始调用 document_block.patch (尝试 {attempt + 1}/{max_retries})..."
-                )
-                # 发起请求
-                response: PatchDocumentBlockResponse = self.client.docx.v1.document_block.patch(request)
-                if response.code != 0:
-                    print(f"[DEBUG] 更新图片块失败: code={response.code}, msg={response.msg}")
-                    if attempt < max_retries - 1:
-                        wait_time = (attempt + 1) * 2
-                        time.sleep(wait_time)
-                        continue
-                    raise Exception(f"更新图片块失败: code={response.code}, msg={response.msg}")
-
-                print("更新图片块成功")
-                return
-            except Exception as e:
-                if "Expecting value" in str(e) or "char 0" in str(e):
-                    if attempt < max_retries - 1:
-                        wait_time = (attempt + 1) * 2
-                        print(f"[DEBUG] 网络异常，等待 {wait_time}s 后重试...")
-                        time.sleep(wait_time)
-                        continue
-                raise e
-
-    def _del_file(self, file_token, file_type="file"):
+            print(f"[DEBUG] [API_CALL] 开始调用 media.upload_all...")
+            resp: UploadAllMediaResponse = await self._acall(
+                "drive.upload", self.client.drive.v1.media.aupload_all, request,
+                stream=image_content, retry_on_error=True,
+            )
+
+        if resp.code != 0:
+            print(f"[DEBUG] 上传图片到云文档失败: code={resp.code}, msg={resp.msg}")
+            raise Exception(f"上传图片到云文档失败: code={resp.code}, msg={resp.msg}")
+
+        print(f"上传图片到云文档成功: {resp.data.file_token}")
+        return resp.data.file_token
+
+    def _build_replace_image_request(self, block_id, image_token, width, height):
+        """构造替换图片块 image_key 的更新请求"""
+        print(f"图片尺寸: {width}x{height}")
+        return (
+            UpdateBlockRequest.builder()
+            .block_id(block_id)
+            .replace_image(
+                ReplaceImageRequest.builder()
+                .token(image_token)
+                .width(width)
+                .height(height)
+                .build()
+            )
+            .build()
+        )
+
+    async def _batch_update_blocks(self, document_id, update_requests: List):
+        """批量更新文档块，单次最多 BATCH_UPDATE_LIMIT 个，限流及网络抖动时自动重试"""
+        request: BatchUpdateDocumentBlockRequest = (
+            BatchUpdateDocumentBlockRequest.builder()
+            .document_id(document_id)
+            .request_body(BatchUpdateDocumentBlockRequestBody.builder().requests(update_requests).build())
+            .build()
+        )
+
+        print(f"[DEBUG] [API_CALL] 开始调用 document_block.batch_update, 共 {len(update_requests)} 个块...")
+        response: BatchUpdateDocumentBlockResponse = await self._acall(
+            "docx.block", self.client.docx.v1.document_block.abatch_update, request, retry_on_error=True
+        )
+        if response.code != 0:
+            print(f"[DEBUG] 批量更新文档块失败: code={response.code}, msg={response.msg}")
+            raise Exception(f"批量更新文档块失败: code={response.code}, msg={response.msg}")
+
+        print(f"批量更新文档块成功: {len(update_requests)} 个")
+
+    def write_md_to_docx(self, file_path, title, folder_token, checkpoint=None):
+        """同步直接写入md为飞书文档，参数同 awrite_md_to_docx"""
+        return asyncio.run(self.awrite_md_to_docx(file_path, title, folder_token, checkpoint))
+
+    async def awrite_md_to_docx(self, file_path, title, folder_token, checkpoint=None):
+        """本地解析md，直接创建飞书文档并写入文档块，不经过导入任务
+        Args:
+            file_path: md文件路径
+            title: 文档标题
+            folder_token: 目标文件夹token
+            checkpoint: 可选的 DocumentCheckpoint
+        Returns:
+            str: 创建的云文档 token
+        """
+        from src.docx_writer import DocxWriter
+
+        return await DocxWriter(self).write(file_path, title, folder_token, checkpoint)
+
+    def update_md_docx(self, file_path, doc_token, image_hashes=None):
+        """同步块级增量更新，参数同 aupdate_md_docx"""
+        return asyncio.run(self.aupdate_md_docx(file_path, doc_token, image_hashes))
+
+    async def aupdate_md_docx(self, file_path, doc_token, image_hashes=None):
+        """把md的改动以块级差异的方式更新到已有文档，文档 token 不变
+        Args:
+            file_path: md文件路径
+            doc_token: 已有文档token
+            image_hashes: {图片块 block_id: 图片内容哈希}，用于判断图片是否需要重新上传
+        Returns:
+            str: 文档 token
+        """
+        from src.docx_writer import DocxWriter
+
+        return await DocxWriter(self).update(file_path, doc_token, image_hashes)
+
+    async def _list_document_blocks(self, doc_token) -> List:
+        """获取文档的所有块"""
+        blocks = []
+        page_token = None
+        while True:
+            builder = ListDocumentBlockRequest.builder().document_id(doc_token).page_size(500)
+            if page_token:
+                builder = builder.page_token(page_token)
+            request: ListDocumentBlockRequest = builder.build()
+
+            resp: ListDocumentBlockResponse = await self._acall(
+                "docx.block", self.client.docx.v1.document_block.alist, request
+            )
+            if resp.code != 0:
+                print(f"[DEBUG] 获取文档块失败: code={resp.code}, msg={resp.msg}")
+                raise Exception(f"获取文档块失败: code={resp.code}, msg={resp.msg}")
+
+            blocks.extend(resp.data.items or [])
+            if not resp.data.has_more:
+                return blocks
+            page_token = resp.data.page_token
+
+    async def _delete_children(self, document_id, block_id, start_index, end_index):
+        """删除 block_id 下 [start_index, end_index) 范围内的子块"""
+        request: BatchDeleteDocumentBlockChildrenRequest = (
+            BatchDeleteDocumentBlockChildrenRequest.builder()
+            .document_id(document_id)
+            .block_id(block_id)
+            .document_revision_id(-1)
+            .request_body(
+                BatchDeleteDocumentBlockChildrenRequestBody.builder()
+                .start_index(start_index)
+                .end_index(end_index)
+                .build()
+            )
+            .build()
+        )
+        resp: BatchDeleteDocumentBlockChildrenResponse = await self._acall(
+            "docx.block", self.client.docx.v1.document_block_children.abatch_delete, request
+        )
+        if resp.code != 0:
+            print(f"[DEBUG] 删除子块失败: code={resp.code}, msg={resp.msg}")
+            raise Exception(f"删除子块失败: code={resp.code}, msg={resp.msg}")
+
+    async def _create_document(self, title, folder_token) -> str:
+        """创建空白云文档
+        Returns:
+            str: 文档 token(同时也是根块的 block_id)
+        """
+        request: CreateDocumentRequest = (
+            CreateDocumentRequest.builder()
+            .request_body(CreateDocumentRequestBody.builder().folder_token(folder_token).title(title).build())
+            .build()
+        )
+        resp: CreateDocumentResponse = await self._acall(
+            "docx.document", self.client.docx.v1.document.acreate, request, retry_on_error=True
+        )
+        if resp.code != 0:
+            print(f"[DEBUG] 创建文档失败: code={resp.code}, msg={resp.msg}")
+            raise Exception(f"创建文档失败: code={resp.code}, msg={resp.msg}")
+        print(f"创建文档成功: {resp.data.document.document_id}")
+        return resp.data.document.document_id
+
+    async def _create_children(self, document_id, block_id, children: List, index=-1) -> List:
+        """在 block_id 下创建子块，单次最多 50 个
+        Returns:
+            list: 创建出的块，顺序与 children 一致
+        """
+        request: CreateDocumentBlockChildrenRequest = (
+            CreateDocumentBlockChildrenRequest.builder()
+            .document_id(document_id)
+            .block_id(block_id)
+            .document_revision_id(-1)
+            .request_body(CreateDocumentBlockChildrenRequestBody.builder().children(children).index(index).build())
+            .build()
+        )
+        resp: CreateDocumentBlockChildrenResponse = await self._acall(
+            "docx.block", self.client.docx.v1.document_block_children.acreate, request
+        )
+        if resp.code != 0:
+            print(f"[DEBUG] 创建子块失败: code={resp.code}, msg={resp.msg}")
+            raise Exception(f"创建子块失败: code={resp.code}, msg={resp.msg}")
+        return resp.data.children or []
+
+    async def _create_descendants(self, document_id, block_id, children_id: List, descendants: List, index=-1):
+        """在 block_id 下创建嵌套块(表格、引用、多级列表)，单次最多 1000 个
+        Args:
+            children_id: 直接子块的临时 id
+            descendants: 所有待创建的块，block_id 为临时 id，children 引用临时 id
+        Returns:
+            list: 临时 id 与真实 block_id 的对应关系
+        """
+        request: CreateDocumentBlockDescendantRequest = (
+            CreateDocumentBlockDescendantRequest.builder()
+            .document_id(document_id)
+            .block_id(block_id)
+            .document_revision_id(-1)
+            .request_body(
+                CreateDocumentBlockDescendantRequestBody.builder()
+                .children_id(children_id)
+                .index(index)
+                .descendants(descendants)
+                .build()
+            )
+            .build()
+        )
+        resp: CreateDocumentBlockDescendantResponse = await self._acall(
+            "docx.block", self.client.docx.v1.document_block_descendant.acreate, request
+        )
+        if resp.code != 0:
+            print(f"[DEBUG] 创建嵌套块失败: code={resp.code}, msg={resp.msg}")
+            raise Exception(f"创建嵌套块失败: code={resp.code}, msg={resp.msg}")
+        return resp.data.block_id_relations or []
+
+    def _track_file(self, token, file_type="file", reason=""):
+        """登记迁移过程中产生、之后需要删除或转正的文件，进程崩溃时下次运行可以清理"""
+        if self.cleanup_queue is not None:
+            self.cleanup_queue.track(token, file_type, reason)
+
+    def _untrack_file(self, token, file_type="file"):
+        if self.cleanup_queue is not None:
+            self.cleanup_queue.untrack(token, file_type)
+
+    async def _discard_file(self, file_token, file_type="file", reason=""):
+        """删除不再需要的文件: 删除队列运行时交给后台 worker，否则立即删除"""
+        if self.cleanup_queue is not None and self.cleanup_queue.running:
+            self.cleanup_queue.enqueue(file_token, file_type, reason)
+            return
+        with self.metrics.timer("cleanup"):
+            await self._del_file(file_token, file_type=file_type)
+
+    async def _del_file(self, file_token, file_type="file"):
         """删除文件
         Args:
             file_token: 文件 token
@@ -429,7 +1110,7 @@ class FeishuClient:
         request: DeleteFileRequest = (
             DeleteFileRequest.builder().file_token(file_token).type(file_type).build()
         )
-        resp: DeleteFileResponse = self.client.drive.v1.file.delete(request)
+        resp: DeleteFileResponse = await self._acall("drive.delete", self.client.drive.v1.file.adelete, request)
         if resp.code != 0:
             print(f"[DEBUG] 删除文件失败: code={resp.code}, msg={resp.msg}")
             raise Exception(f"删除文件失败: code={resp.code}, msg={resp.msg}")
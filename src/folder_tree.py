@@ -0,0 +1,320 @@
+import asyncio
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+# 等待其他进程创建文件夹时的轮询间隔(秒)
+LEASE_POLL_INTERVAL = 0.2
+
+
+class FolderStore:
+    """本地目录与飞书文件夹 token 的持久化映射(SQLite)，按目标根文件夹区分
+
+    多个进程(分片)可以共用同一个数据库文件(放在共享存储上时需支持文件锁)。创建文件夹前先取得
+    该目录的租约，持有租约的进程创建并写入 token 后释放，其他进程直接读取结果，不会重复创建。
+    数据库操作可能因其他进程加锁而等待，FolderTree 在线程池中调用，同一连接的访问由锁串行化。
+    """
+
+    def __init__(self, db_path, lease_ttl=60):
+        """
+        Args:
+            db_path: 数据库文件路径
+            lease_ttl: 租约有效期(秒)，持有者异常退出时，其他进程在过期后接手
+        """
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        # 其他进程写入时最多等待 30 秒；连接在线程池中使用
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.lease_ttl = lease_ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS folders (
+                root_token TEXT NOT NULL,
+                rel_path TEXT NOT NULL,
+                token TEXT NOT NULL,
+                PRIMARY KEY (root_token, rel_path)
+            )
+            """
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS folder_leases (
+                root_token TEXT NOT NULL,
+                rel_path TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (root_token, rel_path)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def load(self, root_token):
+        """读取某个根文件夹下已知的 {相对路径: token}"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT rel_path, token FROM folders WHERE root_token = ?", (root_token,)
+            ).fetchall()
+        return {rel_path.replace('/', os.sep): token for rel_path, token in rows}
+
+    def get(self, root_token, rel_path):
+        """读取单个目录的 token(可能由其他进程写入)，不存在时返回 None"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT token FROM folders WHERE root_token = ? AND rel_path = ?",
+                (root_token, rel_path.replace(os.sep, '/')),
+            ).fetchone()
+        return row[0] if row else None
+
+    def save(self, root_token, rel_path, token):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO folders VALUES (?, ?, ?)",
+                (root_token, rel_path.replace(os.sep, '/'), token),
+            )
+
+    def remove(self, root_token, rel_path, token):
+        """删除目录(及其下级目录)的映射；只在映射仍为 token 时删除，其他进程已重新创建的结果保留"""
+        rel_path = rel_path.replace(os.sep, '/')
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "DELETE FROM folders WHERE root_token = ? AND rel_path = ? AND token = ?",
+                (root_token, rel_path, token),
+            )
+            if cursor.rowcount:
+                self.conn.execute(
+                    "DELETE FROM folders WHERE root_token = ? AND substr(rel_path, 1, ?) = ?",
+                    (root_token, len(rel_path) + 1, rel_path + '/'),
+                )
+
+    def acquire(self, root_token, rel_path):
+        """尝试取得目录的创建租约，已被其他未过期的持有者占用时返回 False"""
+        rel_path = rel_path.replace(os.sep, '/')
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM folder_leases WHERE root_token = ? AND rel_path = ? AND expires_at < ?",
+                (root_token, rel_path, now),
+            )
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO folder_leases VALUES (?, ?, ?, ?)",
+                (root_token, rel_path, self.owner, now + self.lease_ttl),
+            )
+            return cursor.rowcount == 1
+
+    def renew(self, root_token, rel_path):
+        """延长自己持有的租约，创建耗时较长时定期调用"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE folder_leases SET expires_at = ? WHERE root_token = ? AND rel_path = ? AND owner = ?",
+                (time.time() + self.lease_ttl, root_token, rel_path.replace(os.sep, '/'), self.owner),
+            )
+
+    def release(self, root_token, rel_path):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM folder_leases WHERE root_token = ? AND rel_path = ? AND owner = ?",
+                (root_token, rel_path.replace(os.sep, '/'), self.owner),
+            )
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class FolderTree:
+    """飞书文件夹树的幂等物化
+
+    - 每个本地目录(按完整目录名)对应一个飞书文件夹；已存在的同名文件夹直接复用(每个父文件夹只列一次子项)，
+      一个远端文件夹只分配给一个本地目录，显示名相同的本地目录(如 "foo 1" 与 "foo 2")各自对应不同的文件夹
+    - ensure() 可并发调用(迁移引擎在发现新目录时即在后台调用)，兄弟文件夹并发创建，共同的上级只创建一次；
+      materialize() 对已知的目录集合按层级广度优先创建
+    - 结果写入 FolderStore，之后的运行无需再查询远端；映射中的文件夹在飞书上已被删除时，
+      在其下创建失败后移除映射并重新创建
+    """
+
+    def __init__(self, feishu_client, root_token, store=None):
+        self.feishu_client = feishu_client
+        self.root_token = root_token
+        self.store = store
+
+        # 文件夹映射: 本地相对路径 -> 飞书文件夹 token
+        self.mapping = {'': root_token}
+        if store is not None:
+            self.mapping.update(store.load(root_token))
+        # 已分配给本地目录的文件夹 token
+        self._claimed = set(self.mapping.values())
+        # 从持久化映射读取、本次运行尚未确认仍然存在的目录
+        self._unverified = set(self.mapping) - {''}
+
+        # 远端子文件夹缓存: 父文件夹 token -> {文件夹名: [尚未分配给本地目录的 token]}
+        self._children = {}
+        self._locks = {}
+
+    def _lock(self, key):
+        return self._locks.setdefault(key, asyncio.Lock())
+
+    async def _store_call(self, method, *args):
+        """在线程池中访问 FolderStore，等待数据库锁时不阻塞事件循环"""
+        return await asyncio.get_running_loop().run_in_executor(None, method, self.root_token, *args)
+
+    @staticmethod
+    def _with_ancestors(folder_path):
+        """'a/b/c' -> ['a', 'a/b', 'a/b/c']"""
+        paths = []
+        current_path = ''
+        for part in folder_path.split(os.sep):
+            if not part:
+                continue
+            current_path = os.path.join(current_path, part)
+            paths.append(current_path)
+        return paths
+
+    async def materialize(self, folder_paths):
+        """确保所有目录(及其上级目录)在飞书上存在"""
+        missing = set()
+        for folder_path in folder_paths:
+            missing.update(p for p in self._with_ancestors(folder_path) if p not in self.mapping)
+        if not missing:
+            return
+
+        # 广度优先: 逐层处理，同层并发
+        levels = {}
+        for path in missing:
+            levels.setdefault(path.count(os.sep), []).append(path)
+        for depth in sorted(levels):
+            await asyncio.gather(*(self._resolve(path) for path in sorted(levels[depth])))
+
+    async def ensure(self, folder_path):
+        """确保单个目录存在，返回其 token"""
+        folder_path = folder_path.rstrip(os.sep)
+        if not folder_path:
+            return self.root_token
+        if folder_path not in self.mapping:
+            for path in self._with_ancestors(folder_path):
+                await self._resolve(path)
+        return self.mapping[folder_path]
+
+    async def evict_if_missing(self, folder_path):
+        """在映射中的文件夹下创建文件或文件夹失败后调用: 持久化映射中的文件夹在飞书上已不存在时，
+        移除它及其下级目录的映射，之后 ensure() 会重新创建
+        Returns:
+            bool: 是否移除了映射
+        """
+        folder_path = folder_path.rstrip(os.sep)
+        # 上级目录先检查，整个子树被删除时从最上层开始重建
+        for path in self._with_ancestors(folder_path):
+            if path not in self._unverified:
+                continue
+            token = self.mapping.get(path)
+            try:
+                await self.feishu_client.alist_folder(token)
+                self._unverified.discard(path)
+            except Exception as e:
+                print(f"[DEBUG] 文件夹映射已失效，重新创建: {path} ({token}) - {str(e)}")
+                await self._evict(path, token)
+                return True
+        return False
+
+    async def _evict(self, path, token):
+        prefix = path + os.sep
+        for key in [k for k in self.mapping if k == path or k.startswith(prefix)]:
+            evicted = self.mapping.pop(key)
+            self._claimed.discard(evicted)
+            self._children.pop(evicted, None)
+            self._unverified.discard(key)
+        if self.store is not None:
+            await self._store_call(self.store.remove, path, token)
+
+    async def _resolve(self, path):
+        """复用或创建单个文件夹，调用前上级目录必须已存在"""
+        if path in self.mapping:
+            return
+        async with self._lock(path):
+            # 拿到锁后再检查一次，其他协程可能已经处理
+            if path in self.mapping:
+                return
+            if self.store is None:
+                self._assign(path, await self._find_or_create(path))
+                return
+
+            # 共用文件夹映射的其他进程可能已经创建，或正在创建
+            while True:
+                token = await self._store_call(self.store.get, path)
+                if token:
+                    self._unverified.add(path)
+                    break
+                if await self._store_call(self.store.acquire, path):
+                    renewal = asyncio.ensure_future(self._renew_lease(path))
+                    try:
+                        # 取得租约前其他进程可能刚创建完成
+                        token = await self._store_call(self.store.get, path) or await self._find_or_create(path)
+                        await self._store_call(self.store.save, path, token)
+                    finally:
+                        renewal.cancel()
+                        await self._store_call(self.store.release, path)
+                    break
+                await asyncio.sleep(LEASE_POLL_INTERVAL)
+            self._assign(path, token)
+
+    def _assign(self, path, token):
+        self.mapping[path] = token
+        self._claimed.add(token)
+
+    async def _renew_lease(self, path):
+        """持有租约期间定期续期，创建(含重试、限流等待)较慢时其他进程不会接手"""
+        while True:
+            await asyncio.sleep(self.store.lease_ttl / 3)
+            try:
+                await self._store_call(self.store.renew, path)
+            except Exception as e:
+                print(f"[DEBUG] 文件夹租约续期失败: {path} - {str(e)}")
+
+    async def _find_or_create(self, path):
+        """复用父文件夹下尚未分配的同名文件夹，没有时创建；父文件夹已被删除时重新创建父文件夹后再试一次"""
+        parent_path = os.path.dirname(path)
+        try:
+            return await self._find_or_create_in(path, self.mapping[parent_path])
+        except Exception:
+            if not parent_path or not await self.evict_if_missing(parent_path):
+                raise
+        return await self._find_or_create_in(path, await self.ensure(parent_path))
+
+    async def _find_or_create_in(self, path, parent_token):
+        part = os.path.basename(path)
+        name = self.feishu_client.folder_display_name(part)
+
+        existing = await self._child_folders(parent_token)
+        candidates = [token for token in existing.get(name, []) if token not in self._claimed]
+        if candidates:
+            # 每个远端文件夹只分配给一个本地目录
+            existing[name].remove(candidates[0])
+            self._claimed.add(candidates[0])
+            print(f"  复用已有文件夹: {path}")
+            return candidates[0]
+
+        token = await self.feishu_client.acreate_folder(part, parent_token)
+        # 新建的文件夹必然为空，无需再查询其子项
+        self._children[token] = {}
+        print(f"  创建文件夹: {path}")
+        return token
+
+    async def _child_folders(self, parent_token):
+        """获取父文件夹下已有的子文件夹，每个父文件夹只查询一次"""
+        if parent_token in self._children:
+            return self._children[parent_token]
+        async with self._lock(('children', parent_token)):
+            if parent_token not in self._children:
+                files = await self.feishu_client.alist_folder(parent_token)
+                children = {}
+                for f in files:
+                    if f.type == 'folder':
+                        children.setdefault(f.name, []).append(f.token)
+                self._children[parent_token] = children
+        return self._children[parent_token]
@@ -0,0 +1,221 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from src.manifest import cached_file_hash
+
+# 不做格式转换的图片类型: 动图转换后会丢帧
+PASSTHROUGH_EXTENSIONS = {'.gif', '.svg'}
+
+FORMAT_EXTENSIONS = {'webp': '.webp', 'jpeg': '.jpg'}
+
+
+def probe_image_size(file_path):
+    """只读取文件头获取图片尺寸，支持 PNG/JPEG/GIF/BMP/WebP
+    Returns:
+        (width, height)，无法识别时返回 None
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(32)
+
+        if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+            return struct.unpack('>II', head[16:24])
+
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            return struct.unpack('<HH', head[6:10])
+
+        if head.startswith(b'BM') and len(head) >= 26:
+            width, height = struct.unpack('<ii', head[18:26])
+            return width, abs(height)
+
+        if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+            chunk = head[12:16]
+            if chunk == b'VP8 ':
+                width, height = struct.unpack('<HH', head[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b'VP8L':
+                bits = struct.unpack('<I', head[21:25])[0]
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b'VP8X':
+                return int.from_bytes(head[24:27], 'little') + 1, int.from_bytes(head[27:30], 'little') + 1
+            return None
+
+        if head.startswith(b'\xff\xd8'):
+            return _probe_jpeg_size(f)
+
+    return None
+
+
+def _probe_jpeg_size(f):
+    """逐个跳过 JPEG 段，直到 SOF 段读取尺寸"""
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code == 0xFF:  # 填充字节
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:  # 无长度字段的标记
+            continue
+
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack('>H', length_bytes)[0]
+
+        # SOF0-SOF15，排除 DHT(C4)、JPG(C8)、DAC(CC)
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            data = f.read(5)
+            height, width = struct.unpack('>HH', data[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _transform_image(src_path, dst_path, output_format, quality, max_width):
+    """在子进程中执行: 按需缩放并重新编码图片
+    Returns:
+        (width, height): 处理后的尺寸
+    """
+    from PIL import Image
+
+    with Image.open(src_path) as img:
+        if max_width and img.width > max_width:
+            height = max(1, round(img.height * max_width / img.width))
+            img = img.resize((max_width, height), Image.LANCZOS)
+
+        if output_format == 'jpeg':
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            img.save(dst_path, 'JPEG', quality=quality, optimize=True, progressive=True)
+        elif output_format == 'webp':
+            img.save(dst_path, 'WEBP', quality=quality, method=4)
+        else:
+            img.save(dst_path, format=Image.registered_extensions().get(os.path.splitext(dst_path)[1].lower()))
+        return img.size
+
+
+class ProcessedImage:
+    """预处理后的图片: 实际上传的文件路径及其尺寸"""
+
+    def __init__(self, path, width, height):
+        self.path = path
+        self.width = width
+        self.height = height
+
+
+class ImagePipeline:
+    """上传前的图片预处理
+
+    - 只读文件头获取尺寸，不解码图片
+    - 可选: 宽度超过 max_width 的图片等比缩小；重新编码为 WebP/JPEG
+    - 转换在进程池中执行，结果按 内容哈希+参数 缓存在磁盘上，重复运行或多个文档共用的图片只处理一次
+    """
+
+    def __init__(self, cache_dir, output_format='', quality=85, max_width=0, workers=None):
+        """
+        Args:
+            cache_dir: 缓存目录
+            output_format: 目标格式 webp/jpeg，为空时保持原格式
+            quality: 有损编码质量(1-100)
+            max_width: 最大像素宽度，0 表示不缩放
+            workers: 进程池大小，默认 CPU 数
+        """
+        self.cache_dir = cache_dir
+        self.output_format = (output_format or '').lower()
+        if self.output_format and self.output_format not in FORMAT_EXTENSIONS:
+            raise Exception(f"不支持的图片格式: {output_format}")
+        self.quality = quality
+        self.max_width = max_width
+        self.workers = workers
+        self._executor = None
+        # 同一次运行中按路径去重，多个文档引用同一张图片时共用处理结果
+        self._tasks = {}
+
+    @property
+    def enabled(self):
+        return bool(self.output_format or self.max_width)
+
+    async def process(self, file_path):
+        """返回用于上传的 ProcessedImage"""
+        task = self._tasks.get(file_path)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = self._tasks[file_path] = asyncio.ensure_future(self._process(file_path))
+        try:
+            return await task
+        except Exception as e:
+            # 失败的结果不缓存，之后引用同一张图片的文档重新处理
+            if self._tasks.get(file_path) is task:
+                del self._tasks[file_path]
+            if isinstance(e, BrokenProcessPool):
+                # 子进程异常退出后进程池不可再用，下次重新创建
+                self._executor = None
+            raise
+
+    async def _process(self, file_path):
+        size = probe_image_size(file_path)
+        ext = os.path.splitext(file_path)[1].lower()
+
+        needs_resize = self.max_width and (size is None or size[0] > self.max_width)
+        if not self.enabled or ext in PASSTHROUGH_EXTENSIONS or not (self.output_format or needs_resize):
+            if size is None:
+                # 文件头无法识别时退回 Pillow
+                size = await asyncio.get_running_loop().run_in_executor(None, _read_size_with_pillow, file_path)
+            return ProcessedImage(file_path, *size)
+
+        loop = asyncio.get_running_loop()
+        # 大图片的哈希计算较慢，放到线程中执行，不阻塞其他文档和导入轮询
+        cache_key = await loop.run_in_executor(None, self._cache_key, file_path)
+        meta_path = os.path.join(self.cache_dir, cache_key + '.json')
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            cached_path = os.path.join(self.cache_dir, meta['file']) if meta['file'] else file_path
+            if os.path.exists(cached_path):
+                return ProcessedImage(cached_path, meta['width'], meta['height'])
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        dst_name = cache_key + FORMAT_EXTENSIONS.get(self.output_format, ext)
+        dst_path = os.path.join(self.cache_dir, dst_name)
+        width, height = await loop.run_in_executor(
+            self._get_executor(),
+            _transform_image, file_path, dst_path, self.output_format, self.quality, self.max_width,
+        )
+
+        # 未缩放且重新编码后反而更大时，直接上传原图
+        if not needs_resize and os.path.getsize(dst_path) >= os.path.getsize(file_path):
+            os.remove(dst_path)
+            dst_name, dst_path = None, file_path
+
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump({'file': dst_name, 'width': width, 'height': height}, f)
+        return ProcessedImage(dst_path, width, height)
+
+    def _cache_key(self, file_path):
+        # 与增量同步清单共用按 (路径, 大小, 修改时间) 缓存的 sha256，清单已计算过的图片不再读取
+        return f"{cached_file_hash(file_path)}-{self.output_format or 'orig'}-q{self.quality}-w{self.max_width}"
+
+    def _get_executor(self):
+        if self._executor is None:
+            # 事件循环和上传线程运行期间 fork 子进程可能继承被占用的锁而死锁，改用 spawn 启动
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def _read_size_with_pillow(file_path):
+    from PIL import Image
+
+    with Image.open(file_path) as img:
+        return img.size
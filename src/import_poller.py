@@ -0,0 +1,177 @@
+import asyncio
+import heapq
+import time
+
+
+class ImportTaskPoller:
+    """导入任务轮询器
+
+    在同一个后台协程中跟踪所有未完成的导入任务(ticket)，按各自的下次查询时间调度查询，
+    查询结果通过 asyncio.Future 交还给提交方。查询间隔根据文件大小和历史完成耗时自适应调整:
+    首次查询安排在预计完成时间附近，之后按指数增长的间隔继续查询。
+    """
+
+    def __init__(self, query, min_interval=0.5, max_interval=10.0, max_token_retries=10):
+        """
+        Args:
+            query: 查询单个任务的协程函数 query(ticket) -> (job_status, doc_token, job_error_msg)
+            min_interval: 最小查询间隔(秒)
+            max_interval: 最大查询间隔(秒)
+            max_token_retries: 任务成功但 token 尚未就绪时的最大重查次数
+        """
+        self.query = query
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_token_retries = max_token_retries
+
+        self._pending = {}  # ticket -> 任务状态
+        self._heap = []  # (下次查询时间, ticket)
+        self._wakeup = None
+        self._task = None
+        self._loop = None
+        self._polls = set()  # 进行中的查询任务
+
+        # 耗时模型: duration ≈ base + per_kb * size_kb，用历史完成记录做在线最小二乘拟合
+        self._n = 0
+        self._sum_x = self._sum_y = self._sum_xx = self._sum_xy = 0.0
+
+    def submit(self, ticket, file_size=0, callback=None):
+        """登记一个导入任务
+        Args:
+            ticket: 导入任务的ticket
+            file_size: 被导入文件的字节数，用于估算完成时间
+            callback: 可选，任务结束后以 future 为参数调用
+        Returns:
+            asyncio.Future: 结果为导入文档的 token
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 同步包装方法每次都会新建事件循环，旧循环上的状态不能复用
+            self._reset(loop)
+
+        future = loop.create_future()
+        if callback:
+            future.add_done_callback(callback)
+
+        now = time.monotonic()
+        self._pending[ticket] = {
+            'future': future,
+            'size_kb': file_size / 1024,
+            'submitted_at': now,
+            'interval': self.min_interval,
+            'token_retries': 0,
+        }
+        self._schedule(now + self.estimate(file_size), ticket)
+
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        return future
+
+    def estimate(self, file_size):
+        """估算导入耗时(秒)，作为首次查询的等待时间"""
+        size_kb = file_size / 1024
+        if self._n < 2:
+            return self.min_interval * 2
+
+        denominator = self._n * self._sum_xx - self._sum_x ** 2
+        if denominator > 0:
+            per_kb = max(0.0, (self._n * self._sum_xy - self._sum_x * self._sum_y) / denominator)
+        else:
+            per_kb = 0.0
+        base = (self._sum_y - per_kb * self._sum_x) / self._n
+        return min(self.max_interval, max(self.min_interval, base + per_kb * size_kb))
+
+    def _record(self, size_kb, duration):
+        self._n += 1
+        self._sum_x += size_kb
+        self._sum_y += duration
+        self._sum_xx += size_kb * size_kb
+        self._sum_xy += size_kb * duration
+
+    def _reset(self, loop):
+        self._pending = {}
+        self._heap = []
+        self._loop = loop
+        self._task = None
+        self._polls = set()
+        self._wakeup = asyncio.Event()
+
+    def _schedule(self, when, ticket):
+        heapq.heappush(self._heap, (when, ticket))
+        self._wakeup.set()
+
+    async def _run(self):
+        """后台调度循环，所有任务完成后退出
+
+        每次查询作为独立的任务运行，某个查询很慢时不会推迟其他到期任务的查询。
+        """
+        try:
+            while self._pending:
+                now = time.monotonic()
+                while self._heap and self._heap[0][0] <= now:
+                    ticket = heapq.heappop(self._heap)[1]
+                    task = self._loop.create_task(self._poll(ticket))
+                    self._polls.add(task)
+                    task.add_done_callback(self._polls.discard)
+
+                # 查询中的任务不在堆中，查询结束或重新排期时唤醒
+                timeout = self._heap[0][0] - now if self._heap else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # 调度循环意外退出(如事件循环关闭时被取消)时，不让提交方一直等待
+            for state in self._pending.values():
+                if not state['future'].done():
+                    state['future'].set_exception(Exception("导入任务轮询已停止"))
+            self._pending = {}
+
+    async def _poll(self, ticket):
+        """查询一个任务，任何异常都只影响该任务本身"""
+        state = self._pending.get(ticket)
+        if state is None:
+            return
+        try:
+            await self._poll_once(ticket, state)
+        except Exception as e:
+            self._pending.pop(ticket, None)
+            if not state['future'].done():
+                state['future'].set_exception(e)
+        finally:
+            self._wakeup.set()
+
+    async def _poll_once(self, ticket, state):
+        future = state['future']
+        if future.done():  # 提交方已取消
+            del self._pending[ticket]
+            return
+
+        job_status, doc_token, job_error_msg = await self.query(ticket)
+
+        # 查询期间提交方可能已取消等待
+        if future.done():
+            del self._pending[ticket]
+            return
+
+        now = time.monotonic()
+        if job_status == 2:  # 处理成功
+            if doc_token:
+                del self._pending[ticket]
+                self._record(state['size_kb'], now - state['submitted_at'])
+                print(f"[DEBUG] 导入文档成功, doc_token: {doc_token}")
+                future.set_result(doc_token)
+                return
+
+            # 任务刚成功时 token 可能尚未就绪，短间隔重查
+            state['token_retries'] += 1
+            if state['token_retries'] > self.max_token_retries:
+                raise Exception(f"导入任务成功但未获取到文档 token: ticket={ticket}")
+            print(f"[DEBUG] 任务成功但未检测到 token，稍后重试 ({state['token_retries']}/{self.max_token_retries})...")
+            self._schedule(now + self.min_interval, ticket)
+        elif job_status in (0, 1):  # 初始化或处理中
+            state['interval'] = min(self.max_interval, state['interval'] * 1.5)
+            self._schedule(now + state['interval'], ticket)
+        else:  # job_status == 3，处理失败
+            raise Exception(f"任务处理失败：{job_error_msg}")
@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+import time
+
+# 单个文档的迁移阶段，按先后顺序
+STAGE_UPLOADED = 'uploaded'  # md 文件已上传, 记录 file_token
+STAGE_TICKET_CREATED = 'ticket_created'  # 导入任务已创建, 记录 ticket
+STAGE_DOC_RESOLVED = 'doc_resolved'  # 导入完成, 记录 doc_token
+STAGE_IMAGE_PATCHED = 'image_patched'  # 图片块 block_id 已填入图片
+STAGE_MD_DELETED = 'md_deleted'  # 中间态 md 文件已删除, 文档迁移完成
+STAGE_RESET = 'reset'  # 失败后已清理飞书残留文件, 之前的阶段作废
+
+
+class DocumentCheckpoint:
+    """单个文档的断点信息，阶段推进时同步写入日志"""
+
+    def __init__(self, journal, key, content_hash, state=None):
+        self.journal = journal
+        self.key = key
+        self.content_hash = content_hash
+        state = state or {}
+        self.file_token = state.get('file_token')
+        self.ticket = state.get('ticket')
+        self.doc_token = state.get('doc_token')
+        self.patched_images = set(state.get('patched_images', ()))
+
+    def _append(self, stage, **data):
+        if self.journal is not None:
+            self.journal.append(self.key, stage, content_hash=self.content_hash, **data)
+
+    def uploaded(self, file_token):
+        self.file_token = file_token
+        self._append(STAGE_UPLOADED, file_token=file_token)
+
+    def ticket_created(self, ticket):
+        self.ticket = ticket
+        self._append(STAGE_TICKET_CREATED, ticket=ticket)
+
+    def doc_resolved(self, doc_token):
+        self.doc_token = doc_token
+        self._append(STAGE_DOC_RESOLVED, doc_token=doc_token)
+
+    def image_patched(self, block_id):
+        self.patched_images.add(block_id)
+        self._append(STAGE_IMAGE_PATCHED, block_id=block_id)
+
+    def md_deleted(self):
+        self._append(STAGE_MD_DELETED)
+
+    def reset(self):
+        self.file_token = self.ticket = self.doc_token = None
+        self.patched_images = set()
+        self._append(STAGE_RESET)
+
+
+class Journal:
+    """只追加的迁移阶段日志(JSON Lines)
+
+    每个文档的每次阶段推进都追加一行。进程中断后以 resume 模式重新运行时，
+    从日志中恢复每个未完成文档的最新阶段，跳过已经完成的上传、导入和图片更新。
+    """
+
+    def __init__(self, journal_path, resume=False):
+        """
+        Args:
+            journal_path: 日志文件路径
+            resume: 是否从已有日志恢复；为 False 时清空旧日志重新开始
+        """
+        journal_dir = os.path.dirname(journal_path)
+        if journal_dir:
+            os.makedirs(journal_dir, exist_ok=True)
+
+        self.journal_path = journal_path
+        self._states = self._load() if resume else {}
+        self._lock = threading.Lock()
+
+        # 只保留未完成文档的记录，避免日志无限增长
+        self._compact()
+        self._file = open(journal_path, 'a', encoding='utf-8')
+
+    def _load(self):
+        """按顺序回放日志，得到每个未完成文档的最新状态"""
+        states = {}
+        if not os.path.exists(self.journal_path):
+            return states
+
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 进程中断时最后一行可能只写了一半
+                    continue
+
+                key = entry['key']
+                stage = entry['stage']
+                if stage in (STAGE_MD_DELETED, STAGE_RESET):
+                    states.pop(key, None)
+                    continue
+
+                state = states.setdefault(key, {'content_hash': entry.get('content_hash'), 'patched_images': []})
+                if stage == STAGE_UPLOADED:
+                    state['file_token'] = entry['file_token']
+                elif stage == STAGE_TICKET_CREATED:
+                    state['ticket'] = entry['ticket']
+                elif stage == STAGE_DOC_RESOLVED:
+                    state['doc_token'] = entry['doc_token']
+                elif stage == STAGE_IMAGE_PATCHED and 'block_id' in entry:
+                    # 旧版本按图片序号记录，恢复时无法对应到图片块，忽略后重新更新这些图片
+                    state['patched_images'].append(entry['block_id'])
+        return states
+
+    def _compact(self):
+        tmp_path = self.journal_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for key, state in self._states.items():
+                base = {'key': key, 'content_hash': state.get('content_hash')}
+                dumps = lambda entry: json.dumps(entry, ensure_ascii=False)
+                if state.get('file_token'):
+                    f.write(dumps({**base, 'stage': STAGE_UPLOADED, 'file_token': state['file_token']}) + '\n')
+                if state.get('ticket'):
+                    f.write(dumps({**base, 'stage': STAGE_TICKET_CREATED, 'ticket': state['ticket']}) + '\n')
+                if state.get('doc_token'):
+                    f.write(dumps({**base, 'stage': STAGE_DOC_RESOLVED, 'doc_token': state['doc_token']}) + '\n')
+                for block_id in state['patched_images']:
+                    f.write(dumps({**base, 'stage': STAGE_IMAGE_PATCHED, 'block_id': block_id}) + '\n')
+        os.replace(tmp_path, self.journal_path)
+
+    def append(self, key, stage, **data):
+        """追加一条阶段记录并立即落盘"""
+        entry = {'key': key, 'stage': stage, 'ts': time.time(), **data}
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def checkpoint(self, key, content_hash):
+        """获取文档的断点；内容哈希与日志中不一致时视为新文档，从头开始"""
+        state = self._states.pop(key, None)
+        if state and state.get('content_hash') != content_hash:
+            print(f"[DEBUG] 文档内容已变化，放弃断点: {key}")
+            state = None
+        elif state:
+            print(f"[DEBUG] 从断点恢复: {key} {self._describe(state)}")
+        return DocumentCheckpoint(self, key, content_hash, state)
+
+    def unfinished(self):
+        """返回从日志恢复的未完成文档 {key: 状态}，状态含 file_token/ticket/doc_token"""
+        return {key: dict(state) for key, state in self._states.items()}
+
+    def discard(self, key):
+        """放弃文档的断点(其残留文件已被清理)，下次从头开始"""
+        self._states.pop(key, None)
+        self.append(key, STAGE_RESET)
+
+    @staticmethod
+    def _describe(state):
+        if state.get('doc_token'):
+            return f"(文档已导入, 已更新 {len(state['patched_images'])} 张图片)"
+        if state.get('ticket'):
+            return "(导入任务已创建)"
+        return "(md 文件已上传)"
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,109 @@
+import os
+import posixpath
+import re
+
+from src.markdown_parser import scan_doc_links
+
+# GitHub 风格的标题锚点: 去掉标点，空白替换为 -
+_SLUG_STRIP_RE = re.compile(r'[^\w\- ]')
+
+
+def heading_slug(text):
+    """由标题文字生成锚点，如 'Install & Setup' -> 'install--setup'"""
+    return _SLUG_STRIP_RE.sub('', text.strip().lower()).replace(' ', '-')
+
+
+class LinkIndex:
+    """本次运行中 Markdown 相对路径到飞书文档的索引
+
+    文档迁移完成(或因未变化跳过)时登记，所有文档完成后，由 LinkRewriter 把文档中指向其他 md 文件的
+    相对链接改写为飞书文档地址。只有本次迁移过的文档，以及链接目标在本次运行中换了新文档的文档需要改写。
+    """
+
+    def __init__(self, url_prefix, manifest=None):
+        """
+        Args:
+            url_prefix: 飞书文档地址前缀，如 https://example.feishu.cn/docx/
+            manifest: 可选的 Manifest，索引中没有的文档(如其他分片迁移的文档)从清单中查找
+        """
+        self.url_prefix = url_prefix.rstrip('/') + '/'
+        self.manifest = manifest
+        self.documents = {}  # 相对路径 -> {'doc_token', 'parts', 'path', 'migrated', 'replaced', 'engine'}
+        self.replaced_tokens = {}  # 本次运行中被替换的旧文档 token -> 相对路径
+
+    @staticmethod
+    def key(rel_path):
+        return rel_path.replace(os.sep, '/')
+
+    def add(self, rel_path, file_path, doc_token, migrated, previous_token=None, parts=None, engine=None):
+        """登记一个已完成的文档
+        Args:
+            rel_path: 文档相对路径
+            file_path: 本地文件路径
+            doc_token: 飞书文档 token
+            migrated: 本次是否写入了文档内容(为 False 时表示未变化而跳过)
+            previous_token: 上次迁移生成的文档 token；与 doc_token 不同(新建或重新导入)时，指向它的链接都需要更新
+            parts: 拆分导入时各部分的文档 token，文档中的链接实际位于各部分中
+            engine: 文档的生成方式；只有 'direct' 生成的文档中相对链接为普通文本，其余按链接地址匹配
+        """
+        key = self.key(rel_path)
+        replaced = migrated and previous_token != doc_token
+        if replaced and previous_token:
+            self.replaced_tokens[previous_token] = key
+        self.documents[key] = {
+            'doc_token': doc_token,
+            'parts': parts or [],
+            'path': file_path,
+            'migrated': migrated,
+            'replaced': replaced,
+            'engine': engine,
+        }
+
+    def doc_token(self, key):
+        """查找相对路径对应的文档 token，找不到时返回 None"""
+        document = self.documents.get(key)
+        if document is not None:
+            return document['doc_token']
+        if self.manifest is not None:
+            entry = self.manifest.get(key)
+            if entry is not None:
+                return entry['doc_token']
+        return None
+
+    def doc_url(self, doc_token, block_id=None):
+        """文档地址，block_id 不为空时定位到该块(标题)"""
+        return self.url_prefix + doc_token + (f'#{block_id}' if block_id else '')
+
+    @staticmethod
+    def target_key(key, link):
+        """链接目标的相对路径，链接到本文档标题时为 key 本身，指向 Markdown 根目录之外时返回 None"""
+        if not link.target:
+            return key
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(key), link.target))
+        if target == '..' or target.startswith('../') or target.startswith('/'):
+            return None
+        return target
+
+    def pending(self):
+        """找出需要改写链接的文档，只读取本地文件
+        Returns:
+            list: [(相对路径, 文档 token, [DocLink], 是否按文字匹配)]，拆分导入的文档为每个部分各一项
+        """
+        replaced = {key for key, document in self.documents.items() if document['replaced']}
+        jobs = []
+        for key, document in self.documents.items():
+            if not document['doc_token'] or not (document['migrated'] or replaced):
+                continue
+            try:
+                with open(document['path'], 'r', encoding='utf-8') as f:
+                    links = scan_doc_links(f.read())
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"[DEBUG] 读取文档链接失败: {document['path']} - {str(e)}")
+                continue
+            # 未变化的文档只在链接目标换了新文档时更新
+            if links and (document['migrated'] or any(self.target_key(key, link) in replaced for link in links)):
+                # 直接写入的文档中相对链接为普通文本，只能按文字匹配；导入生成的文档保留了原始地址
+                by_text = document['engine'] == 'direct' and not document['parts']
+                for doc_token in document['parts'] or [document['doc_token']]:
+                    jobs.append((key, doc_token, links, by_text))
+        return jobs
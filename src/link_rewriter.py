@@ -0,0 +1,247 @@
+import asyncio
+import copy
+from urllib.parse import quote, unquote
+
+# lark_oapi 导入较慢，SDK 的模型类在构造请求的函数中导入
+from src.docx_writer import BLOCK_TYPE_CODE, BLOCK_TYPE_HEADING1, TEXT_BLOCK_FIELDS
+from src.feishu_client import BATCH_UPDATE_LIMIT
+from src.link_index import heading_slug
+
+# 同时改写链接的文档数
+REWRITE_CONCURRENCY = 5
+
+
+def _link_element(content, style, url):
+    """复制原文本的样式，加上链接"""
+    from lark_oapi.api.docx.v1 import Link, TextElement, TextElementStyle, TextRun
+
+    style = copy.copy(style) if style is not None else TextElementStyle.builder().build()
+    # 飞书要求链接地址做 URL 编码
+    style.link = Link.builder().url(quote(url, safe='')).build()
+    return TextElement.builder().text_run(TextRun.builder().content(content).text_element_style(style).build()).build()
+
+
+def _run_link(text_run):
+    """文字上的链接地址(已解码)，没有链接时返回 None"""
+    style = text_run.text_element_style
+    if style is None or style.link is None or not style.link.url:
+        return None
+    return unquote(style.link.url)
+
+
+class LinkRewriter:
+    """所有文档迁移完成后，把文档中指向其他 md 文件的相对链接改写为飞书文档地址
+
+    只处理 LinkIndex.pending() 给出的文档: 每个文档列出一次文档块，只更新含有未解析链接的文本块，
+    并按 BATCH_UPDATE_LIMIT 批量提交。链接中的 #锚点 按标题文字匹配目标文档的标题块，
+    目标文档的标题只在有锚点链接指向它时列出一次。
+
+    - 导入生成的文档保留了原始的相对地址，只改写带有该地址的文字
+    - 直接写入的文档中相对链接为普通文本，按文档顺序逐个匹配与链接文字完全相同的文字段
+    - 链接目标在本次运行中换了新文档时，指向旧文档地址的链接改为新地址
+    """
+
+    def __init__(self, feishu_client, link_index, concurrency=REWRITE_CONCURRENCY):
+        self.feishu_client = feishu_client
+        self.link_index = link_index
+        self.concurrency = max(1, concurrency)
+        self.metrics = feishu_client.metrics
+        self._anchors = {}  # 文档 token -> 获取 {锚点: 标题块 block_id} 的任务
+
+    async def run(self):
+        """
+        Returns:
+            int: 更新的文本块数
+        """
+        jobs = self.link_index.pending()
+        if not jobs:
+            return 0
+        print(f"[DEBUG] 改写文档间链接: {len(jobs)} 个文档")
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def rewrite(key, doc_token, links, by_text):
+            async with semaphore:
+                try:
+                    return await self._rewrite_document(key, doc_token, links, by_text)
+                except Exception as e:
+                    print(f"[DEBUG] 改写文档链接失败: {key} - {str(e)}")
+                    self.metrics.inc('link_rewrite_failed')
+                    return 0
+
+        updated = await asyncio.gather(*(rewrite(*job) for job in jobs))
+        print(f"文档间链接改写完成: 更新 {sum(updated)} 个文本块")
+        return sum(updated)
+
+    async def _resolve(self, key, link):
+        """链接的飞书地址，目标文档不存在时返回 None"""
+        target = self.link_index.target_key(key, link)
+        doc_token = self.link_index.doc_token(target) if target else None
+        if not doc_token:
+            return None
+        block_id = None
+        if link.anchor:
+            anchors = await self._heading_anchors(doc_token)
+            block_id = anchors.get(link.anchor.lower()) or anchors.get(heading_slug(link.anchor))
+        return self.link_index.doc_url(doc_token, block_id)
+
+    async def _heading_anchors(self, doc_token):
+        """目标文档的 {锚点: 标题块 block_id}，每个文档只列出一次"""
+        task = self._anchors.get(doc_token)
+        if task is None:
+            task = self._anchors[doc_token] = asyncio.ensure_future(self._list_headings(doc_token))
+        return await task
+
+    async def _list_headings(self, doc_token):
+        anchors = {}
+        counts = {}
+        for block in await self.feishu_client._list_document_blocks(doc_token):
+            if not BLOCK_TYPE_HEADING1 <= (block.block_type or 0) < BLOCK_TYPE_HEADING1 + 9:
+                continue
+            text = getattr(block, TEXT_BLOCK_FIELDS[block.block_type], None)
+            content = ''.join(
+                element.text_run.content or '' for element in (text.elements or []) if element.text_run is not None
+            ) if text is not None else ''
+            # 同名标题依次为 slug、slug-1、slug-2 ...
+            slug = heading_slug(content)
+            if slug in counts:
+                counts[slug] += 1
+                slug = f'{slug}-{counts[slug]}'
+            else:
+                counts[slug] = 0
+            anchors.setdefault(slug, block.block_id)
+        return anchors
+
+    async def _rewrite_document(self, key, doc_token, links, by_text):
+        """
+        Args:
+            by_text: 是否为直接写入的文档，其中的相对链接为普通文本，按文档顺序匹配整段文字
+        """
+        from lark_oapi.api.docx.v1 import UpdateBlockRequest, UpdateTextElementsRequest
+
+        resolved = []
+        for link in links:
+            url = await self._resolve(key, link)
+            if url:
+                resolved.append((link, url))
+        if not resolved:
+            return 0
+
+        by_href = {unquote(link.href): url for link, url in resolved}
+        # 指向本次被替换的旧文档的链接
+        by_old_doc = {}
+        for old_token, target in self.link_index.replaced_tokens.items():
+            for link, url in resolved:
+                if self.link_index.target_key(key, link) == target:
+                    by_old_doc.setdefault(old_token, []).append((link.text, url))
+        # 直接写入模式只保留了行内式链接的文字，引用式链接原样显示为 [文字][标签]
+        unmatched = [(link.text, url) for link, url in resolved if link.text and link.inline] if by_text else []
+
+        requests = []
+        for block in await self.feishu_client._list_document_blocks(doc_token):
+            field = TEXT_BLOCK_FIELDS.get(block.block_type)
+            if field is None or block.block_type == BLOCK_TYPE_CODE:
+                continue
+            text = getattr(block, field, None)
+            if text is None or not text.elements:
+                continue
+            elements, changed = self._rewrite_elements(text.elements, by_href, by_old_doc, unmatched)
+            if changed:
+                requests.append(
+                    UpdateBlockRequest.builder()
+                    .block_id(block.block_id)
+                    .update_text_elements(UpdateTextElementsRequest.builder().elements(elements).build())
+                    .build()
+                )
+
+        if unmatched:
+            print(f"[DEBUG] {key}: {len(unmatched)} 个链接未能在文档中按文字定位，保持原样")
+
+        for start in range(0, len(requests), BATCH_UPDATE_LIMIT):
+            with self.metrics.timer('link_rewrite'):
+                await self.feishu_client._batch_update_blocks(doc_token, requests[start:start + BATCH_UPDATE_LIMIT])
+        self.metrics.inc('links_rewritten', len(requests))
+        return len(requests)
+
+    def _rewrite_elements(self, elements, by_href, by_old_doc, unmatched):
+        """改写一个文本块的元素
+        Args:
+            by_href: {原始相对地址: 新地址}
+            by_old_doc: {被替换的旧文档 token: [(链接文字, 新地址)]}
+            unmatched: [(链接文字, 新地址)]，直接写入的文档中尚未找到的链接，按文档顺序排列，匹配后移除；
+                导入生成的文档为空列表，只改写带有原始地址或旧文档地址的文字
+        Returns:
+            (新元素列表, 是否有变化)
+        """
+        result = []
+        changed = False
+        url_prefix = self.link_index.url_prefix
+        resolved_urls = {url for _, url in unmatched}
+        i = 0
+        while i < len(elements):
+            element = elements[i]
+            text_run = element.text_run
+            if text_run is None or not text_run.content:
+                result.append(element)
+                i += 1
+                continue
+            content = text_run.content
+            style = text_run.text_element_style
+            link = _run_link(text_run)
+
+            if link is not None:
+                url = by_href.get(link)
+                if url is None and link.startswith(url_prefix):
+                    candidates = by_old_doc.get(link[len(url_prefix):].split('#', 1)[0], [])
+                    url = next((u for text, u in candidates if text == content), candidates[0][1] if candidates else None)
+                if url is not None:
+                    result.append(_link_element(content, style, url))
+                    changed = True
+                else:
+                    result.append(element)
+                    # 已经是目标地址的链接(上次运行已改写)也算找到
+                    url = link if link in resolved_urls else None
+                if url is not None and unmatched:
+                    self._take(unmatched, lambda text, target_url: target_url == url and text == content) \
+                        or self._take(unmatched, lambda text, target_url: target_url == url)
+                i += 1
+                continue
+
+            # 直接写入的文档中相对链接的文字是单独的一段(有行内样式时为相邻的几段)普通文本，
+            # 只与文档顺序中的下一个链接比较整段文字，正文中包含链接文字的句子不会被改成链接
+            end = self._match_runs(elements, i, unmatched[0][0]) if unmatched else None
+            if end is None:
+                result.append(element)
+                i += 1
+                continue
+            _, url = unmatched.pop(0)
+            for run in elements[i:end]:
+                result.append(_link_element(run.text_run.content, run.text_run.text_element_style, url))
+            changed = True
+            i = end
+        return result, changed
+
+    @staticmethod
+    def _match_runs(elements, start, text):
+        """从 start 开始的相邻几段无链接文字连起来恰好是 text 时，返回结束位置(不含)，否则返回 None"""
+        joined = ''
+        for end in range(start, len(elements)):
+            text_run = elements[end].text_run
+            if text_run is None or not text_run.content or _run_link(text_run) is not None:
+                return None
+            # 链接前单独的空白段不属于链接文字，从下一段开始匹配
+            if end == start and not text_run.content.strip():
+                return None
+            joined += text_run.content
+            if joined.strip() == text:
+                return end + 1
+            if not text.startswith(joined.lstrip()):
+                return None
+        return None
+
+    @staticmethod
+    def _take(unmatched, predicate):
+        """移除并返回第一个满足条件的 (链接文字, 新地址)，没有时返回 None"""
+        for index, item in enumerate(unmatched):
+            if predicate(*item):
+                return unmatched.pop(index)
+        return None
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from src.markdown_parser import default_path_cache, scan_image_refs
+
+
+def compute_file_hash(file_path):
+    """计算文件内容的 sha256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_file_hashes = {}  # (路径, 大小, 修改时间) -> 哈希
+
+
+def cached_file_hash(file_path):
+    """同 compute_file_hash，多个文档引用同一张图片时只读取一次；文件大小或修改时间变化后重新计算"""
+    stat = default_path_cache.stat(file_path)
+    if stat is None:
+        return compute_file_hash(file_path)
+    key = (file_path, stat.st_size, stat.st_mtime_ns)
+    if key not in _file_hashes:
+        _file_hashes[key] = compute_file_hash(file_path)
+    return _file_hashes[key]
+
+
+def compute_document_hashes(file_path, md_bytes=None, refs=None):
+    """计算 markdown 文件及其引用图片的内容哈希
+    Args:
+        file_path: markdown 文件路径
+        md_bytes: 可选，已读取的文件内容
+        refs: 可选，已扫描的图片引用(scan_image_refs 的结果)
+    Returns:
+        (md_hash, image_hashes): image_hashes 为 {图片相对 markdown 所在目录的路径: 哈希}
+    """
+    if md_bytes is None:
+        with open(file_path, 'rb') as f:
+            md_bytes = f.read()
+    if refs is None:
+        refs = scan_image_refs(file_path, md_bytes.decode('utf-8'))
+
+    image_hashes = {}
+    md_dir = os.path.dirname(file_path)
+    for ref in refs:
+        if not ref.path:
+            continue
+        key = os.path.relpath(ref.path, md_dir).replace(os.sep, '/')
+        if key not in image_hashes:
+            image_hashes[key] = cached_file_hash(ref.path)
+
+    return hashlib.sha256(md_bytes).hexdigest(), image_hashes
+
+
+class Manifest:
+    """本地迁移清单
+
+    以 markdown 相对路径为键，记录文档内容哈希、引用图片哈希、对应的飞书文档/文件夹 token
+    以及文档的生成方式(import/direct)，用于增量同步时跳过未变化的文件。
+    """
+
+    def __init__(self, db_path):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        # 多个分片共用同一个清单时，其他进程写入期间最多等待 30 秒
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                rel_path TEXT PRIMARY KEY,
+                md_hash TEXT NOT NULL,
+                image_hashes TEXT NOT NULL,
+                doc_token TEXT,
+                folder_token TEXT,
+                updated_at REAL,
+                engine TEXT
+            )
+            """
+        )
+        # 旧版本的清单没有 engine 列，记录的文档视为生成方式未知
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(documents)")}
+        if 'engine' not in columns:
+            self.conn.execute("ALTER TABLE documents ADD COLUMN engine TEXT")
+        # 文档中每个图片块当前所引用图片的内容哈希，用于块级增量更新时判断图片是否变化
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS image_blocks (
+                doc_token TEXT NOT NULL,
+                block_id TEXT NOT NULL,
+                image_hash TEXT NOT NULL,
+                PRIMARY KEY (doc_token, block_id)
+            )
+            """
+        )
+        # 拆分导入的文档: 索引文档 token -> 按顺序的各部分文档 token
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS document_parts (
+                doc_token TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                part_token TEXT NOT NULL,
+                PRIMARY KEY (doc_token, position)
+            )
+            """
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def normalize_path(rel_path):
+        """统一使用 / 作为分隔符，保证不同平台生成的清单可以互用"""
+        return rel_path.replace(os.sep, '/')
+
+    def get(self, rel_path):
+        """读取一条记录，不存在时返回 None"""
+        row = self.conn.execute(
+            "SELECT md_hash, image_hashes, doc_token, folder_token, engine FROM documents WHERE rel_path = ?",
+            (self.normalize_path(rel_path),),
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'md_hash': row[0],
+            'image_hashes': json.loads(row[1]),
+            'doc_token': row[2],
+            'folder_token': row[3],
+            'engine': row[4],
+        }
+
+    def is_unchanged(self, rel_path, md_hash, image_hashes):
+        """文档及其所有图片都未变化，且上次已成功导入"""
+        entry = self.get(rel_path)
+        return (
+            entry is not None
+            and entry['doc_token'] is not None
+            and entry['md_hash'] == md_hash
+            and entry['image_hashes'] == image_hashes
+        )
+
+    def record(self, rel_path, md_hash, image_hashes, doc_token, folder_token, engine=None):
+        """写入或覆盖一条记录
+        Args:
+            engine: 文档的生成方式，'import' 由导入任务生成，'direct' 由本地解析后直接写入
+        """
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents "
+                "(rel_path, md_hash, image_hashes, doc_token, folder_token, updated_at, engine) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.normalize_path(rel_path),
+                    md_hash,
+                    json.dumps(image_hashes, ensure_ascii=False, sort_keys=True),
+                    doc_token,
+                    folder_token,
+                    time.time(),
+                    engine,
+                ),
+            )
+
+    def remove(self, rel_path):
+        with self.conn:
+            self.conn.execute("DELETE FROM documents WHERE rel_path = ?", (self.normalize_path(rel_path),))
+
+    def image_blocks(self, doc_token):
+        """返回文档的 {图片块 block_id: 图片哈希}"""
+        rows = self.conn.execute(
+            "SELECT block_id, image_hash FROM image_blocks WHERE doc_token = ?", (doc_token,)
+        ).fetchall()
+        return dict(rows)
+
+    def record_image_blocks(self, doc_token, image_blocks):
+        """覆盖文档的图片块哈希记录"""
+        with self.conn:
+            self.conn.execute("DELETE FROM image_blocks WHERE doc_token = ?", (doc_token,))
+            self.conn.executemany(
+                "INSERT INTO image_blocks VALUES (?, ?, ?)",
+                [(doc_token, block_id, image_hash) for block_id, image_hash in image_blocks.items()],
+            )
+
+    def remove_image_blocks(self, doc_token):
+        with self.conn:
+            self.conn.execute("DELETE FROM image_blocks WHERE doc_token = ?", (doc_token,))
+
+    def document_parts(self, doc_token):
+        """返回拆分导入的文档的各部分文档 token，未拆分时为空列表"""
+        rows = self.conn.execute(
+            "SELECT part_token FROM document_parts WHERE doc_token = ? ORDER BY position", (doc_token,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def record_document_parts(self, doc_token, part_tokens):
+        """覆盖文档的各部分记录"""
+        with self.conn:
+            self.conn.execute("DELETE FROM document_parts WHERE doc_token = ?", (doc_token,))
+            self.conn.executemany(
+                "INSERT INTO document_parts VALUES (?, ?, ?)",
+                [(doc_token, position, part_token) for position, part_token in enumerate(part_tokens)],
+            )
+
+    def remove_document_parts(self, doc_token):
+        with self.conn:
+            self.conn.execute("DELETE FROM document_parts WHERE doc_token = ?", (doc_token,))
+
+    def items(self):
+        """返回所有 (rel_path, doc_token)"""
+        return self.conn.execute("SELECT rel_path, doc_token FROM documents").fetchall()
+
+    def locations(self):
+        """返回所有 (rel_path, doc_token, folder_token)"""
+        return self.conn.execute("SELECT rel_path, doc_token, folder_token FROM documents").fetchall()
+
+    def close(self):
+        self.conn.close()
@@ -3,46 +3,489 @@ import re
 from urllib.parse import unquote
 from dotenv import load_dotenv
 
+from src.sharding import in_shard
+
 load_dotenv()
 
+
+def _compile_pattern(pattern):
+    """把 .gitignore 风格的模式编译为正则，匹配以 / 分隔的相对路径
+
+    - 不含 / 的模式匹配任意层级的文件名或目录名
+    - 以 / 开头或中间含 / 的模式相对规则所在目录锚定
+    - 支持 *、?、[...] 与 **
+    """
+    anchored = '/' in pattern.rstrip('/')
+    pattern = pattern.strip('/')
+
+    regex = ''
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('**', i):
+            regex += '.*'
+            i += 2
+        elif pattern[i] == '*':
+            regex += '[^/]*'
+            i += 1
+        elif pattern[i] == '?':
+            regex += '[^/]'
+            i += 1
+        elif pattern[i] == '[':
+            # 只有紧跟 [ 的 ! 表示取反；紧跟 [ 或 [! 的 ] 是普通字符
+            start = i + 1
+            negate = pattern.startswith('!', start)
+            if negate:
+                start += 1
+            end = pattern.find(']', start + 1 if pattern.startswith(']', start) else start)
+            if end == -1:
+                regex += re.escape(pattern[i])
+                i += 1
+            else:
+                members = re.sub(r'([\\^\[\]])', r'\\\1', pattern[start:end])
+                regex += '[' + ('^' if negate else '') + members + ']'
+                i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+
+    prefix = '' if anchored else '(?:.*/)?'
+    # 匹配到目录时，目录下的所有内容也算匹配
+    return re.compile(f'^{prefix}{regex}(?:/.*)?$')
+
+
+# 围栏代码块的起止行
+_FENCE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+# 引用式图片的链接定义: [id]: url "title"
+_REF_DEF_RE = re.compile(r'^ {0,3}\[((?:[^\[\]\\]|\\.)+)\]:\s*(?:<([^>]*)>|(\S+))')
+# 一行内需要识别的记号: 行内代码、图片(行内式/引用式)、HTML <img> 标签
+_LINE_TOKEN_RE = re.compile(
+    r'(?P<code>`+)'
+    r'|(?P<escaped>\\.)'
+    r'|!\[(?P<alt>(?:[^\[\]\\]|\\.|\[[^\[\]]*\])*)\]'
+    r'(?:\(\s*(?:<(?P<angle_src>[^>]*)>|(?P<src>[^\s()]*(?:\([^\s()]*\)[^\s()]*)*))'
+    r'(?:\s+(?:"[^"]*"|\'[^\']*\'|\([^)]*\)))?\s*\)'
+    r'|\[(?P<label>(?:[^\[\]\\]|\\.)*)\])?'
+    r'|<img\b[^>]*?\bsrc\s*=\s*(?:"(?P<html_dq>[^"]*)"|\'(?P<html_sq>[^\']*)\'|(?P<html_uq>[^\s>]+))',
+    re.IGNORECASE,
+)
+# 一行内需要识别的链接记号: 行内代码、转义、图片(跳过)、链接 [text](href)、[text][label] 与 [text]
+_LINK_TOKEN_RE = re.compile(
+    r'(?P<code>`+)'
+    r'|(?P<escaped>\\.)'
+    r'|!\[(?:[^\[\]\\]|\\.|\[[^\[\]]*\])*\](?:\([^)]*\)|\[[^\]]*\])?'
+    r'|\[(?P<text>(?:[^\[\]\\]|\\.)+)\]'
+    r'(?:\(\s*(?:<(?P<angle_href>[^>]*)>|(?P<href>[^\s()]*(?:\([^\s()]*\)[^\s()]*)*))'
+    r'(?:\s+(?:"[^"]*"|\'[^\']*\'|\([^)]*\)))?\s*\)'
+    r'|\[(?P<label>(?:[^\[\]\\]|\\.)*)\])?'
+)
+# 带协议(至少两个字符，排除 Windows 盘符)或以 // 开头的地址视为远程图片
+_REMOTE_RE = re.compile(r'^(?:[a-zA-Z][a-zA-Z0-9+.-]+:|//)')
+
+
+class ImageRef:
+    """Markdown 中的一处图片引用"""
+
+    def __init__(self, src, alt, kind, line, path=None):
+        """
+        Args:
+            src: Markdown 中的原始地址
+            alt: 替代文本
+            kind: 'inline'(![]())、'reference'(![][id]) 或 'html'(<img>)
+            line: 所在行号(从 1 开始)
+            path: 解析后存在的本地路径，远程图片或找不到的本地图片为 None
+        """
+        self.src = src
+        self.alt = alt
+        self.kind = kind
+        self.line = line
+        self.path = path
+        self.remote = bool(_REMOTE_RE.match(src))
+
+    def __repr__(self):
+        return f'ImageRef({self.kind}, {self.src!r}, line={self.line}, path={self.path!r})'
+
+
+class PathCache:
+    """图片路径解析缓存，一次运行内所有文档共用
+
+    文档大量引用同一批图片目录，每个目录只 scandir 一次，之后的存在性判断都是字典查找；
+    同一个 (所在目录, 地址) 只解析一次。
+    """
+
+    def __init__(self):
+        self._resolved = {}  # (base_dir, src) -> 本地路径或 None
+        self._dirs = {}  # 目录 -> {文件名: DirEntry}，目录不可读时为 None
+        self._missing = {}  # 不在目录列表中的路径的逐个判断结果(大小写不敏感的文件系统等)
+
+    def resolve(self, base_dir, src):
+        """把相对 base_dir 的图片地址解析为存在的本地文件路径，远程地址或文件不存在时返回 None"""
+        key = (base_dir, src)
+        if key in self._resolved:
+            return self._resolved[key]
+
+        path = None
+        if src and not _REMOTE_RE.match(src):
+            # 处理有汉字的情况 被转换成url编码；去掉 #锚点 与 ?查询参数
+            local = unquote(src.split('#', 1)[0].split('?', 1)[0])
+            if local:
+                candidate = os.path.normpath(os.path.join(base_dir, local))
+                if self.exists(candidate):
+                    path = candidate
+        self._resolved[key] = path
+        return path
+
+    def _entries(self, directory):
+        if directory not in self._dirs:
+            try:
+                with os.scandir(directory or '.') as it:
+                    self._dirs[directory] = {entry.name: entry for entry in it}
+            except OSError:
+                self._dirs[directory] = None
+        return self._dirs[directory]
+
+    def exists(self, path):
+        """判断文件是否存在"""
+        directory, name = os.path.split(path)
+        entries = self._entries(directory)
+        if entries is None:
+            return False
+        entry = entries.get(name)
+        if entry is not None:
+            return entry.is_file()
+        if path not in self._missing:
+            self._missing[path] = os.path.isfile(path)
+        return self._missing[path]
+
+    def stat(self, path):
+        """返回文件的 os.stat_result，文件不存在时返回 None；结果随目录列表缓存"""
+        directory, name = os.path.split(path)
+        entry = (self._entries(directory) or {}).get(name)
+        try:
+            return entry.stat() if entry is not None else os.stat(path)
+        except OSError:
+            return None
+
+    def clear(self):
+        self._resolved.clear()
+        self._dirs.clear()
+        self._missing.clear()
+
+
+default_path_cache = PathCache()
+
+
+def _normalize_label(label):
+    return ' '.join(label.split()).lower()
+
+
+def open_fence(line):
+    """行是围栏代码块的开始时返回围栏标记(如 '```')，否则返回 None"""
+    fence_match = _FENCE_RE.match(line)
+    return fence_match.group(1) if fence_match else None
+
+
+def closes_fence(line, fence):
+    """判断行是否结束以 fence 开始的围栏代码块: 同种字符且不短于开始围栏，之后只能有空白
+
+    图片扫描、链接扫描、文档拆分与直接写入模式的块解析都使用这一规则，保证对同一文档的代码块范围判断一致。
+    """
+    fence_match = _FENCE_RE.match(line)
+    return bool(fence_match) and fence_match.group(1)[0] == fence[0] and len(fence_match.group(1)) >= len(fence) \
+        and not line[fence_match.end():].strip()
+
+
+def _lines_outside_fences(content):
+    """按顺序返回围栏代码块之外的 (行号, 行)"""
+    fence = None
+    for line_no, line in enumerate(content.splitlines(), 1):
+        if fence is not None:
+            if closes_fence(line, fence):
+                fence = None
+            continue
+        fence = open_fence(line)
+        if fence is None:
+            yield line_no, line
+
+
+def scan_image_refs(file_path, content, path_cache=None):
+    """单遍扫描 Markdown，按文档顺序返回所有图片引用(包括远程图片和找不到的本地图片)
+
+    跳过围栏代码块与行内代码中的内容；引用式图片的链接定义可以出现在使用之后，扫描结束时统一解析，
+    没有对应定义的引用式写法按普通文本处理。
+    Args:
+        file_path: Markdown 文件路径，相对地址基于其所在目录解析
+        content: Markdown 文本
+        path_cache: 路径解析缓存，默认使用进程内共享的 default_path_cache
+    Returns:
+        list[ImageRef]
+    """
+    path_cache = path_cache or default_path_cache
+    base_dir = os.path.dirname(file_path)
+    definitions = {}
+    found = []  # (kind, alt, src 或引用标签, 行号)
+
+    for line_no, line in _lines_outside_fences(content):
+        definition = _REF_DEF_RE.match(line)
+        if definition:
+            label = _normalize_label(definition.group(1))
+            # 同一标签出现多次时以第一次为准
+            definitions.setdefault(label, definition.group(2) if definition.group(2) is not None else definition.group(3))
+            continue
+
+        pos = 0
+        while True:
+            token = _LINE_TOKEN_RE.search(line, pos)
+            if token is None:
+                break
+            pos = token.end()
+            if token.group('code') is not None:
+                # 行内代码: 跳到长度相同的结束反引号之后，没有结束反引号时按普通字符处理
+                ticks = token.group('code')
+                close = re.compile(f'(?<!`){ticks}(?!`)').search(line, pos)
+                if close:
+                    pos = close.end()
+            elif token.group('escaped') is not None:
+                continue
+            elif token.group('alt') is not None:
+                alt = token.group('alt')
+                if token.group('angle_src') is not None or token.group('src') is not None:
+                    src = token.group('angle_src') if token.group('angle_src') is not None else token.group('src')
+                    found.append(('inline', alt, src, line_no))
+                else:
+                    label = token.group('label')
+                    # ![alt][] 与 ![alt] 使用替代文本作为标签
+                    found.append(('reference', alt, label or alt, line_no))
+            else:
+                src = next(s for s in (token.group('html_dq'), token.group('html_sq'), token.group('html_uq')) if s is not None)
+                found.append(('html', '', src, line_no))
+
+    refs = []
+    for kind, alt, src, line_no in found:
+        if kind == 'reference':
+            src = definitions.get(_normalize_label(src))
+            if src is None:
+                continue
+        refs.append(ImageRef(src, alt, kind, line_no, path_cache.resolve(base_dir, src)))
+    return refs
+
+
+class DocLink:
+    """Markdown 中指向另一个 Markdown 文件(或本文档标题)的相对链接"""
+
+    def __init__(self, text, href, target, anchor, line, inline=True):
+        """
+        Args:
+            text: 链接文字(去掉行内样式标记)
+            href: Markdown 中的原始地址
+            target: 目标文件相对当前文件所在目录的路径(已解码、规范化，/ 分隔)，链接本文档标题时为空字符串
+            anchor: # 之后的锚点，没有时为空字符串
+            line: 所在行号(从 1 开始)
+            inline: 是否为行内式链接 [text](href)，引用式链接为 False
+        """
+        self.text = text
+        self.href = href
+        self.target = target
+        self.anchor = anchor
+        self.line = line
+        self.inline = inline
+
+    def __repr__(self):
+        return f'DocLink({self.text!r}, {self.href!r}, line={self.line})'
+
+
+def parse_doc_href(href):
+    """解析相对链接地址
+    Returns:
+        (target, anchor): 不是指向 .md 文件或本文档锚点的链接时返回 None
+    """
+    if not href or _REMOTE_RE.match(href):
+        return None
+    path, _, anchor = href.partition('#')
+    path = unquote(path.split('?', 1)[0])
+    if not path:
+        return ('', unquote(anchor)) if anchor else None
+    if not path.lower().endswith(('.md', '.markdown')):
+        return None
+    return os.path.normpath(path).replace(os.sep, '/'), unquote(anchor)
+
+
+def scan_doc_links(content):
+    """单遍扫描 Markdown，按文档顺序返回指向其他 Markdown 文件或本文档标题的相对链接
+
+    与 scan_image_refs 相同，跳过围栏代码块与行内代码，支持行内式与引用式链接。
+    Returns:
+        list[DocLink]
+    """
+    definitions = {}
+    found = []  # (文字, 地址或 None, 引用标签, 行号)
+
+    for line_no, line in _lines_outside_fences(content):
+        definition = _REF_DEF_RE.match(line)
+        if definition:
+            label = _normalize_label(definition.group(1))
+            definitions.setdefault(label, definition.group(2) if definition.group(2) is not None else definition.group(3))
+            continue
+
+        pos = 0
+        while True:
+            token = _LINK_TOKEN_RE.search(line, pos)
+            if token is None:
+                break
+            pos = token.end()
+            if token.group('code') is not None:
+                ticks = token.group('code')
+                close = re.compile(f'(?<!`){ticks}(?!`)').search(line, pos)
+                if close:
+                    pos = close.end()
+            elif token.group('text') is not None:
+                href = token.group('angle_href') if token.group('angle_href') is not None else token.group('href')
+                # [text][] 与 [text] 使用链接文字作为标签
+                found.append((token.group('text'), href, token.group('label') or token.group('text'), line_no))
+
+    links = []
+    for text, href, label, line_no in found:
+        inline = href is not None
+        if not inline:
+            href = definitions.get(_normalize_label(label))
+        parsed = parse_doc_href(href)
+        if parsed is None:
+            continue
+        target, anchor = parsed
+        links.append(DocLink(_plain_text(text), href, target, anchor, line_no, inline))
+    return links
+
+
+def _plain_text(text):
+    """去掉链接文字中的行内样式标记，得到文档中显示的文字"""
+    return re.sub(r'\\(.)|[*_~`]', lambda m: m.group(1) or '', text).strip()
+
+
+class IgnoreRules:
+    """一个目录下的一组 .gitignore 风格规则，后出现的规则优先，支持 ! 取反与 / 结尾的仅目录规则"""
+
+    def __init__(self, base_dir, lines):
+        self.base_dir = base_dir
+        self.rules = []
+        for line in lines:
+            line = line.rstrip('\n').rstrip()
+            if not line or line.startswith('#'):
+                continue
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            self.rules.append((_compile_pattern(line), negate, line.endswith('/')))
+
+    @classmethod
+    def from_file(cls, base_dir, file_path):
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            return cls(base_dir, f.readlines())
+
+    def match(self, rel_path, is_dir):
+        """返回 True(忽略)/False(显式保留)/None(无规则命中)，rel_path 相对 base_dir"""
+        result = None
+        for regex, negate, dir_only in self.rules:
+            path = rel_path
+            if dir_only and not is_dir:
+                # 仅目录规则对文件只在其父目录命中时生效(排除规则命中的目录已在遍历时剪枝，include 规则仍需判断)
+                path = rel_path.rpartition('/')[0]
+                if not path:
+                    continue
+            if regex.match(path):
+                result = not negate
+        return result
+
+
 class MarkdownParser:
-    def __init__(self, markdown_dir):
+    def __init__(self, markdown_dir, include_patterns=None, exclude_patterns=None, ignore_files=None, shard=None):
+        """
+        Args:
+            markdown_dir: Markdown 根目录
+            include_patterns: 只收集匹配这些模式的文件(相对根目录，.gitignore 语法)，为空时收集全部 .md
+            exclude_patterns: 排除匹配这些模式的文件和目录，命中的目录不再进入
+            ignore_files: 遍历时读取的忽略规则文件名，如 .gitignore，规则作用于所在目录及其子目录
+            shard: 可选的 (index, count)，只收集按路径哈希分配到该分片的文件
+        """
         self.markdown_dir = markdown_dir
-        
+        self.include_rules = IgnoreRules('', include_patterns) if include_patterns else None
+        self.exclude_rules = IgnoreRules('', exclude_patterns or [])
+        self.ignore_files = ignore_files or []
+        self.shard = shard
+
     def get_markdown_files(self):
         """获取所有Markdown文件"""
-        markdown_files = []
-        
-        for root, dirs, files in os.walk(self.markdown_dir):
-            for file in files:
-                if file.endswith('.md'):
-                    rel_dir = os.path.relpath(root, self.markdown_dir)
-                    if rel_dir == '.':
-                        rel_dir = ''
-                    markdown_files.append({
-                        'path': unquote(os.path.join(root, file)),
-                        'name': os.path.splitext(file)[0],
-                        'folder': rel_dir
-                    })
-        
-        return markdown_files
+        return list(self.iter_markdown_files())
+
+    def iter_markdown_files(self):
+        """边遍历边产出 Markdown 文件信息，被忽略的目录整体跳过
+
+        Yields:
+            dict: path/name/folder，以及遍历时顺带取得的 size、mtime
+        """
+        yield from self._scan('', [self.exclude_rules])
+
+    def _scan(self, rel_dir, rule_stack):
+        dir_path = os.path.join(self.markdown_dir, rel_dir) if rel_dir else self.markdown_dir
+
+        # 读取当前目录下的忽略规则文件
+        for ignore_file in self.ignore_files:
+            ignore_path = os.path.join(dir_path, ignore_file)
+            if os.path.isfile(ignore_path):
+                rule_stack = rule_stack + [IgnoreRules.from_file(rel_dir, ignore_path)]
+
+        try:
+            entries = sorted(os.scandir(dir_path), key=lambda e: e.name)
+        except OSError as e:
+            print(f"[DEBUG] 无法读取目录 {dir_path}: {str(e)}")
+            return
+
+        subdirs = []
+        for entry in entries:
+            rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+            # 与 os.walk 默认行为一致，不进入指向目录的符号链接(避免链接成环时无限递归)
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if self._is_ignored(rel_path, is_dir, rule_stack):
+                continue
+
+            if is_dir:
+                subdirs.append(rel_path)
+            elif entry.name.endswith('.md') and entry.is_file():
+                if self.include_rules and not self.include_rules.match(rel_path.replace(os.sep, '/'), False):
+                    continue
+                if not in_shard(rel_path, self.shard):
+                    continue
+                stat = entry.stat()
+                yield {
+                    'path': unquote(entry.path),
+                    'name': os.path.splitext(entry.name)[0],
+                    'folder': rel_dir,
+                    'size': stat.st_size,
+                    'mtime': stat.st_mtime,
+                }
+
+        for subdir in subdirs:
+            yield from self._scan(subdir, rule_stack)
+
+    @staticmethod
+    def _is_ignored(rel_path, is_dir, rule_stack):
+        ignored = False
+        for rules in rule_stack:
+            # 规则只作用于所在目录之下，匹配时使用相对规则目录的路径
+            base = rules.base_dir
+            if base:
+                if not rel_path.startswith(base + os.sep):
+                    continue
+                sub_path = rel_path[len(base) + 1:]
+            else:
+                sub_path = rel_path
+            result = rules.match(sub_path.replace(os.sep, '/'), is_dir)
+            if result is not None:
+                ignored = result
+        return ignored
     
     @staticmethod
-    def extract_images_from_markdown(file_path, content):
-        """从Markdown中提取图片路径"""
-        
-        # 查找Markdown中的图片链接
-        image_paths = []
-        pattern = r'!\[.*?\]\((.*?)\)'
-        matches = re.findall(pattern, content)
-        
-        for match in matches:
-            # 处理相对路径
-            if not match.startswith(('http://', 'https://')):
-                img_path = os.path.join(os.path.dirname(file_path), match)
-                # 处理有汉字的情况 被转换成url编码
-                decoded_path = unquote(img_path)
-                if os.path.exists(decoded_path):
-                    image_paths.append(decoded_path)
-        
-        return image_paths
\ No newline at end of file
+    def extract_images_from_markdown(file_path, content, path_cache=None):
+        """从Markdown中提取存在的本地图片路径，按文档顺序，跳过代码块中的图片"""
+        return [ref.path for ref in scan_image_refs(file_path, content, path_cache) if ref.path]
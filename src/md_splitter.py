@@ -0,0 +1,133 @@
+import re
+
+from src.markdown_parser import closes_fence, open_fence
+
+_HEADING_RE = re.compile(r'^ {0,3}(#{1,6})(?:[ \t]+(.*?))?[ \t]*#*[ \t]*$')
+# 引用式链接/图片的定义，拆分后每个部分都需要
+_REF_DEF_RE = re.compile(r'^ {0,3}\[(?:[^\[\]\\]|\\.)+\]:\s*\S')
+
+
+class MarkdownPart:
+    """拆分出的一部分 Markdown"""
+
+    def __init__(self, title, text, size, blocks):
+        """
+        Args:
+            title: 部分标题(第一个标题的文字)，没有标题时为空字符串
+            text: Markdown 文本
+            size: 文本字节数
+            blocks: 估算的文档块数
+        """
+        self.title = title
+        self.text = text
+        self.size = size
+        self.blocks = blocks
+
+    def __repr__(self):
+        return f'MarkdownPart({self.title!r}, {self.size} bytes, ~{self.blocks} blocks)'
+
+
+class _Line:
+    __slots__ = ('text', 'size', 'blocks', 'heading', 'title', 'definition')
+
+    def __init__(self, text, blocks, heading=0, title='', definition=False):
+        self.text = text
+        self.size = len(text.encode('utf-8'))
+        self.blocks = blocks
+        self.heading = heading  # 围栏代码块之外的标题级别，不是标题时为 0
+        self.title = title
+        self.definition = definition
+
+
+def _scan_lines(md_text):
+    """逐行标记围栏代码块之外的标题、链接定义，并粗略估算每行产生的文档块数
+
+    围栏代码块整体算一个块，其余非空行各算一个块(多行段落会高估，拆分时偏保守)。
+    """
+    lines = []
+    fence = None
+    for text in md_text.splitlines(keepends=True):
+        if fence is not None:
+            if closes_fence(text, fence):
+                fence = None
+            lines.append(_Line(text, 0))
+            continue
+        fence = open_fence(text)
+        if fence is not None:
+            lines.append(_Line(text, 1))
+            continue
+        heading = _HEADING_RE.match(text.rstrip('\r\n'))
+        if heading:
+            title = re.sub(r'[*_`~]', '', heading.group(2) or '').strip()
+            lines.append(_Line(text, 1, len(heading.group(1)), title))
+        elif _REF_DEF_RE.match(text):
+            lines.append(_Line(text, 0, definition=True))
+        else:
+            lines.append(_Line(text, 1 if text.strip() else 0))
+    return lines
+
+
+def _sections(lines, level):
+    """在级别不大于 level 的标题前切开，第一个标题之前的内容并入第一节"""
+    sections = [[]]
+    for line in lines:
+        if line.heading and line.heading <= level and any(l.blocks for l in sections[-1]):
+            sections.append([])
+        sections[-1].append(line)
+    return sections
+
+
+def _fits(lines, max_bytes, max_blocks):
+    return (not max_bytes or sum(l.size for l in lines) <= max_bytes) \
+        and (not max_blocks or sum(l.blocks for l in lines) <= max_blocks)
+
+
+def split_markdown(md_text, max_bytes=0, max_blocks=0):
+    """超过大小或块数上限的 Markdown 在标题处(围栏代码块之外)拆分为若干部分
+
+    优先在高级别标题处切分: 依次尝试 #、##、... 直到每一节都不超过上限，再把相邻的节合并到接近上限。
+    单独一节仍超过上限(没有更细的标题)时不再拆开。引用式链接与图片的定义行会补到每个部分末尾，
+    保证各部分中的引用式图片仍能解析，图片顺序与该部分导入后的图片块一致。
+    Args:
+        md_text: Markdown 文本
+        max_bytes: 字节数上限，0 表示不限制
+        max_blocks: 估算块数上限，0 表示不限制
+    Returns:
+        list[MarkdownPart]: 不需要拆分(或无法拆分)时返回空列表
+    """
+    if not max_bytes and not max_blocks:
+        return []
+    lines = _scan_lines(md_text)
+    if _fits(lines, max_bytes, max_blocks):
+        return []
+
+    levels = sorted({line.heading for line in lines if line.heading})
+    sections = None
+    for level in levels:
+        sections = _sections(lines, level)
+        if all(_fits(section, max_bytes, max_blocks) for section in sections):
+            break
+    if not sections or len(sections) < 2:
+        return []
+
+    # 相邻的节合并，每部分尽量接近上限
+    groups = [[]]
+    for section in sections:
+        if groups[-1] and not _fits(groups[-1] + section, max_bytes, max_blocks):
+            groups.append([])
+        groups[-1].extend(section)
+    if len(groups) < 2:
+        return []
+
+    definitions = [line for line in lines if line.definition]
+    parts = []
+    for group in groups:
+        # 补上定义在其他部分中的引用式链接
+        own = {id(line) for line in group if line.definition}
+        extra = [line for line in definitions if id(line) not in own]
+        text = ''.join(line.text for line in group)
+        if extra:
+            text = text.rstrip('\r\n') + '\n\n' + ''.join(line.text.rstrip('\r\n') + '\n' for line in extra)
+        title = next((line.title for line in group if line.heading), '')
+        parts.append(MarkdownPart(title, text, len(text.encode('utf-8')), sum(line.blocks for line in group)))
+    return parts
@@ -0,0 +1,219 @@
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+
+# 耗时直方图的桶上界(秒)
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class Histogram:
+    """固定桶的耗时直方图"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个桶为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """合并另一个桶边界相同的直方图"""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    @classmethod
+    def from_dict(cls, data):
+        """由 to_dict 的结果还原"""
+        bounds = [key for key in data['buckets'] if key != '+Inf']
+        hist = cls([json.loads(bound) for bound in bounds])
+        hist.counts = [data['buckets'][key] for key in bounds + ['+Inf']]
+        hist.count = data['count']
+        hist.sum = data['sum']
+        hist.min = data['min']
+        hist.max = data['max']
+        return hist
+
+    def quantile(self, q):
+        """根据桶分布估算分位数(取所在桶的上界)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'avg': round(self.sum / self.count, 6) if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.counts)),
+        }
+
+
+class Metrics:
+    """迁移过程的指标收集: 各流水线阶段与各接口的耗时直方图，以及重试、限流、上传字节数等计数
+
+    线程安全，可以在事件循环与后台线程中同时记录。
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.api = {}
+        self.counters = {}
+
+    def observe_stage(self, stage, seconds):
+        with self._lock:
+            self.stages.setdefault(stage, Histogram()).observe(seconds)
+
+    def observe_api(self, endpoint, seconds):
+        with self._lock:
+            self.api.setdefault(endpoint, Histogram()).observe(seconds)
+
+    def inc(self, name, value=1, endpoint=None):
+        """计数器加 value，endpoint 为可选的接口标签"""
+        key = (name, endpoint)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        """记录 with 块的耗时，同步和异步代码中都可使用"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.monotonic() - start)
+
+    def report(self, extra=None):
+        """生成运行报告
+        Args:
+            extra: 附加到报告中的字段，如迁移结果统计
+        """
+        with self._lock:
+            counters = {}
+            for (name, endpoint), value in sorted(self.counters.items(), key=lambda item: (item[0][0], item[0][1] or '')):
+                if endpoint is None:
+                    counters[name] = value
+                else:
+                    counters.setdefault(name, {})
+                    if isinstance(counters[name], dict):
+                        counters[name][endpoint] = value
+            report = {
+                'started_at': self.started_at,
+                'duration': round(time.monotonic() - self._started, 3),
+                'stages': {name: hist.to_dict() for name, hist in sorted(self.stages.items())},
+                'api': {name: hist.to_dict() for name, hist in sorted(self.api.items())},
+                'counters': counters,
+            }
+        if extra:
+            report.update(extra)
+        return report
+
+    def write_json(self, path, extra=None):
+        """写出 JSON 运行报告"""
+        _atomic_write(path, json.dumps(self.report(extra), ensure_ascii=False, indent=2))
+
+    def write_prometheus(self, path):
+        """写出 Prometheus textfile 格式(供 node_exporter 的 textfile collector 采集)"""
+        lines = []
+        with self._lock:
+            for metric, label, histograms in (
+                ('md2feishu_stage_seconds', 'stage', self.stages),
+                ('md2feishu_api_seconds', 'endpoint', self.api),
+            ):
+                lines.append(f'# TYPE {metric} histogram')
+                for name, hist in sorted(histograms.items()):
+                    cumulative = 0
+                    for bound, count in zip([str(b) for b in hist.buckets] + ['+Inf'], hist.counts):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{{{label}="{name}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{metric}_sum{{{label}="{name}"}} {hist.sum}')
+                    lines.append(f'{metric}_count{{{label}="{name}"}} {hist.count}')
+
+            names = sorted({name for name, _ in self.counters})
+            for name in names:
+                lines.append(f'# TYPE md2feishu_{name}_total counter')
+                for (counter, endpoint), value in sorted(self.counters.items(), key=lambda item: item[0][1] or ''):
+                    if counter != name:
+                        continue
+                    labels = f'{{endpoint="{endpoint}"}}' if endpoint else ''
+                    lines.append(f'md2feishu_{name}_total{labels} {value}')
+
+            lines.append('# TYPE md2feishu_run_duration_seconds gauge')
+            lines.append(f'md2feishu_run_duration_seconds {time.monotonic() - self._started}')
+        _atomic_write(path, '\n'.join(lines) + '\n')
+
+
+def merge_reports(reports):
+    """把多个分片各自的运行报告合并为一份
+
+    直方图与计数器逐项相加，迁移结果的各项数量相加、失败列表合并，
+    开始时间取最早的一个，耗时为最早开始到最晚结束的跨度。
+    """
+    metrics = Metrics()
+    for report in reports:
+        for target, histograms in ((metrics.stages, report.get('stages', {})), (metrics.api, report.get('api', {}))):
+            for name, data in histograms.items():
+                hist = Histogram.from_dict(data)
+                if name in target:
+                    target[name].merge(hist)
+                else:
+                    target[name] = hist
+        for name, value in report.get('counters', {}).items():
+            if isinstance(value, dict):
+                for endpoint, count in value.items():
+                    metrics.inc(name, count, endpoint)
+            else:
+                metrics.inc(name, value)
+
+    merged = metrics.report()
+    if reports:
+        started_at = min(report['started_at'] for report in reports)
+        finished_at = max(report['started_at'] + report['duration'] for report in reports)
+        merged['started_at'] = started_at
+        merged['duration'] = round(finished_at - started_at, 3)
+
+    results = [report['result'] for report in reports if 'result' in report]
+    if results:
+        merged['result'] = {key: sum(result.get(key, 0) for result in results) for key in results[0]}
+    merged['failed'] = [failure for report in reports for failure in report.get('failed', [])]
+    merged['shards'] = [report.get('shard') for report in reports]
+    return merged
+
+
+def _atomic_write(path, content):
+    """先写临时文件再替换，避免采集方读到写了一半的文件"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
@@ -0,0 +1,352 @@
+import asyncio
+import concurrent.futures
+import itertools
+import math
+import os
+import threading
+import time
+
+from src.folder_tree import FolderTree
+from src.manifest import cached_file_hash, compute_document_hashes
+from src.markdown_parser import scan_image_refs
+from src.sharding import in_shard
+
+
+class MigrationEngine:
+    """并发迁移引擎
+
+    基于 asyncio 同时处理多个 Markdown 文档, 同一时刻最多 concurrency 个文档在途。
+    单个文档的上传、导入、图片更新及失败清理逻辑仍由 FeishuClient.aimport_md_to_docx
+    (direct 模式下为 FeishuClient.awrite_md_to_docx) 负责。
+    """
+
+    def __init__(
+        self,
+        feishu_client,
+        root_folder_token,
+        concurrency=5,
+        manifest=None,
+        delete_removed=False,
+        journal=None,
+        folder_tree=None,
+        docx_engine='import',
+        diff_update=False,
+        shard=None,
+        cost_model=None,
+        link_index=None,
+        schedule_window=200,
+    ):
+        """
+        Args:
+            feishu_client: FeishuClient 实例
+            root_folder_token: 飞书目标根文件夹 token
+            concurrency: 同时处理的文档数量
+            manifest: 可选的 Manifest，提供时只迁移新增或变化的文档
+            delete_removed: 本地已删除的文档是否同步删除飞书上的文档(需要 manifest)
+            journal: 可选的 Journal，记录每个文档的阶段进度，用于中断后恢复
+            folder_tree: 可选的 FolderTree(可带持久化存储)，默认仅在内存中记录本次运行创建的文件夹
+            docx_engine: 文档生成方式，'import' 走导入任务，'direct' 本地解析后直接写入文档块
+            diff_update: 内容变化的文档是否以块级差异更新原文档(需要 manifest，只用于直接写入模式生成的文档)，
+                失败时退回重新导入
+            shard: 可选的 (index, count)，本进程只负责该分片的文档，删除本地已删除的文档时也只处理该分片
+            cost_model: 可选的 CostModel；提供时按预计耗时从长到短派发文档，并记录实际耗时
+            schedule_window: 按耗时派发时，已发现、等待派发的文档数上限；遍历目录的同时即开始派发，
+                每次从窗口内取耗时最长的文档
+            link_index: 可选的 LinkIndex；提供时登记每个文档的 token，全部完成后改写文档间的相对链接
+        """
+        self.feishu_client = feishu_client
+        self.root_folder_token = root_folder_token
+        self.concurrency = max(1, concurrency)
+        self.manifest = manifest
+        self.delete_removed = delete_removed
+        self.journal = journal
+        self.docx_engine = docx_engine
+        self.diff_update = diff_update
+        self.shard = shard
+        self.cost_model = cost_model
+        self.link_index = link_index
+        self.schedule_window = max(1, schedule_window)
+
+        self.folder_tree = folder_tree or FolderTree(feishu_client, root_folder_token)
+        self.metrics = feishu_client.metrics
+
+    async def run(self, markdown_files):
+        """并发迁移所有文档
+        Args:
+            markdown_files: 文件信息的可迭代对象，如 MarkdownParser.iter_markdown_files()；
+                在后台线程中迭代；不按耗时排序时文件边发现边迁移
+        Returns:
+            dict: {'succeeded': [文件路径], 'skipped': [文件路径], 'failed': [(文件路径, 错误信息)],
+                   'removed': [相对路径]}
+        """
+        result = {'succeeded': [], 'skipped': [], 'failed': [], 'removed': []}
+        seen_paths = set()
+
+        # 文件发现(可能涉及大量慢速目录遍历)放在线程中进行，避免阻塞事件循环
+        loop = asyncio.get_running_loop()
+        if self.cost_model is not None:
+            # 按预计耗时排序: 边发现边估算，空闲的 worker 从共享的优先队列中取已发现文档里耗时最长的一个；
+            # 队列有上限，遍历最多领先派发 schedule_window 个文档
+            queue = asyncio.PriorityQueue(maxsize=self.schedule_window)
+        else:
+            queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        order = itertools.count()
+        features = {}
+        folder_tasks = []
+        # 迁移出错或被取消(如 Ctrl-C)时通知发现线程退出，不再阻塞在已满的队列上
+        stopped = threading.Event()
+
+        def put(file_info, cost=0.0):
+            """把文件放入队列，队列满时等待；引擎已停止时放弃并返回 False"""
+            # 结束标记的优先级最低，所有文件取完后才会取到
+            item = (-cost if file_info is not None else math.inf, next(order), file_info)
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            while not stopped.is_set():
+                try:
+                    future.result(timeout=0.5)
+                    return True
+                except concurrent.futures.TimeoutError:
+                    continue
+            future.cancel()
+            return False
+
+        def prepare_folder(folder):
+            # 发现新目录时即在后台创建对应的文件夹，兄弟目录的文件夹并发创建(共同的上级只创建一次)，
+            # 文档出队开始迁移时其目标文件夹通常已经就绪
+            folder_tasks.append(asyncio.ensure_future(self.folder_tree.ensure(folder)))
+
+        def produce():
+            try:
+                files = iter(markdown_files)
+                folders = set()
+                while not stopped.is_set():
+                    with self.metrics.timer('discover'):
+                        file_info = next(files, None)
+                    if file_info is None:
+                        break
+                    self.metrics.inc('files_discovered')
+                    if file_info['folder'] not in folders:
+                        folders.add(file_info['folder'])
+                        loop.call_soon_threadsafe(prepare_folder, file_info['folder'])
+                    if self.cost_model is None:
+                        put(file_info)
+                    else:
+                        put(file_info, self._estimate(file_info, features))
+            finally:
+                # 每个 worker 一个结束标记
+                for _ in range(self.concurrency):
+                    if not put(None):
+                        break
+
+        async def worker():
+            # 所有 worker 共享同一个队列，谁空闲谁取下一个文件
+            while True:
+                _, _, file_info = await queue.get()
+                if file_info is None:
+                    break
+                rel_path = self._rel_path(file_info)
+                seen_paths.add(rel_path)
+                start = time.monotonic()
+                try:
+                    migrated = await self._migrate_file(file_info)
+                    result['succeeded' if migrated else 'skipped'].append(file_info['path'])
+                    self.metrics.inc('documents_migrated' if migrated else 'documents_skipped')
+                    if migrated:
+                        self.metrics.observe_stage('document', time.monotonic() - start)
+                        if rel_path in features:
+                            self.cost_model.observe(rel_path, features[rel_path], time.monotonic() - start)
+                except Exception as e:
+                    result['failed'].append((file_info['path'], str(e)))
+                    self.metrics.inc('documents_failed')
+
+        # 中间态文件在后台删除，不占用文档迁移的关键路径
+        cleanup_queue = self.feishu_client.cleanup_queue
+        if cleanup_queue is not None:
+            cleanup_queue.start()
+        try:
+            try:
+                await asyncio.gather(loop.run_in_executor(None, produce), *(worker() for _ in range(self.concurrency)))
+            finally:
+                stopped.set()
+            # 预先创建文件夹失败时，对应文档迁移时已重试并记录失败，这里只回收结果
+            await asyncio.gather(*folder_tasks, return_exceptions=True)
+
+            # 所有文档的 token 都已知，再统一改写文档间的链接
+            if self.link_index is not None:
+                await self._rewrite_links()
+
+            if self.manifest is not None and self.delete_removed:
+                result['removed'] = await self._remove_deleted(seen_paths)
+        finally:
+            if cleanup_queue is not None:
+                with self.metrics.timer('cleanup_drain'):
+                    await cleanup_queue.drain()
+            # 远程图片的连接池绑定当前事件循环，结束前关闭
+            if self.feishu_client.remote_images is not None:
+                await self.feishu_client.remote_images.aclose()
+        return result
+
+    def _estimate(self, file_info, features):
+        """在发现线程中估算文档耗时，读取失败时排在最后，由迁移本身报告错误
+
+        需要内容哈希(增量同步或断点续传)时一并计算，存入 file_info['hashes']，迁移时不再重复读取文件。
+        """
+        rel_path = self._rel_path(file_info)
+        file_path = file_info['path']
+        try:
+            with open(file_path, 'rb') as f:
+                md_bytes = f.read()
+            refs = scan_image_refs(file_path, md_bytes.decode('utf-8'))
+            features[rel_path] = self.cost_model.features(file_path, md_bytes, refs)
+            if self.manifest is not None or self.journal is not None:
+                with self.metrics.timer('hash'):
+                    file_info['hashes'] = compute_document_hashes(file_path, md_bytes, refs)
+        except Exception as e:
+            print(f"[DEBUG] 估算迁移耗时失败: {file_info['path']} - {str(e)}")
+            return 0.0
+        return self.cost_model.estimate(rel_path, features[rel_path], incremental=self.manifest is not None)
+
+    @staticmethod
+    def doc_title(name):
+        """由不含扩展名的文件名得到飞书文档标题(去掉最后一个空格之后的部分，如导出时附加的 ID)"""
+        return name.rsplit(' ', 1)[0]
+
+    @staticmethod
+    def _rel_path(file_info):
+        """文档相对 markdown 根目录的路径，作为清单的键"""
+        return os.path.join(file_info['folder'], os.path.basename(file_info['path']))
+
+    async def _migrate_file(self, file_info):
+        """迁移单个文档
+        Returns:
+            bool: 是否实际执行了导入(内容未变化而跳过时为 False)
+        """
+        file_path = file_info['path']
+        file_name = self.doc_title(file_info['name'])
+        rel_path = self._rel_path(file_info)
+
+        previous = None
+        checkpoint = None
+        if self.manifest is not None or self.journal is not None:
+            if 'hashes' in file_info:
+                md_hash, image_hashes = file_info['hashes']
+            else:
+                with self.metrics.timer('hash'):
+                    md_hash, image_hashes = compute_document_hashes(file_path)
+        if self.manifest is not None:
+            previous = self.manifest.get(rel_path)
+            if self.manifest.is_unchanged(rel_path, md_hash, image_hashes):
+                if self.link_index is not None:
+                    self.link_index.add(
+                        rel_path, file_path, previous['doc_token'], migrated=False,
+                        parts=self.manifest.document_parts(previous['doc_token']), engine=previous['engine'],
+                    )
+                return False
+        if self.journal is not None:
+            checkpoint = self.journal.checkpoint(rel_path.replace(os.sep, '/'), md_hash)
+
+        print(f"正在处理: {file_path}")
+
+        # 确保目标文件夹存在
+        with self.metrics.timer('folder'):
+            parent_token = await self.folder_tree.ensure(file_info['folder'])
+
+        doc_token = None
+        engine = self.docx_engine
+        # 已有文档且没有未完成的导入断点时，只把差异更新到原文档
+        in_progress = checkpoint is not None and (checkpoint.file_token or checkpoint.ticket or checkpoint.doc_token)
+        # 只有直接写入模式生成的文档与本地解析结果的块结构一致；导入任务生成的文档(包括拆分导入的文档)
+        # 逐块比较时大部分块对不上，会被整体删除重写并丢失内嵌图片等内容，改为重新导入
+        if self.diff_update and previous and previous['doc_token'] and previous['engine'] == 'direct' \
+                and not in_progress:
+            try:
+                doc_token = await self.feishu_client.aupdate_md_docx(
+                    file_path, previous['doc_token'], self.manifest.image_blocks(previous['doc_token'])
+                )
+                engine = 'direct'
+            except Exception as e:
+                print(f"[DEBUG] 增量更新文档失败，改为重新导入: {file_path} - {str(e)}")
+                self.feishu_client.image_blocks.pop(previous['doc_token'], None)
+
+        # 上传markdown文件为飞书文档
+        if doc_token is None:
+            try:
+                doc_token = await self._create_doc(file_path, file_name, parent_token, checkpoint)
+            except Exception:
+                # 文件夹映射中的目标文件夹可能已在飞书上被删除，重新创建后再试一次
+                if not await self.folder_tree.evict_if_missing(file_info['folder']):
+                    raise
+                parent_token = await self.folder_tree.ensure(file_info['folder'])
+                doc_token = await self._create_doc(file_path, file_name, parent_token, checkpoint)
+
+        image_blocks = self.feishu_client.image_blocks.pop(doc_token, {})
+        parts = self.feishu_client.document_parts.pop(doc_token, [])
+        if self.manifest is not None:
+            self.manifest.record(rel_path, md_hash, image_hashes, doc_token, parent_token, engine)
+            self._record_image_blocks(file_path, doc_token, image_blocks, image_hashes)
+            if parts:
+                self.manifest.record_document_parts(doc_token, parts)
+            # 新文档导入成功后再删除旧文档
+            if previous and previous['doc_token'] and previous['doc_token'] != doc_token:
+                await self._delete_doc(previous['doc_token'])
+                self.manifest.remove_image_blocks(previous['doc_token'])
+
+        if self.link_index is not None:
+            self.link_index.add(
+                rel_path, file_path, doc_token, migrated=True, previous_token=previous and previous['doc_token'],
+                parts=parts, engine=engine,
+            )
+        print(f"  文档上传完成: {file_name}")
+        return True
+
+    async def _create_doc(self, file_path, file_name, parent_token, checkpoint):
+        """按文档生成方式新建文档，失败时已清理残留文件并重置断点"""
+        if self.docx_engine == 'direct':
+            return await self.feishu_client.awrite_md_to_docx(file_path, file_name, parent_token, checkpoint)
+        return await self.feishu_client.aimport_md_to_docx(file_path, file_name, parent_token, checkpoint)
+
+    def _record_image_blocks(self, file_path, doc_token, image_blocks, image_hashes):
+        """把本次写入的图片块及其图片哈希记入清单，供下次块级比较"""
+        md_dir = os.path.dirname(file_path)
+        block_hashes = {}
+        for block_id, img_path in image_blocks.items():
+            key = os.path.relpath(img_path, md_dir).replace(os.sep, '/')
+            block_hashes[block_id] = image_hashes.get(key) or cached_file_hash(img_path)
+        self.manifest.record_image_blocks(doc_token, block_hashes)
+
+    async def _delete_doc(self, doc_token):
+        """删除飞书上的旧文档(有删除队列时在后台删除)及其拆分出的各部分，失败只打印不中断"""
+        parts = self.manifest.document_parts(doc_token) if self.manifest is not None else []
+        for token in [doc_token] + parts:
+            try:
+                await self.feishu_client._discard_file(token, "docx", "旧文档")
+            except Exception as e:
+                print(f"[DEBUG] 删除旧文档失败: {token} - {str(e)}")
+        if parts:
+            self.manifest.remove_document_parts(doc_token)
+
+    async def _rewrite_links(self):
+        """改写文档间的相对链接，失败只打印不影响迁移结果"""
+        from src.link_rewriter import LinkRewriter
+
+        try:
+            with self.metrics.timer('links'):
+                await LinkRewriter(self.feishu_client, self.link_index).run()
+        except Exception as e:
+            print(f"[DEBUG] 改写文档间链接失败: {str(e)}")
+
+    async def _remove_deleted(self, seen_paths):
+        """删除本地已不存在的文档对应的飞书文档，并从清单中移除"""
+        seen = {self.manifest.normalize_path(p) for p in seen_paths}
+        removed = []
+        for rel_path, doc_token in self.manifest.items():
+            # 其他分片的文档由其所在分片处理
+            if rel_path in seen or not in_shard(rel_path, self.shard):
+                continue
+            if doc_token:
+                await self._delete_doc(doc_token)
+                self.manifest.remove_image_blocks(doc_token)
+            self.manifest.remove(rel_path)
+            removed.append(rel_path)
+            print(f"  已删除本地不存在的文档: {rel_path}")
+        return removed
@@ -0,0 +1,210 @@
+import math
+import os
+
+from src.manifest import compute_document_hashes
+from src.markdown_parser import default_path_cache, scan_image_refs
+from src.md_splitter import split_markdown
+from src.rate_limiter import DEFAULT_RATE_LIMITS
+from src.remote_images import RemoteImageFetcher
+
+# 估算用的经验值
+AVG_CALL_LATENCY = 0.3  # 单次接口调用的平均耗时(秒)
+IMPORT_WAIT = 3.0  # 导入任务的基础排队与转换耗时(秒)
+IMPORT_WAIT_PER_KB = 0.01  # 导入任务按文件大小增加的耗时(秒/KB)
+IMPORT_POLLS = 3  # 每个导入任务的平均查询次数
+LIST_PAGE_SIZE = 500  # 列出文档块的分页大小
+UPLOAD_BLOCK_SIZE = 4 * 1024 * 1024  # 分片上传的分片大小
+
+
+class MigrationPlan:
+    """一次迁移需要的接口调用、上传字节数和预计耗时，只读取本地文件，不访问网络"""
+
+    def __init__(
+        self,
+        markdown_parser,
+        docx_engine='import',
+        concurrency=5,
+        rate_limits=None,
+        multipart_threshold=20 * 1024 * 1024,
+        manifest=None,
+        folder_mapping=None,
+        remote_images=True,
+        split_max_bytes=0,
+        split_max_blocks=0,
+    ):
+        """
+        Args:
+            markdown_parser: MarkdownParser 实例
+            docx_engine: 'import' 或 'direct'
+            concurrency: 同时迁移的文档数
+            rate_limits: 覆盖默认的接口配额
+            multipart_threshold: 超过该字节数的文件使用分片上传
+            manifest: 可选的 Manifest，提供时跳过内容未变化的文档
+            folder_mapping: 已知的 {相对目录: 文件夹 token}，其中的目录无需创建
+            remote_images: 是否下载并上传远程图片
+            split_max_bytes: 导入模式下超过该字节数的文档拆分导入，0 表示不限制
+            split_max_blocks: 导入模式下估算块数超过该值的文档拆分导入，0 表示不限制
+        """
+        self.markdown_parser = markdown_parser
+        self.docx_engine = docx_engine
+        self.concurrency = max(1, concurrency)
+        self.rate_limits = {**DEFAULT_RATE_LIMITS, **(rate_limits or {})}
+        self.multipart_threshold = multipart_threshold
+        self.manifest = manifest
+        self.folder_mapping = folder_mapping or {}
+        self.remote_images = remote_images
+        self.split_max_bytes = split_max_bytes
+        self.split_max_blocks = split_max_blocks
+
+        self.calls = {}
+        self.documents = 0
+        self.unchanged = 0
+        self.images = 0
+        self.missing_images = 0
+        self.remote_urls = set()
+        self.split_documents = 0
+        self.split_parts = 0
+        self.md_bytes = 0
+        self.image_bytes = 0
+        self.folders = set()
+        self._latency = 0.0
+
+    def _add_calls(self, endpoint, count=1):
+        if count:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + count
+
+    def _upload_calls(self, size):
+        """上传一个文件需要的调用次数"""
+        if size > self.multipart_threshold:
+            return 2 + math.ceil(size / UPLOAD_BLOCK_SIZE)  # prepare + parts + finish
+        return 1
+
+    def build(self):
+        """遍历目录并累计每个文档的调用"""
+        for file_info in self.markdown_parser.iter_markdown_files():
+            self._plan_document(file_info)
+        self._plan_folders()
+        return self
+
+    def _plan_document(self, file_info):
+        file_path = file_info['path']
+        with open(file_path, 'r', encoding='utf-8') as f:
+            md_text = f.read()
+
+        if self.manifest is not None:
+            rel_path = os.path.join(file_info['folder'], os.path.basename(file_path))
+            md_hash, image_hashes = compute_document_hashes(file_path)
+            if self.manifest.is_unchanged(rel_path, md_hash, image_hashes):
+                self.unchanged += 1
+                return
+
+        self.documents += 1
+        if file_info['folder']:
+            self.folders.add(file_info['folder'])
+
+        size = len(md_text.encode('utf-8'))
+        image_refs = scan_image_refs(file_path, md_text)
+        images = [ref.path for ref in image_refs if ref.path]
+        remote = [
+            ref.src for ref in image_refs
+            if not ref.path and self.remote_images and RemoteImageFetcher.supports(ref.src)
+        ]
+        self.remote_urls.update(remote)
+        self.missing_images += len(image_refs) - len(images) - len(remote)
+        self.images += len(images) + len(remote)
+        self.md_bytes += size
+
+        calls_before = sum(self.calls.values())
+        if self.docx_engine == 'direct':
+            # 按空行粗略估计顶层块数，每批最多 50 个
+            blocks = sum(1 for chunk in md_text.split('\n\n') if chunk.strip())
+            self._add_calls('docx.document')
+            self._add_calls('docx.block', max(1, math.ceil(blocks / 50)))
+        else:
+            # 超过上限的文档按标题拆分，每个部分单独导入，另建一个索引文档
+            parts = split_markdown(md_text, self.split_max_bytes, self.split_max_blocks)
+            if parts:
+                self.split_documents += 1
+                self.split_parts += len(parts)
+                self._add_calls('docx.document')
+                self._add_calls('docx.block')
+            for part_size in [part.size for part in parts] or [size]:
+                self._add_calls('drive.upload', self._upload_calls(part_size))
+                self._add_calls('drive.import_task', 1 + IMPORT_POLLS)
+                self._add_calls('drive.delete')
+                self._latency += IMPORT_WAIT + IMPORT_WAIT_PER_KB * part_size / 1024
+            if images or remote:
+                self._add_calls('docx.block', max(1, len(parts)))  # 找齐图片块后即停止翻页
+
+        for img_path in images:
+            image_size = default_path_cache.stat(img_path).st_size
+            self.image_bytes += image_size
+            self._add_calls('drive.upload', self._upload_calls(image_size))
+        # 远程图片大小未知，按单次上传估计
+        self._add_calls('drive.upload', len(remote))
+        if images or remote:
+            self._add_calls('docx.block', math.ceil((len(images) + len(remote)) / 200))
+
+        self._latency += (sum(self.calls.values()) - calls_before) * AVG_CALL_LATENCY
+
+    def _plan_folders(self):
+        missing = set()
+        for folder in self.folders:
+            parts = folder.split(os.sep)
+            missing.update(os.path.join(*parts[:n]) for n in range(1, len(parts) + 1))
+        missing -= set(self.folder_mapping)
+        # 只有已存在的父文件夹需要先列出子项，新建的文件夹必然为空
+        listed_parents = {os.path.dirname(path) for path in missing} - missing
+        self._add_calls('drive.list', len(listed_parents))
+        self._add_calls('drive.folder', len(missing))
+        self.folders = missing
+
+    def estimated_seconds(self):
+        """预计耗时: 取 "接口配额" 与 "单文档耗时 / 并发数" 两者中的瓶颈"""
+        rate_bound = max(
+            (count / self.rate_limits.get(endpoint, self.rate_limits['default']) for endpoint, count in self.calls.items()),
+            default=0.0,
+        )
+        return max(rate_bound, self._latency / self.concurrency)
+
+    def summary(self):
+        return {
+            'documents': self.documents,
+            'unchanged': self.unchanged,
+            'folders_to_create': len(self.folders),
+            'images': self.images,
+            'missing_images': self.missing_images,
+            'remote_images': len(self.remote_urls),
+            'split_documents': self.split_documents,
+            'split_parts': self.split_parts,
+            'upload_bytes': self.md_bytes + self.image_bytes if self.docx_engine == 'import' else self.image_bytes,
+            'api_calls': dict(sorted(self.calls.items())),
+            'total_api_calls': sum(self.calls.values()),
+            'estimated_seconds': round(self.estimated_seconds(), 1),
+        }
+
+    def print_summary(self):
+        summary = self.summary()
+        print(f"迁移计划 (DOCX_ENGINE={self.docx_engine}, 并发 {self.concurrency}, 不访问网络):")
+        print(f"  待迁移文档: {summary['documents']} 个" + (f", 未变化跳过: {summary['unchanged']} 个" if self.manifest else ''))
+        print(f"  待创建文件夹: {summary['folders_to_create']} 个")
+        if summary['split_documents']:
+            print(f"  拆分导入: {summary['split_documents']} 个文档拆分为 {summary['split_parts']} 个部分")
+        print(f"  图片: {summary['images']} 张" + (f", 需下载的远程图片(去重后): {summary['remote_images']} 张" if summary['remote_images'] else '')
+              + (f", 找不到或不上传的图片: {summary['missing_images']} 张" if summary['missing_images'] else ''))
+        print(f"  上传数据量: {summary['upload_bytes'] / 1024 / 1024:.2f} MB")
+        print(f"  接口调用: 共 {summary['total_api_calls']} 次")
+        for endpoint, count in summary['api_calls'].items():
+            rate = self.rate_limits.get(endpoint, self.rate_limits['default'])
+            print(f"    {endpoint:<20} {count:>8} 次 (配额 {rate:g}/s)")
+        print(f"  预计耗时: {_format_duration(summary['estimated_seconds'])}")
+
+
+def _format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours} 小时 {minutes} 分"
+    if minutes:
+        return f"{minutes} 分 {seconds} 秒"
+    return f"{seconds} 秒"
@@ -0,0 +1,140 @@
+import asyncio
+import random
+import threading
+import time
+
+# 飞书限流相关错误码: 99991400 通用频率限制, 1061045 云空间接口频率限制
+RATE_LIMIT_CODES = {99991400, 1061045}
+
+# 各接口默认配额(每秒请求数)，可通过 FEISHU_RATE_LIMITS 环境变量覆盖
+DEFAULT_RATE_LIMITS = {
+    'auth': 5,
+    'drive.upload': 5,  # drive.v1.file.upload_all / media.upload_all
+    'drive.import_task': 5,  # drive.v1.import_task.create / get
+    'drive.folder': 5,  # drive.v1.file.create_folder
+    'drive.list': 5,  # drive.v1.file.list
+    'drive.delete': 5,  # drive.v1.file.delete
+    'docx.document': 3,  # docx.v1.document.create
+    'docx.block': 3,  # docx.v1.document_block.list / batch_update, document_block_children.create 等
+    'default': 5,
+}
+
+
+class TokenBucket:
+    """令牌桶，支持被限流后整体暂停一段时间"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1, rate))
+        self.tokens = self.capacity
+        # 开始补充令牌的时间；被限流暂停时推迟到暂停结束
+        self.updated = time.monotonic()
+
+    def reserve(self, now):
+        """预占一个令牌，返回调用方需要等待的秒数
+
+        令牌允许透支为负数，透支部分按速率排队，保证并发调用方按到达顺序依次放行；
+        暂停期间到达的调用方在暂停结束后同样按 1/rate 的间隔依次放行，不会同时涌向刚限流的接口。
+        """
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        self.tokens -= 1
+
+        wait = self.updated - now
+        if self.tokens < 0:
+            wait += -self.tokens / self.rate
+        return wait
+
+    def block(self, now, seconds):
+        """收到限流响应后，在 seconds 秒内暂停发放令牌，暂停结束时只剩一个令牌"""
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = max(self.updated, now + seconds)
+        self.tokens = min(self.tokens, 1.0)
+
+
+class RateLimiter:
+    """按接口划分配额的共享限流器，线程与协程均可安全使用"""
+
+    def __init__(self, limits=None, base_delay=1.0, max_delay=30.0):
+        self.limits = dict(DEFAULT_RATE_LIMITS)
+        self.limits.update(limits or {})
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _reserve(self, endpoint):
+        with self._lock:
+            bucket = self._buckets.get(endpoint)
+            if bucket is None:
+                rate = self.limits.get(endpoint, self.limits['default'])
+                bucket = self._buckets[endpoint] = TokenBucket(rate)
+            return bucket.reserve(time.monotonic())
+
+    def acquire(self, endpoint):
+        """同步获取调用许可(线程中使用)"""
+        wait = self._reserve(endpoint)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, endpoint):
+        """异步获取调用许可(协程中使用)"""
+        wait = self._reserve(endpoint)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """计算第 attempt 次重试的等待时间: 优先使用服务端给出的 retry-after，否则指数退避，均带随机抖动"""
+        if retry_after:
+            return retry_after + random.uniform(0, self.base_delay)
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(delay / 2, delay)
+
+    def penalize(self, endpoint, attempt, retry_after=None):
+        """接口被限流时暂停该接口的令牌发放，返回暂停秒数"""
+        delay = self.backoff_delay(attempt, retry_after)
+        with self._lock:
+            bucket = self._buckets.get(endpoint)
+            if bucket is not None:
+                bucket.block(time.monotonic(), delay)
+        return delay
+
+
+def parse_rate_limits(spec):
+    """解析 'drive.upload=5,docx.block=3' 格式的配额配置"""
+    limits = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        endpoint, rate = item.split('=', 1)
+        limits[endpoint.strip()] = float(rate)
+    return limits
+
+
+def is_rate_limited(resp):
+    """判断 SDK 响应是否为限流"""
+    if resp.code in RATE_LIMIT_CODES:
+        return True
+    raw = getattr(resp, 'raw', None)
+    return getattr(raw, 'status_code', None) == 429
+
+
+def get_retry_after(resp):
+    """从响应头中读取服务端建议的重试等待秒数"""
+    raw = getattr(resp, 'raw', None)
+    headers = getattr(raw, 'headers', None) or {}
+    for key in ('x-ogw-ratelimit-reset', 'Retry-After'):
+        value = headers.get(key) or headers.get(key.lower())
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    return None
+
+
+def is_transient_error(e):
+    """判断是否为可重试的网络异常(服务端返回空响应导致的 JSON 解析错误等)"""
+    return "Expecting value" in str(e) or "char 0" in str(e)
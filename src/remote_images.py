@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from urllib.parse import urlsplit, unquote
+
+from src.metrics import Metrics
+
+# 按地址后缀或 Content-Type 确定缓存文件的扩展名，上传时飞书据此识别图片格式
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp', '.svg'}
+CONTENT_TYPE_EXTENSIONS = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/bmp': '.bmp',
+    'image/svg+xml': '.svg',
+}
+
+
+def _sniff_extension(head):
+    """根据文件头判断图片格式"""
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return '.png'
+    if head.startswith(b'\xff\xd8'):
+        return '.jpg'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return '.gif'
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return '.webp'
+    if head.startswith(b'BM'):
+        return '.bmp'
+    return ''
+
+
+class RemoteImageFetcher:
+    """下载 Markdown 中引用的远程图片
+
+    - 所有文档共用一个连接池，同时下载的数量受 concurrency 限制，连接/读取均有超时
+    - 下载结果按 URL 缓存在磁盘上，并记录 ETag/Last-Modified；超过 max_age 后用条件请求重新验证，
+      未变化(304)时不再下载
+    - 同一次运行中同一 URL 只请求一次，被多个文档引用的图片共用下载结果
+    """
+
+    def __init__(self, cache_dir, concurrency=8, timeout=30, max_bytes=20 * 1024 * 1024, max_age=86400, metrics=None):
+        """
+        Args:
+            cache_dir: 缓存目录
+            concurrency: 同时下载的图片数量
+            timeout: 单个请求的超时时间(秒)
+            max_bytes: 单张图片的大小上限，超过时放弃下载
+            max_age: 缓存在该秒数内直接使用，不再向源站验证
+            metrics: 记录下载耗时与缓存命中情况的 Metrics
+        """
+        self.cache_dir = cache_dir
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.metrics = metrics or Metrics()
+        self._tasks = {}
+        self._client = None  # (事件循环, httpx.AsyncClient)
+        self._semaphore = None  # (事件循环, asyncio.Semaphore)
+
+    @staticmethod
+    def supports(url):
+        return url.startswith(('http://', 'https://', '//'))
+
+    async def fetch(self, url):
+        """返回图片在本地缓存中的路径，下载失败时返回 None"""
+        if url.startswith('//'):
+            url = 'https:' + url
+        task = self._tasks.get(url)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = self._tasks[url] = asyncio.ensure_future(self._fetch(url))
+        # 多个文档共用同一个下载任务，某个文档取消等待时不影响其他文档
+        return await asyncio.shield(task)
+
+    async def fetch_all(self, urls):
+        """并发下载多张图片
+        Returns:
+            dict: {url: 本地路径}，只包含下载成功的图片
+        """
+        urls = list(dict.fromkeys(url for url in urls if self.supports(url)))
+        paths = await asyncio.gather(*(self.fetch(url) for url in urls))
+        return {url: path for url, path in zip(urls, paths) if path}
+
+    async def _fetch(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        meta_path = os.path.join(self.cache_dir, key + '.json')
+        meta = self._load_meta(meta_path)
+        cached_path = os.path.join(self.cache_dir, meta['file']) if meta else None
+        if cached_path and not os.path.exists(cached_path):
+            meta, cached_path = None, None
+
+        if meta and time.time() - meta.get('checked_at', 0) < self.max_age:
+            self.metrics.inc('remote_images_cached')
+            return cached_path
+
+        try:
+            return await self._download(url, key, meta_path, meta, cached_path)
+        except Exception as e:
+            if cached_path:
+                print(f"[DEBUG] 下载远程图片失败, 使用缓存: {url}: {str(e)}")
+                return cached_path
+            print(f"[DEBUG] 下载远程图片失败: {url}: {str(e)}")
+            self.metrics.inc('remote_images_failed')
+            return None
+
+    async def _download(self, url, key, meta_path, meta, cached_path):
+        headers = {}
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore[0] is not loop:
+            self._semaphore = (loop, asyncio.Semaphore(self.concurrency))
+
+        async with self._semaphore[1]:
+            with self.metrics.timer('image_fetch'):
+                async with self._get_client().stream('GET', url, headers=headers) as resp:
+                    if resp.status_code == 304 and cached_path:
+                        self.metrics.inc('remote_images_revalidated')
+                        self._save_meta(meta_path, {**meta, 'checked_at': time.time()})
+                        return cached_path
+                    if resp.status_code != 200:
+                        raise Exception(f"HTTP {resp.status_code}")
+
+                    length = resp.headers.get('Content-Length')
+                    if length and length.isdigit() and int(length) > self.max_bytes:
+                        raise Exception(f"图片大小 {int(length)} 字节超过上限 {self.max_bytes}")
+
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    tmp_path = os.path.join(self.cache_dir, f'{key}.{os.getpid()}.tmp')
+                    size = 0
+                    head = b''
+                    try:
+                        with open(tmp_path, 'wb') as f:
+                            async for chunk in resp.aiter_bytes(64 * 1024):
+                                size += len(chunk)
+                                if size > self.max_bytes:
+                                    raise Exception(f"图片大小超过上限 {self.max_bytes} 字节")
+                                if len(head) < 16:
+                                    head += chunk[:16]
+                                f.write(chunk)
+                        file_name = key + self._extension(url, resp.headers.get('Content-Type', ''), head)
+                        os.replace(tmp_path, os.path.join(self.cache_dir, file_name))
+                    finally:
+                        if os.path.exists(tmp_path):
+                            os.remove(tmp_path)
+
+        # 格式变化后扩展名不同，删除旧文件
+        if cached_path and os.path.basename(cached_path) != file_name:
+            try:
+                os.remove(cached_path)
+            except OSError:
+                pass
+        self._save_meta(meta_path, {
+            'url': url,
+            'file': file_name,
+            'etag': resp.headers.get('ETag'),
+            'last_modified': resp.headers.get('Last-Modified'),
+            'checked_at': time.time(),
+        })
+        self.metrics.inc('remote_images_downloaded')
+        self.metrics.inc('remote_image_bytes', size)
+        return os.path.join(self.cache_dir, file_name)
+
+    @staticmethod
+    def _extension(url, content_type, head):
+        ext = os.path.splitext(unquote(urlsplit(url).path))[1].lower()
+        if ext in IMAGE_EXTENSIONS:
+            return ext
+        return CONTENT_TYPE_EXTENSIONS.get(content_type.split(';')[0].strip().lower()) or _sniff_extension(head)
+
+    def _get_client(self):
+        import httpx
+
+        # 客户端绑定事件循环，每次 asyncio.run 各用一个
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client[0] is not loop:
+            transport = httpx.AsyncHTTPTransport(
+                retries=2,  # 连接失败时重试
+                limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            )
+            self._client = (loop, httpx.AsyncClient(
+                transport=transport,
+                timeout=httpx.Timeout(self.timeout),
+                follow_redirects=True,
+                headers={'User-Agent': 'markdown2feishuDoc'},
+            ))
+        return self._client[1]
+
+    async def aclose(self):
+        if self._client is not None and self._client[0] is asyncio.get_running_loop():
+            await self._client[1].aclose()
+        self._client = None
+
+    @staticmethod
+    def _load_meta(meta_path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _save_meta(meta_path, meta):
+        tmp_path = f'{meta_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
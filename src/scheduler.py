@@ -0,0 +1,114 @@
+import json
+import os
+
+from src.markdown_parser import default_path_cache, scan_image_refs
+from src.planner import AVG_CALL_LATENCY, IMPORT_WAIT, IMPORT_WAIT_PER_KB
+
+# 默认模型的经验值，首次运行后由实际耗时校准
+IMAGE_UPLOAD_SPEED = 2 * 1024 * 1024  # 图片上传速度(字节/秒)
+DOCUMENT_CALLS = 4  # 每个文档固定的接口调用次数(上传、创建导入任务、查询、删除中间态 md)
+SKIP_COST = 0.01  # 预计未变化、会被跳过的文档
+SMOOTHING = 0.5  # 校准系数的平滑因子，新一轮运行的比值占的权重
+
+
+class CostModel:
+    """按文档大小、图片数量与图片字节数估算单个文档的迁移耗时
+
+    基础估算沿用迁移计划的经验值; 每次运行结束后用实际耗时与基础估算的比值校准整体系数，
+    并按相对路径记录每个文档的实际耗时，下次按内容规模的变化比例换算，作为该文档的估算。
+    调度器据此优先派发耗时最长的文档，避免大文档最后才开始、拖长总耗时。
+    """
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path: 历史耗时的 JSON 文件路径，为空时只使用默认模型，不保存
+        """
+        self.path = path
+        self.scale = None
+        self.history = {}
+        self._observed = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.scale = data.get('scale')
+                self.history = data.get('documents', {})
+            except (OSError, ValueError) as e:
+                print(f"[DEBUG] 读取历史耗时失败，使用默认模型: {str(e)}")
+
+    @staticmethod
+    def features(file_path, md_bytes=None, refs=None):
+        """读取文档的规模特征: md 字节数、图片数、本地图片字节数，以及 md 文件的大小和修改时间
+        Args:
+            file_path: markdown 文件路径
+            md_bytes: 可选，已读取的文件内容
+            refs: 可选，已扫描的图片引用
+        """
+        stat = os.stat(file_path)
+        if refs is None:
+            if md_bytes is None:
+                with open(file_path, 'rb') as f:
+                    md_bytes = f.read()
+            refs = scan_image_refs(file_path, md_bytes.decode('utf-8'))
+        image_bytes = 0
+        for ref in refs:
+            if ref.path:
+                image_bytes += default_path_cache.stat(ref.path).st_size
+        return {
+            'md_bytes': stat.st_size,
+            'images': len(refs),
+            'image_bytes': image_bytes,
+            'mtime_ns': stat.st_mtime_ns,
+        }
+
+    @staticmethod
+    def base_cost(features):
+        """未校准的基础估算(秒)"""
+        return (
+            IMPORT_WAIT
+            + IMPORT_WAIT_PER_KB * features['md_bytes'] / 1024
+            + AVG_CALL_LATENCY * (DOCUMENT_CALLS + features['images'])
+            + features['image_bytes'] / IMAGE_UPLOAD_SPEED
+        )
+
+    def estimate(self, rel_path, features, incremental=False):
+        """估算文档的迁移耗时(秒)
+        Args:
+            rel_path: 文档相对路径
+            features: features() 的结果
+            incremental: 是否启用增量同步；启用时 md 文件与上次迁移时相同的文档按会被跳过估算
+        """
+        key = rel_path.replace(os.sep, '/')
+        previous = self.history.get(key)
+        if previous:
+            if incremental and previous.get('mtime_ns') == features['mtime_ns'] \
+                    and previous.get('md_bytes') == features['md_bytes']:
+                return SKIP_COST
+            # 按规模变化换算上次的实际耗时
+            return previous['seconds'] * self.base_cost(features) / self.base_cost(previous)
+        return self.base_cost(features) * (self.scale or 1.0)
+
+    def observe(self, rel_path, features, seconds):
+        """记录一个文档实际迁移的耗时"""
+        self._observed[rel_path.replace(os.sep, '/')] = {**features, 'seconds': round(seconds, 3)}
+
+    def save(self):
+        """用本次实际耗时校准系数，并写出历史耗时"""
+        if not self._observed:
+            return
+        ratio = sum(item['seconds'] for item in self._observed.values()) \
+            / sum(self.base_cost(item) for item in self._observed.values())
+        self.scale = ratio if self.scale is None else (1 - SMOOTHING) * self.scale + SMOOTHING * ratio
+        self.history.update(self._observed)
+        self._observed = {}
+        if not self.path:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'scale': round(self.scale, 4), 'documents': self.history}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
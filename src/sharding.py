@@ -0,0 +1,39 @@
+import hashlib
+import os
+
+
+def parse_shard(text):
+    """解析 --shard 参数 'i/N'(i 从 0 开始)
+    Returns:
+        (index, count)
+    """
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise Exception(f"分片参数格式应为 i/N, 如 0/4: {text}")
+    if count < 1 or not 0 <= index < count:
+        raise Exception(f"分片序号必须满足 0 <= i < N: {text}")
+    return index, count
+
+
+def shard_of(rel_path, count):
+    """按相对路径的哈希把文件分配到分片；路径统一为 / 分隔，不同平台、不同挂载点的结果一致"""
+    digest = hashlib.sha1(rel_path.replace(os.sep, '/').encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count
+
+
+def in_shard(rel_path, shard):
+    """文件是否属于分片 shard=(index, count)；shard 为 None 时属于唯一的分片"""
+    return shard is None or shard_of(rel_path, shard[1]) == shard[0]
+
+
+def shard_label(shard):
+    return f"{shard[0]}/{shard[1]}" if shard else None
+
+
+def shard_path(path, shard):
+    """每个分片独占的状态文件路径，如 journal.jsonl -> journal.shard-0-of-4.jsonl"""
+    if not path or shard is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard-{shard[0]}-of-{shard[1]}{ext}"
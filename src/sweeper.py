@@ -0,0 +1,120 @@
+import asyncio
+import os
+
+from src.migration_engine import MigrationEngine
+
+
+class OrphanSweeper:
+    """清理目标文件夹树中迁移遗留的文件
+
+    只删除本工具自己登记过的文件:
+    - 断点日志中尚未完成的文档，及其中间态 md
+    - 待删除列表(CleanupStore)中登记的文件
+    逐层并发列出文件夹，找到的文件交给 CleanupQueue 并发删除。
+
+    未登记、但看起来像遗留文件的(任意 .md 文件、与清单中已迁移文档同名但不在清单中的文档)
+    可能是用户手动上传或创建的，默认只列出；include_untracked 且经过确认后才删除。
+    """
+
+    def __init__(self, feishu_client, root_token, cleanup_queue, manifest=None, journal=None):
+        """
+        Args:
+            feishu_client: FeishuClient 实例
+            root_token: 目标根文件夹 token
+            cleanup_queue: 执行删除的 CleanupQueue
+            manifest: 可选的 Manifest，清单中的文档不会被删除，并用于识别疑似重复的文档
+            journal: 可选的 Journal(以 resume 模式打开)，用于识别未完成的文档
+        """
+        self.feishu_client = feishu_client
+        self.root_token = root_token
+        self.cleanup_queue = cleanup_queue
+        self.manifest = manifest
+        self.journal = journal
+
+    async def scan(self):
+        """列出整棵文件夹树
+        Returns:
+            (tracked, untracked): 均为 [(token, file_type, 名称, 原因)]；tracked 为本工具登记过、可以删除的文件，
+                untracked 为未登记的疑似遗留文件
+        """
+        known_docs = set()
+        titles_by_folder = {}
+        if self.manifest is not None:
+            for rel_path, doc_token, folder_token in self.manifest.locations():
+                known_docs.add(doc_token)
+                known_docs.update(self.manifest.document_parts(doc_token))
+                title = MigrationEngine.doc_title(os.path.splitext(os.path.basename(rel_path))[0])
+                titles_by_folder.setdefault(folder_token, set()).add(title)
+
+        unfinished = self.journal.unfinished() if self.journal is not None else {}
+        unfinished_docs = {state['doc_token'] for state in unfinished.values() if state.get('doc_token')}
+        unfinished_files = {state['file_token'] for state in unfinished.values() if state.get('file_token')}
+
+        tracked = []
+        untracked = []
+        store = self.cleanup_queue.store
+        if store is not None:
+            for token, file_type, reason in store.pending(include_in_use=True):
+                if token not in known_docs:
+                    tracked.append((token, file_type, token, f"待删除列表: {reason}" if reason else '待删除列表'))
+        listed = {token for token, _, _, _ in tracked}
+
+        level = [self.root_token]
+        while level:
+            current, level = level, []
+            listings = await asyncio.gather(*(self.feishu_client.alist_folder(token) for token in current))
+            for folder_token, files in zip(current, listings):
+                for file in files:
+                    if file.type == 'folder':
+                        level.append(file.token)
+                    elif file.token in listed or file.token in known_docs:
+                        continue
+                    elif file.type == 'file' and file.token in unfinished_files:
+                        tracked.append((file.token, 'file', file.name, '中间态 md'))
+                    elif file.type == 'docx' and file.token in unfinished_docs:
+                        tracked.append((file.token, 'docx', file.name, '未完成的文档'))
+                    elif file.type == 'file' and (file.name or '').lower().endswith('.md'):
+                        untracked.append((file.token, 'file', file.name, '未登记的 md 文件'))
+                    elif file.type == 'docx' and file.name in titles_by_folder.get(folder_token, ()):
+                        untracked.append((file.token, 'docx', file.name, '疑似重复的文档'))
+        return tracked, untracked
+
+    async def sweep(self, dry_run=False, include_untracked=False, confirm=None):
+        """扫描并删除遗留文件
+        Args:
+            dry_run: 只列出，不删除
+            include_untracked: 是否同时删除未登记的疑似遗留文件
+            confirm: 删除未登记文件前调用的确认函数，参数为这些文件的列表，返回 False 时不删除它们；
+                为 None 时不删除未登记的文件
+        Returns:
+            list: 删除(预览模式下为将要删除)的 [(token, file_type, 名称, 原因)]
+        """
+        tracked, untracked = await self.scan()
+        for token, file_type, name, reason in tracked:
+            print(f"  {'[预览] ' if dry_run else ''}{reason}: {name} ({token})")
+        for token, file_type, name, reason in untracked:
+            print(f"  [未登记] {reason}: {name} ({token})")
+        if untracked and not include_untracked:
+            print(f"[DEBUG] {len(untracked)} 个未登记的文件可能是手动创建的，未删除；确认后可使用 --include-untracked 删除")
+
+        orphans = list(tracked)
+        if include_untracked and untracked:
+            if dry_run or (confirm is not None and confirm(untracked)):
+                orphans.extend(untracked)
+            else:
+                print("[DEBUG] 未确认，不删除未登记的文件")
+        if dry_run:
+            return orphans
+
+        self.cleanup_queue.start()
+        for token, file_type, name, reason in orphans:
+            self.cleanup_queue.enqueue(token, file_type, reason)
+        await self.cleanup_queue.drain()
+
+        # 残留文档已删除，对应的断点作废
+        if self.journal is not None:
+            deleted = {token for token, _, _ in self.cleanup_queue.deleted}
+            for key, state in self.journal.unfinished().items():
+                if state.get('doc_token') in deleted or state.get('file_token') in deleted:
+                    self.journal.discard(key)
+        return orphans
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+# 飞书返回的 token 无效/过期错误码
+TOKEN_INVALID_CODES = {99991661, 99991663, 99991668}
+# 提前刷新的时间最多占令牌有效期的比例，有效期短于 refresh_margin 时不会每次获取都刷新
+MAX_MARGIN_RATIO = 0.5
+# 后台刷新线程两次刷新之间的最短间隔(秒)
+MIN_REFRESH_INTERVAL = 10
+
+
+class TenantTokenManager:
+    """租户访问令牌管理
+
+    - 令牌及过期时间缓存到磁盘(仅当前用户可读写)，启动时缓存仍有效则不再请求鉴权接口
+    - 后台线程在过期前 refresh_margin 秒主动刷新，长时间运行的迁移不会在令牌过期时中断
+    - 多个并发 worker 共用同一个实例，同一时刻只有一个刷新请求
+    """
+
+    def __init__(self, app_id, fetch, cache_path=None, refresh_margin=300):
+        """
+        Args:
+            app_id: 应用 ID，缓存文件按应用区分
+            fetch: 获取新令牌的同步函数，返回 (token, 有效期秒数)
+            cache_path: 磁盘缓存路径，为空时只缓存在内存中
+            refresh_margin: 提前刷新的秒数
+        """
+        self.app_id = app_id
+        self.fetch = fetch
+        self.cache_path = cache_path
+        self.refresh_margin = refresh_margin
+        self.refresh_count = 0
+
+        self._token = None
+        self._expires_at = 0.0  # 墙上时间，便于跨进程持久化
+        self._lifetime = None  # 令牌的有效期(秒)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher = None
+
+        self._load()
+
+    @property
+    def expires_at(self):
+        return self._expires_at
+
+    def _margin(self):
+        """实际的提前刷新秒数，不超过令牌有效期的 MAX_MARGIN_RATIO"""
+        if self._lifetime is None:
+            return self.refresh_margin
+        return min(self.refresh_margin, self._lifetime * MAX_MARGIN_RATIO)
+
+    def _is_fresh(self):
+        return self._token is not None and time.time() < self._expires_at - self._margin()
+
+    def get(self):
+        """返回有效的令牌，即将过期时同步刷新"""
+        if self._is_fresh():
+            return self._token
+        with self._lock:
+            # 等锁期间其他调用方可能已经刷新过
+            if not self._is_fresh():
+                self._refresh()
+            return self._token
+
+    async def aget(self):
+        """异步版本的 get，刷新请求放到线程中执行，不阻塞事件循环"""
+        if self._is_fresh():
+            return self._token
+        return await asyncio.get_running_loop().run_in_executor(None, self.get)
+
+    def invalidate(self, token=None):
+        """服务端判定令牌无效时调用，下次获取时重新请求
+        Args:
+            token: 被拒绝的令牌；已经换成新令牌时不再作废
+        """
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._expires_at = 0.0
+
+    def _refresh(self):
+        token, expire = self.fetch()
+        self._token = token
+        self._expires_at = time.time() + expire
+        self._lifetime = expire
+        self.refresh_count += 1
+        self._save()
+
+    def _load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return
+        if cached.get('app_id') == self.app_id and cached.get('token'):
+            self._token = cached['token']
+            self._expires_at = float(cached.get('expires_at', 0))
+            self._lifetime = cached.get('lifetime')
+
+    def _save(self):
+        """写入磁盘缓存；写入失败只打印，不影响本次获取到的令牌"""
+        if not self.cache_path:
+            return
+        # 多个分片进程共用同一个缓存文件，临时文件按进程区分，同时刷新时不会互相截断
+        tmp_path = f'{self.cache_path}.{os.getpid()}.tmp'
+        try:
+            cache_dir = os.path.dirname(self.cache_path)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+
+            # 以 0600 权限创建临时文件再替换，令牌不会被其他用户读取，也不会读到写了一半的文件
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(
+                    {'app_id': self.app_id, 'token': self._token, 'expires_at': self._expires_at, 'lifetime': self._lifetime},
+                    f,
+                )
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"[DEBUG] 写入访问令牌缓存失败: {self.cache_path} - {str(e)}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        try:
+            os.chmod(self.cache_path, 0o600)
+        except OSError:  # Windows 等不支持的平台
+            pass
+
+    def start(self):
+        """启动后台刷新线程"""
+        if self._refresher is None or not self._refresher.is_alive():
+            self._stop.clear()
+            self._refresher = threading.Thread(target=self._refresh_loop, name='tenant-token-refresher', daemon=True)
+            self._refresher.start()
+        return self
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            # 在进入提前刷新窗口时醒来，两次刷新至少间隔 MIN_REFRESH_INTERVAL 秒；刷新失败时 30 秒后重试
+            wait = max(MIN_REFRESH_INTERVAL, self._expires_at - self._margin() - time.time())
+            if self._stop.wait(wait):
+                return
+            try:
+                self.get()
+            except Exception as e:
+                print(f"[DEBUG] 后台刷新访问令牌失败: {str(e)}")
+                if self._stop.wait(30):
+                    return
+
+    def close(self):
+        self._stop.set()
@@ -0,0 +1,167 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from src.cleanup_queue import MAX_ATTEMPTS, CleanupQueue, CleanupStore
+from src.journal import Journal
+from src.manifest import Manifest
+from src.metrics import Metrics
+from src.sweeper import OrphanSweeper
+
+
+class FakeDriveClient:
+    """记录删除请求的飞书客户端，folders 为 {文件夹 token: [(token, type, name)]}"""
+
+    def __init__(self, folders=None, failing=()):
+        self.metrics = Metrics()
+        self.folders = folders or {}
+        self.failing = set(failing)
+        self.deleted = []
+
+    async def _del_file(self, token, file_type='file'):
+        await asyncio.sleep(0)
+        if token in self.failing:
+            raise Exception(f"删除失败: {token}")
+        self.deleted.append((token, file_type))
+
+    async def alist_folder(self, folder_token):
+        return [
+            SimpleNamespace(token=token, type=file_type, name=name)
+            for token, file_type, name in self.folders.get(folder_token, ())
+        ]
+
+
+class CleanupStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.store = CleanupStore(os.path.join(self.tmp, 'cleanup.db'))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmp)
+
+    def test_in_use_files_are_only_listed_on_request(self):
+        self.store.track('file_in_use', 'file', '中间态 md')
+        self.store.track('file_done', 'file', '中间态 md')
+        self.store.mark_ready('file_done', 'file')
+        self.store.mark_ready('doc_failed', 'docx', '导入失败')
+
+        self.assertEqual(
+            self.store.pending(), [('file_done', 'file', '中间态 md'), ('doc_failed', 'docx', '导入失败')]
+        )
+        self.assertEqual(
+            {token for token, _, _ in self.store.pending(include_in_use=True)},
+            {'file_in_use', 'file_done', 'doc_failed'},
+        )
+
+    def test_untracked_files_are_never_deleted(self):
+        self.store.track('doc_part', 'docx')
+        self.store.remove('doc_part', 'docx')
+        self.assertEqual(self.store.pending(include_in_use=True), [])
+
+    def test_gives_up_after_max_attempts(self):
+        self.store.mark_ready('file_gone', 'file')
+        for _ in range(MAX_ATTEMPTS - 1):
+            self.assertFalse(self.store.record_failure('file_gone', 'file'))
+        self.assertTrue(self.store.record_failure('file_gone', 'file'))
+        self.assertEqual(self.store.pending(), [])
+
+
+class CleanupQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp, 'cleanup.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_deletes_in_background_and_keeps_failures(self):
+        client = FakeDriveClient(failing={'file_bad'})
+        store = CleanupStore(self.db_path)
+        queue = CleanupQueue(client, store=store, workers=2)
+
+        async def main():
+            queue.start()
+            for token in ('file_1', 'file_2', 'file_bad', 'file_1'):
+                queue.enqueue(token, 'file', '中间态 md')
+            await queue.drain()
+
+        asyncio.run(main())
+        self.assertEqual(sorted(client.deleted), [('file_1', 'file'), ('file_2', 'file')])
+        self.assertEqual([token for token, _, _ in queue.failed], ['file_bad'])
+        # 删除失败的文件留在列表中，下次运行重试
+        self.assertEqual(store.pending(), [('file_bad', 'file', '中间态 md')])
+        store.close()
+
+    def test_leftovers_from_previous_run_are_deleted_on_start(self):
+        store = CleanupStore(self.db_path)
+        store.mark_ready('file_ready', 'file')
+        store.track('file_in_use', 'file')
+        store.close()
+
+        for include_in_use, expected in ((False, ['file_ready']), (True, ['file_in_use'])):
+            client = FakeDriveClient()
+            store = CleanupStore(self.db_path)
+            queue = CleanupQueue(client, store=store, include_in_use=include_in_use)
+
+            async def main():
+                queue.start()
+                await queue.drain()
+
+            asyncio.run(main())
+            self.assertEqual([token for token, _ in client.deleted], expected)
+            store.close()
+
+
+class OrphanSweeperTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_only_recorded_files_are_deleted(self):
+        manifest = Manifest(os.path.join(self.tmp, 'manifest.db'))
+        manifest.record('docs/a.md', 'h', {}, 'doc_a', 'fld_docs')
+        journal = Journal(os.path.join(self.tmp, 'journal.jsonl'))
+        checkpoint = journal.checkpoint('docs/b.md', 'h')
+        checkpoint.uploaded('file_b')
+        checkpoint.doc_resolved('doc_b')
+        journal.close()
+        journal = Journal(os.path.join(self.tmp, 'journal.jsonl'), resume=True)
+
+        store = CleanupStore(os.path.join(self.tmp, 'cleanup.db'))
+        store.track('file_crashed', 'file', '中间态 md')
+
+        client = FakeDriveClient({
+            'root': [('fld_docs', 'folder', 'docs'), ('file_user', 'file', 'notes.md')],
+            'fld_docs': [
+                ('doc_a', 'docx', 'a'),
+                ('doc_b', 'docx', 'b'),
+                ('file_b', 'file', 'b.md'),
+                ('doc_a_copy', 'docx', 'a'),
+                ('doc_manual', 'docx', 'manual'),
+            ],
+        })
+        queue = CleanupQueue(client, store=store)
+        sweeper = OrphanSweeper(client, 'root', queue, manifest=manifest, journal=journal)
+
+        tracked, untracked = asyncio.run(sweeper.scan())
+        self.assertEqual({token for token, _, _, _ in tracked}, {'file_crashed', 'doc_b', 'file_b'})
+        self.assertEqual({token for token, _, _, _ in untracked}, {'file_user', 'doc_a_copy'})
+
+        # 未确认时只删除登记过的文件，删除后对应的断点作废
+        asyncio.run(sweeper.sweep(include_untracked=True, confirm=lambda files: False))
+        self.assertEqual({token for token, _ in client.deleted}, {'file_crashed', 'doc_b', 'file_b'})
+        self.assertEqual(journal.unfinished(), {})
+
+        journal.close()
+        manifest.close()
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import unittest
+
+from src.docx_writer import parse_inlines, parse_markdown
+from src.markdown_parser import PathCache, scan_image_refs
+from src.md_splitter import split_markdown
+
+
+def text(node):
+    return ''.join(content for content, _ in node['inlines'])
+
+
+class ParseInlinesTest(unittest.TestCase):
+    def test_plain_text(self):
+        self.assertEqual(parse_inlines('hello'), [('hello', {})])
+        self.assertEqual(parse_inlines(''), [])
+
+    def test_styles_nest(self):
+        self.assertEqual(parse_inlines('a **b *c* d** e'), [
+            ('a ', {}),
+            ('b ', {'bold': True}),
+            ('c', {'bold': True, 'italic': True}),
+            (' d', {'bold': True}),
+            (' e', {}),
+        ])
+        self.assertEqual(parse_inlines('~~gone~~ __strong__ _em_'), [
+            ('gone', {'strikethrough': True}),
+            (' ', {}),
+            ('strong', {'bold': True}),
+            (' ', {}),
+            ('em', {'italic': True}),
+        ])
+
+    def test_inline_code_is_literal(self):
+        self.assertEqual(parse_inlines('run `a *b*` now'), [
+            ('run ', {}), ('a *b*', {'inline_code': True}), (' now', {}),
+        ])
+        self.assertEqual(parse_inlines('``a ` b``'), [('a ` b', {'inline_code': True})])
+
+    def test_links(self):
+        self.assertEqual(parse_inlines('[**docs**](https://x.io/a) <https://x.io/b>'), [
+            ('docs', {'link': 'https://x.io/a', 'bold': True}),
+            (' ', {}),
+            ('https://x.io/b', {'link': 'https://x.io/b'}),
+        ])
+        self.assertEqual(parse_inlines('[rel](other.md)'), [('rel', {'link': 'other.md'})])
+
+    def test_escapes_and_inline_images(self):
+        self.assertEqual(parse_inlines(r'\*not em\* ![alt](a.png) ![](b.png)'), [
+            ('*', {}), ('not em', {}), ('*', {}), (' ', {}), ('alt', {}), (' ', {}), ('b.png', {}),
+        ])
+
+    def test_underscores_inside_words_need_delimiters(self):
+        self.assertEqual(parse_inlines('2 * 3 * 4'), [('2 * 3 * 4', {})])
+
+
+class ParseMarkdownTest(unittest.TestCase):
+    def test_headings(self):
+        nodes = parse_markdown('# One\n###### Six ##\n#NoSpace\n\nSetext\n===\nTwo\n---\n')
+        self.assertEqual([(n['type'], n.get('level'), text(n)) for n in nodes], [
+            ('heading', 1, 'One'),
+            ('heading', 6, 'Six'),
+            ('text', None, '#NoSpace'),
+            ('heading', 1, 'Setext'),
+            ('heading', 2, 'Two'),
+        ])
+
+    def test_paragraph_lines_join_and_blank_lines_split(self):
+        nodes = parse_markdown('line one\nline two\n\n\nnext\r\n')
+        self.assertEqual([(n['type'], text(n)) for n in nodes], [('text', 'line one\nline two'), ('text', 'next')])
+
+    def test_code_blocks(self):
+        nodes = parse_markdown('```Python\n# not heading\n\n- not list\n```\n~~~\nx\n~~~\n')
+        self.assertEqual(nodes, [
+            {'type': 'code', 'language': 'python', 'content': '# not heading\n\n- not list'},
+            {'type': 'code', 'language': '', 'content': 'x'},
+        ])
+
+    def test_code_block_needs_matching_fence(self):
+        nodes = parse_markdown('````\n```\ninner\n```\n````\nafter\n')
+        self.assertEqual(nodes[0], {'type': 'code', 'language': '', 'content': '```\ninner\n```'})
+        self.assertEqual([(n['type'], text(n)) for n in nodes[1:]], [('text', 'after')])
+
+    def test_fence_with_info_string_does_not_close_block(self):
+        nodes = parse_markdown('```\n```python\nprint(1)\n```\nafter\n')
+        self.assertEqual(nodes[0], {'type': 'code', 'language': '', 'content': '```python\nprint(1)'})
+        self.assertEqual([(n['type'], text(n)) for n in nodes[1:]], [('text', 'after')])
+
+    def test_fence_rules_match_scanner_and_splitter(self):
+        # 同一文档中代码块的范围，直接写入模式、图片扫描与文档拆分的判断一致
+        md = (
+            '# A\n\n'
+            '```\n```python\n![in code](x.png)\n# not a heading\n```\n\n'
+            '~~~\n```\n~~~~\n\n'
+            '![out](y.png)\n\n'
+            '# B\n\ntext\n'
+        )
+        nodes = parse_markdown(md)
+        self.assertEqual([n['src'] for n in nodes if n['type'] == 'image'], ['y.png'])
+        self.assertEqual([ref.src for ref in scan_image_refs('doc.md', md, PathCache())], ['y.png'])
+        self.assertEqual([n['type'] for n in nodes], ['heading', 'code', 'code', 'image', 'heading', 'text'])
+        self.assertEqual([part.title for part in split_markdown(md, max_blocks=4)], ['A', 'B'])
+
+    def test_code_language_from_info_string(self):
+        nodes = parse_markdown('``` js title="a.js"\nx\n```\n')
+        self.assertEqual(nodes[0]['language'], 'js')
+
+    def test_unclosed_code_block_runs_to_end(self):
+        self.assertEqual(parse_markdown('```\na\nb'), [{'type': 'code', 'language': '', 'content': 'a\nb'}])
+
+    def test_divider(self):
+        nodes = parse_markdown('a\n\n---\n\n* * *\n')
+        self.assertEqual([n['type'] for n in nodes], ['text', 'divider', 'divider'])
+
+    def test_nested_lists_and_todos(self):
+        nodes = parse_markdown(
+            '- a\n'
+            '  continued\n'
+            '  - b\n'
+            '    1. c\n'
+            '- [x] done\n'
+            '- [ ] todo\n'
+            '\n'
+            '3. three\n'
+        )
+        self.assertEqual([n['type'] for n in nodes], ['bullet', 'todo', 'todo', 'ordered'])
+        self.assertEqual(text(nodes[0]), 'a\ncontinued')
+        child = nodes[0]['children'][0]
+        self.assertEqual((child['type'], text(child)), ('bullet', 'b'))
+        grandchild = child['children'][0]
+        self.assertEqual((grandchild['type'], text(grandchild)), ('ordered', 'c'))
+        self.assertEqual([(n['done'], text(n)) for n in nodes[1:3]], [(True, 'done'), (False, 'todo')])
+        self.assertEqual(text(nodes[3]), 'three')
+
+    def test_quote(self):
+        nodes = parse_markdown('> # Title\n> body\n>\n> - item\n\nafter\n')
+        self.assertEqual([n['type'] for n in nodes], ['quote', 'text'])
+        self.assertEqual([n['type'] for n in nodes[0]['children']], ['heading', 'text', 'bullet'])
+
+    def test_table(self):
+        nodes = parse_markdown('| a | b |\n|:--|--:|\n| 1 | `x\\|y` |\n| only |\n\nafter\n')
+        self.assertEqual(nodes[0]['type'], 'table')
+        rows = [[''.join(c for c, _ in cell) for cell in row] for row in nodes[0]['rows']]
+        self.assertEqual(rows, [['a', 'b'], ['1', 'x|y'], ['only', '']])
+        self.assertEqual(nodes[1]['type'], 'text')
+
+    def test_pipe_without_separator_is_text(self):
+        self.assertEqual([n['type'] for n in parse_markdown('a | b\nc | d\n')], ['text'])
+
+    def test_standalone_images(self):
+        nodes = parse_markdown('before\n![alt](img/a.png "t")\nafter\n\n![](<img/b c.png>)\n\ntext ![inline](c.png)\n')
+        self.assertEqual([n['type'] for n in nodes], ['text', 'image', 'text', 'image', 'text'])
+        self.assertEqual((nodes[1]['alt'], nodes[1]['src']), ('alt', 'img/a.png'))
+        self.assertEqual(text(nodes[4]), 'text inline')
+
+    def test_images_in_lists_and_quotes_degrade_to_text(self):
+        nodes = parse_markdown('> ![q](q.png)\n')
+        self.assertEqual(nodes[0]['children'], [{'type': 'text', 'inlines': [('q', {})]}])
+        nodes = parse_markdown('- ![](a.png)\n')
+        self.assertEqual(text(nodes[0]), 'a.png')
+
+    def test_empty_document(self):
+        self.assertEqual(parse_markdown(''), [])
+        self.assertEqual(parse_markdown('\n\n  \n'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
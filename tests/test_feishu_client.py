@@ -0,0 +1,92 @@
+import asyncio
+import unittest
+
+from src import feishu_client
+from src.feishu_client import FeishuClient
+from src.journal import DocumentCheckpoint
+from src.md_splitter import MarkdownPart
+from src.metrics import Metrics
+
+
+class SplitImportClient(FeishuClient):
+    """不连接飞书，只替换单个部分的导入、索引文档的创建与文件删除"""
+
+    def __init__(self, fail_titles=()):
+        self.metrics = Metrics()
+        self.cleanup_queue = None
+        self.document_parts = {}
+        self._split_slots = None
+        self.fail_titles = set(fail_titles)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started = []
+        self.discarded = []
+
+    async def _import_markdown(self, file_path, md_text, title, folder_token, checkpoint, whole_file=True):
+        self.started.append(title)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.02)
+            if any(name in title for name in self.fail_titles):
+                raise Exception(f'import failed: {title}')
+            return f'doc_{md_text}'
+        finally:
+            self.in_flight -= 1
+
+    async def _create_split_index(self, file_path, title, folder_token, parts, part_tokens):
+        return 'doc_index'
+
+    async def _discard_file(self, file_token, file_type='file', reason=''):
+        self.discarded.append(file_token)
+
+
+def make_parts(count):
+    return [MarkdownPart(f'P{i}', str(i), 1, 1) for i in range(count)]
+
+
+class SplitImportTest(unittest.TestCase):
+    def setUp(self):
+        self.concurrency = feishu_client.MIGRATION_CONCURRENCY
+        feishu_client.MIGRATION_CONCURRENCY = 3
+
+    def tearDown(self):
+        feishu_client.MIGRATION_CONCURRENCY = self.concurrency
+
+    def run_split(self, client, parts):
+        checkpoint = DocumentCheckpoint(None, 'big.md', None)
+        return asyncio.run(client._import_split_document('big.md', 'Big', 'fld', parts, checkpoint))
+
+    def test_parts_are_imported_with_bounded_concurrency_in_order(self):
+        client = SplitImportClient()
+        self.assertEqual(self.run_split(client, make_parts(10)), 'doc_index')
+        self.assertEqual(client.max_in_flight, 3)
+        self.assertEqual(client.document_parts['doc_index'], [f'doc_{i}' for i in range(10)])
+        self.assertEqual(client.discarded, [])
+
+    def test_documents_share_the_part_limit(self):
+        client = SplitImportClient()
+
+        async def main():
+            await asyncio.gather(*(
+                client._import_split_document(f'{name}.md', name, 'fld', make_parts(4), DocumentCheckpoint(None, name, None))
+                for name in ('A', 'B')
+            ))
+
+        asyncio.run(main())
+        self.assertEqual(client.max_in_flight, 3)
+
+    def test_failed_part_discards_imported_parts_and_stops_new_ones(self):
+        client = SplitImportClient(fail_titles={'P1'})
+        with self.assertRaises(Exception):
+            self.run_split(client, make_parts(10))
+        # 第 2 部分重试后仍失败；同时在导入的部分完成后被删除，排队中的部分不再开始
+        self.assertEqual(client.started.count('Big (02/10) P1'), 2)
+        self.assertNotIn('Big (10/10) P9', client.started)
+        imported = [f'doc_{title.split()[-1][1:]}' for title in client.started if 'P1' not in title]
+        self.assertEqual(sorted(client.discarded), sorted(imported))
+        self.assertEqual(client.document_parts, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
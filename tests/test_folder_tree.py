@@ -0,0 +1,202 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from src.folder_tree import FolderStore, FolderTree
+
+
+class RemoteFile:
+    def __init__(self, token, name, type='folder'):
+        self.token = token
+        self.name = name
+        self.type = type
+
+
+class FakeDrive:
+    """内存中的飞书云空间文件夹，可被多个线程中的 FolderTree 共用"""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.folders = {'fld_root': (None, '')}  # token -> (父 token, 名称)
+        self.created = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def folder_display_name(folder_name):
+        return folder_name.rsplit(' ', 1)[0]
+
+    async def alist_folder(self, token):
+        with self._lock:
+            if token not in self.folders:
+                raise Exception(f'folder not found: {token}')
+            return [RemoteFile(t, name) for t, (parent, name) in self.folders.items() if parent == token]
+
+    async def acreate_folder(self, folder_name, parent_token=None):
+        with self._lock:
+            if parent_token not in self.folders:
+                raise Exception(f'parent not found: {parent_token}')
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+            token = f'fld_{len(self.created) + 1}'
+            self.folders[token] = (parent_token, self.folder_display_name(folder_name))
+            self.created.append(folder_name)
+        return token
+
+    def delete(self, token):
+        with self._lock:
+            doomed = {token}
+            changed = True
+            while changed:
+                children = {t for t, (parent, _) in self.folders.items() if parent in doomed} - doomed
+                doomed |= children
+                changed = bool(children)
+            for t in doomed:
+                del self.folders[t]
+
+
+def path(*parts):
+    return os.path.join(*parts)
+
+
+class FolderStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'folders.db')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lease_is_exclusive_until_released(self):
+        first, second = FolderStore(self.db_path), FolderStore(self.db_path)
+        try:
+            self.assertTrue(first.acquire('root', 'a'))
+            self.assertFalse(second.acquire('root', 'a'))
+            self.assertTrue(second.acquire('root', 'b'))
+            self.assertTrue(second.acquire('other_root', 'a'))
+            # 只有持有者能释放
+            second.release('root', 'a')
+            self.assertFalse(second.acquire('root', 'a'))
+            first.release('root', 'a')
+            self.assertTrue(second.acquire('root', 'a'))
+        finally:
+            first.close()
+            second.close()
+
+    def test_expired_lease_can_be_taken_over_and_renewal_keeps_it(self):
+        first, second = FolderStore(self.db_path, lease_ttl=0.2), FolderStore(self.db_path, lease_ttl=0.2)
+        try:
+            self.assertTrue(first.acquire('root', 'a'))
+            for _ in range(3):
+                time.sleep(0.1)
+                first.renew('root', 'a')
+                self.assertFalse(second.acquire('root', 'a'))
+            time.sleep(0.3)
+            self.assertTrue(second.acquire('root', 'a'))
+            # 原持有者续期不会抢回已被接手的租约
+            first.renew('root', 'a')
+            self.assertFalse(first.acquire('root', 'a'))
+        finally:
+            first.close()
+            second.close()
+
+    def test_remove_only_stale_mapping_and_subtree(self):
+        store = FolderStore(self.db_path)
+        try:
+            for rel_path, token in (('a', 't1'), (path('a', 'b'), 't2'), ('ab', 't3')):
+                store.save('root', rel_path, token)
+            store.remove('root', 'a', 'other')
+            self.assertEqual(store.get('root', 'a'), 't1')
+            store.remove('root', 'a', 't1')
+            self.assertEqual(store.load('root'), {'ab': 't3'})
+        finally:
+            store.close()
+
+
+class FolderTreeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'folders.db')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_siblings_are_created_concurrently_and_parents_once(self):
+        drive = FakeDrive()
+        tree = FolderTree(drive, 'fld_root')
+
+        async def main():
+            await asyncio.gather(*(tree.ensure(path('docs', f'part{i}')) for i in range(5)))
+
+        asyncio.run(main())
+        self.assertEqual(drive.created.count('docs'), 1)
+        self.assertEqual(len(drive.created), 6)
+        self.assertEqual(drive.max_in_flight, 5)
+
+    def test_reuses_existing_folders_once_per_local_directory(self):
+        drive = FakeDrive()
+        drive.folders['fld_existing'] = ('fld_root', 'guide')
+        tree = FolderTree(drive, 'fld_root')
+
+        async def main():
+            return await tree.ensure('guide 1'), await tree.ensure('guide 2'), await tree.ensure('guide 1')
+
+        first, second, again = asyncio.run(main())
+        self.assertEqual(first, 'fld_existing')
+        self.assertNotEqual(second, first)
+        self.assertEqual(again, first)
+        self.assertEqual(drive.created, ['guide 2'])
+
+    def test_shared_store_creates_each_folder_once_across_processes(self):
+        drive = FakeDrive(delay=0.05)
+        results = []
+
+        def shard():
+            store = FolderStore(self.db_path)
+            try:
+                tree = FolderTree(drive, 'fld_root', store)
+                results.append(asyncio.run(tree.ensure(path('a', 'b', 'c'))))
+            finally:
+                store.close()
+
+        threads = [threading.Thread(target=shard) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(drive.created), ['a', 'b', 'c'])
+        self.assertEqual(len(set(results)), 1)
+
+    def test_mapping_persists_and_stale_folder_is_recreated(self):
+        drive = FakeDrive()
+        store = FolderStore(self.db_path)
+        try:
+            token = asyncio.run(FolderTree(drive, 'fld_root', store).ensure(path('a', 'b')))
+            # 下次运行直接使用持久化映射
+            tree = FolderTree(drive, 'fld_root', store)
+            self.assertEqual(asyncio.run(tree.ensure(path('a', 'b'))), token)
+            self.assertEqual(len(drive.created), 2)
+
+            drive.delete(tree.mapping['a'])
+
+            async def recreate():
+                self.assertTrue(await tree.evict_if_missing(path('a', 'b')))
+                return await tree.ensure(path('a', 'b'))
+
+            new_token = asyncio.run(recreate())
+            self.assertNotEqual(new_token, token)
+            self.assertEqual(drive.created, ['a', 'b', 'a', 'b'])
+            self.assertEqual(store.get('fld_root', path('a', 'b')), new_token)
+        finally:
+            store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
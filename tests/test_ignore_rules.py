@@ -0,0 +1,136 @@
+import os
+import tempfile
+import unittest
+
+from src.markdown_parser import IgnoreRules, MarkdownParser, _compile_pattern
+
+
+class CompilePatternTest(unittest.TestCase):
+    def assertMatches(self, pattern, paths, expected=True):
+        regex = _compile_pattern(pattern)
+        for path in paths:
+            self.assertEqual(bool(regex.match(path)), expected, f'{pattern!r} vs {path!r}')
+
+    def test_unanchored_name_matches_any_level(self):
+        self.assertMatches('draft.md', ['draft.md', 'a/draft.md', 'a/b/draft.md'])
+        self.assertMatches('draft.md', ['a/mydraft.md', 'draft.md.bak'], expected=False)
+
+    def test_leading_or_inner_slash_anchors(self):
+        self.assertMatches('/draft.md', ['draft.md'])
+        self.assertMatches('/draft.md', ['a/draft.md'], expected=False)
+        self.assertMatches('docs/draft.md', ['docs/draft.md'])
+        self.assertMatches('docs/draft.md', ['x/docs/draft.md'], expected=False)
+
+    def test_trailing_slash_does_not_anchor(self):
+        self.assertMatches('build/', ['build', 'a/build', 'a/build/x.md'])
+
+    def test_wildcards_do_not_cross_directories(self):
+        self.assertMatches('docs/*.md', ['docs/a.md'])
+        self.assertMatches('docs/*.md', ['docs/sub/x/a.md', 'docsx/a.md'], expected=False)
+        self.assertMatches('?.md', ['a.md', 'x/b.md'])
+        self.assertMatches('?.md', ['ab.md'], expected=False)
+
+    def test_double_star(self):
+        self.assertMatches('**/tmp', ['tmp', 'a/tmp', 'a/b/tmp/c.md'])
+        self.assertMatches('docs/**/*.md', ['docs/a.md', 'docs/x/y/a.md'])
+        self.assertMatches('docs/**', ['docs/a.md', 'docs/x/a.md'])
+        self.assertMatches('docs/**/*.md', ['other/docs/a.md'], expected=False)
+
+    def test_character_classes(self):
+        self.assertMatches('[ab].md', ['a.md', 'b.md'])
+        self.assertMatches('[!ab].md', ['c.md'])
+        self.assertMatches('[!ab].md', ['a.md'], expected=False)
+        self.assertMatches('[x.md', ['[x.md'])
+
+    def test_only_leading_bang_negates_class(self):
+        self.assertMatches('[a!b].md', ['a.md', '!.md', 'b.md'])
+        self.assertMatches('[a!b].md', ['c.md'], expected=False)
+        self.assertMatches('[!!].md', ['a.md'])
+        self.assertMatches('[!!].md', ['!.md'], expected=False)
+
+    def test_class_members_are_literal(self):
+        self.assertMatches('[]a].md', [']' + '.md', 'a.md'])
+        self.assertMatches('[!]].md', [']' + '.md'], expected=False)
+        self.assertMatches('[\\^].md', ['^.md', '\\.md'])
+        self.assertMatches('[\\^].md', ['a.md'], expected=False)
+
+    def test_directory_match_covers_contents(self):
+        self.assertMatches('private', ['private/a.md', 'x/private/y/a.md'])
+        self.assertMatches('private', ['privateer/a.md'], expected=False)
+
+
+class IgnoreRulesTest(unittest.TestCase):
+    def test_last_matching_rule_wins(self):
+        rules = IgnoreRules('', ['*.md', '!keep.md', '# comment', '', 'keep.md  '])
+        self.assertTrue(rules.match('keep.md', False))
+        rules = IgnoreRules('', ['*.md', '!keep.md'])
+        self.assertFalse(rules.match('keep.md', False))
+        self.assertTrue(rules.match('other.md', False))
+        self.assertIsNone(rules.match('image.png', False))
+
+    def test_directory_only_rules(self):
+        rules = IgnoreRules('', ['build/'])
+        self.assertTrue(rules.match('build', True))
+        self.assertIsNone(rules.match('build', False))
+
+    def test_negation_of_anchored_rule(self):
+        rules = IgnoreRules('', ['docs/*', '!/docs/public'])
+        self.assertTrue(rules.match('docs/private', True))
+        self.assertFalse(rules.match('docs/public', True))
+
+
+class MarkdownParserIgnoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel_path, content=''):
+        path = os.path.join(self.dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def files(self, **kwargs):
+        parser = MarkdownParser(self.dir, ignore_files=['.md2feishuignore'], **kwargs)
+        return sorted(os.path.relpath(f['path'], self.dir).replace(os.sep, '/') for f in parser.get_markdown_files())
+
+    def test_nested_ignore_files_and_negation(self):
+        self.write('a.md')
+        self.write('draft.md')
+        self.write('notes/draft.md')
+        self.write('notes/keep.md')
+        self.write('notes/sub/draft.md')
+        self.write('.md2feishuignore', 'draft.md\n')
+        # 子目录规则相对子目录锚定，并可取消上层规则
+        self.write('notes/.md2feishuignore', '!/draft.md\n')
+        self.assertEqual(self.files(), ['a.md', 'notes/draft.md', 'notes/keep.md'])
+
+    def test_ignored_directory_cannot_be_reincluded(self):
+        self.write('build/a.md')
+        self.write('build/keep.md')
+        self.write('.md2feishuignore', 'build/\n!build/keep.md\n')
+        self.assertEqual(self.files(), [])
+
+    @unittest.skipUnless(hasattr(os, 'symlink'), 'symlinks not supported')
+    def test_symlinked_directories_are_not_followed(self):
+        self.write('a/doc.md')
+        self.write('outside/other.md')
+        try:
+            os.symlink(self.dir, os.path.join(self.dir, 'a', 'loop'))
+            os.symlink(os.path.join(self.dir, 'outside'), os.path.join(self.dir, 'a', 'linked'))
+        except OSError:
+            self.skipTest('cannot create symlinks')
+        self.assertEqual(self.files(), ['a/doc.md', 'outside/other.md'])
+
+    def test_include_and_exclude_patterns(self):
+        self.write('docs/a.md')
+        self.write('docs/b.md')
+        self.write('blog/c.md')
+        self.assertEqual(self.files(include_patterns=['docs/'], exclude_patterns=['b.md']), ['docs/a.md'])
+
+
+if __name__ == '__main__':
+    unittest.main()
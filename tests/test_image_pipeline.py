@@ -0,0 +1,106 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+
+from src.image_pipeline import ImagePipeline, probe_image_size
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 是可选依赖
+    Image = None
+
+
+@unittest.skipIf(Image is None, 'Pillow not installed')
+class ProbeImageSizeTest(unittest.TestCase):
+    def test_reads_size_from_header(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for ext, fmt in (('png', 'PNG'), ('gif', 'GIF'), ('jpg', 'JPEG'), ('bmp', 'BMP'), ('webp', 'WEBP')):
+                path = os.path.join(tmp, f'a.{ext}')
+                Image.new('RGB', (37, 21)).save(path, fmt)
+                self.assertEqual(tuple(probe_image_size(path)), (37, 21), ext)
+
+    def test_unknown_format(self):
+        with tempfile.NamedTemporaryFile(suffix='.bin', delete=False) as f:
+            f.write(b'not an image at all')
+        try:
+            self.assertIsNone(probe_image_size(f.name))
+        finally:
+            os.remove(f.name)
+
+
+@unittest.skipIf(Image is None, 'Pillow not installed')
+class ImagePipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, 'cache')
+        self.image = os.path.join(self.tmp.name, 'wide.png')
+        Image.new('RGB', (400, 100), 'red').save(self.image)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_disabled_pipeline_returns_original(self):
+        pipeline = ImagePipeline(self.cache_dir)
+        processed = asyncio.run(pipeline.process(self.image))
+        self.assertEqual((processed.path, processed.width, processed.height), (self.image, 400, 100))
+
+    def test_resizes_in_worker_and_caches_on_disk(self):
+        pipeline = ImagePipeline(self.cache_dir, max_width=200, workers=1)
+        try:
+            processed = asyncio.run(pipeline.process(self.image))
+        finally:
+            pipeline.close()
+        self.assertEqual((processed.width, processed.height), (200, 50))
+        self.assertTrue(processed.path.startswith(self.cache_dir))
+
+        # 缓存命中时不再启动进程池
+        pipeline = ImagePipeline(self.cache_dir, max_width=200)
+        cached = asyncio.run(pipeline.process(self.image))
+        self.assertEqual(cached.path, processed.path)
+        self.assertIsNone(pipeline._executor)
+
+    def test_hash_runs_off_the_event_loop(self):
+        threads = []
+
+        class RecordingPipeline(ImagePipeline):
+            def _cache_key(self, file_path):
+                threads.append(threading.get_ident())
+                return super()._cache_key(file_path)
+
+        pipeline = RecordingPipeline(self.cache_dir, max_width=200, workers=1)
+
+        async def main():
+            loop_thread = threading.get_ident()
+            await pipeline.process(self.image)
+            return loop_thread
+
+        try:
+            loop_thread = asyncio.run(main())
+        finally:
+            pipeline.close()
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], loop_thread)
+
+    def test_failed_processing_is_retried(self):
+        broken = os.path.join(self.tmp.name, 'broken.png')
+        with open(broken, 'wb') as f:
+            f.write(b'not a png')
+        pipeline = ImagePipeline(self.cache_dir, output_format='jpeg', workers=1)
+
+        async def main():
+            with self.assertRaises(Exception):
+                await pipeline.process(broken)
+            Image.new('RGB', (10, 10)).save(broken, 'PNG')
+            return await pipeline.process(broken)
+
+        try:
+            processed = asyncio.run(main())
+        finally:
+            pipeline.close()
+        self.assertEqual((processed.width, processed.height), (10, 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import asyncio
+import time
+import unittest
+
+from src.import_poller import ImportTaskPoller
+
+
+class FakeImportService:
+    """按预设的状态序列返回查询结果: {ticket: [(job_status, doc_token, error) 或 异常 或 秒数(查询耗时)]}"""
+
+    def __init__(self, scripts):
+        self.scripts = {ticket: list(steps) for ticket, steps in scripts.items()}
+        self.queries = []
+
+    async def query(self, ticket):
+        self.queries.append(ticket)
+        step = self.scripts[ticket].pop(0)
+        if isinstance(step, (int, float)):
+            await asyncio.sleep(step)
+            step = self.scripts[ticket].pop(0)
+        if isinstance(step, Exception):
+            raise step
+        return step
+
+
+def make_poller(service, **kwargs):
+    return ImportTaskPoller(service.query, min_interval=0.01, max_interval=0.05, **kwargs)
+
+
+class ImportTaskPollerTest(unittest.TestCase):
+    def test_polls_until_success(self):
+        service = FakeImportService({'t1': [(1, None, ''), (1, None, ''), (2, 'doc_1', '')]})
+        poller = make_poller(service)
+
+        async def main():
+            return await poller.submit('t1', 1024)
+
+        self.assertEqual(asyncio.run(main()), 'doc_1')
+        self.assertEqual(service.queries, ['t1'] * 3)
+
+    def test_success_without_token_is_retried_then_fails(self):
+        service = FakeImportService({
+            't1': [(2, None, ''), (2, 'doc_1', '')],
+            't2': [(2, None, '')] * 3,
+        })
+        poller = make_poller(service, max_token_retries=2)
+
+        async def main():
+            return await asyncio.gather(poller.submit('t1'), poller.submit('t2'), return_exceptions=True)
+
+        first, second = asyncio.run(main())
+        self.assertEqual(first, 'doc_1')
+        self.assertIn('未获取到文档 token', str(second))
+
+    def test_failed_task_and_query_errors_only_affect_their_ticket(self):
+        service = FakeImportService({
+            'bad': [(3, None, 'unsupported')],
+            'broken': [RuntimeError('network down')],
+            'good': [(1, None, ''), (2, 'doc_good', '')],
+        })
+        poller = make_poller(service)
+
+        async def main():
+            return await asyncio.gather(
+                poller.submit('bad'), poller.submit('broken'), poller.submit('good'), return_exceptions=True
+            )
+
+        bad, broken, good = asyncio.run(main())
+        self.assertIn('unsupported', str(bad))
+        self.assertIsInstance(broken, RuntimeError)
+        self.assertEqual(good, 'doc_good')
+
+    def test_slow_query_does_not_delay_other_tickets(self):
+        service = FakeImportService({
+            'slow': [0.5, (2, 'doc_slow', '')],
+            'fast': [(1, None, ''), (1, None, ''), (2, 'doc_fast', '')],
+        })
+        poller = make_poller(service)
+
+        async def main():
+            start = time.monotonic()
+            slow = poller.submit('slow')
+            fast_token = await poller.submit('fast')
+            fast_elapsed = time.monotonic() - start
+            return fast_token, fast_elapsed, await slow
+
+        fast_token, fast_elapsed, slow_token = asyncio.run(main())
+        self.assertEqual((fast_token, slow_token), ('doc_fast', 'doc_slow'))
+        self.assertLess(fast_elapsed, 0.4)
+
+    def test_cancelled_waiter_is_dropped_without_breaking_others(self):
+        service = FakeImportService({
+            'cancelled': [0.1, (2, 'doc_cancelled', '')],
+            'other': [(1, None, ''), (2, 'doc_other', '')],
+        })
+        poller = make_poller(service)
+
+        async def main():
+            cancelled = poller.submit('cancelled')
+            other = poller.submit('other')
+            await asyncio.sleep(0.05)  # 查询进行中时取消等待
+            cancelled.cancel()
+            result = await other
+            await asyncio.sleep(0.15)
+            return result
+
+        self.assertEqual(asyncio.run(main()), 'doc_other')
+        self.assertEqual(poller._pending, {})
+
+    def test_waiters_fail_when_loop_stops(self):
+        service = FakeImportService({'t1': [(1, None, '')] * 100})
+        poller = make_poller(service)
+        futures = []
+
+        async def main():
+            futures.append(poller.submit('t1'))
+            await asyncio.sleep(0.03)
+            poller._task.cancel()
+            await asyncio.sleep(0)
+
+        asyncio.run(main())
+        self.assertTrue(futures[0].done())
+        self.assertIn('轮询已停止', str(futures[0].exception()))
+
+    def test_estimate_learns_from_completed_imports(self):
+        poller = ImportTaskPoller(None, min_interval=0.5, max_interval=100)
+        self.assertEqual(poller.estimate(10 * 1024), 1.0)
+        for size_kb, duration in ((100, 2.0), (200, 3.0), (300, 4.0)):
+            poller._record(size_kb, duration)
+        self.assertAlmostEqual(poller.estimate(400 * 1024), 5.0)
+        self.assertEqual(poller.estimate(0), 1.0)
+        self.assertEqual(poller.estimate(100000 * 1024), 100)
+
+    def test_new_event_loop_resets_state(self):
+        service = FakeImportService({'t1': [(2, 'doc_1', '')], 't2': [(2, 'doc_2', '')]})
+        poller = make_poller(service)
+
+        async def wait(ticket):
+            return await poller.submit(ticket)
+
+        self.assertEqual(asyncio.run(wait('t1')), 'doc_1')
+        self.assertEqual(asyncio.run(wait('t2')), 'doc_2')
+
+
+if __name__ == '__main__':
+    unittest.main()
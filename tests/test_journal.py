@@ -0,0 +1,122 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.journal import Journal
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'journal', 'migration.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def reopen(self, journal, resume=True):
+        journal.close()
+        return Journal(self.path, resume=resume)
+
+    def read_entries(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_resume_restores_latest_stage_and_patched_blocks(self):
+        journal = Journal(self.path)
+        checkpoint = journal.checkpoint('docs/a.md', 'hash_a')
+        checkpoint.uploaded('file_1')
+        checkpoint.ticket_created('ticket_1')
+        checkpoint.doc_resolved('doc_1')
+        checkpoint.image_patched('blk_2')
+        checkpoint.image_patched('blk_5')
+
+        journal = self.reopen(journal)
+        self.assertEqual(set(journal.unfinished()), {'docs/a.md'})
+        restored = journal.checkpoint('docs/a.md', 'hash_a')
+        self.assertEqual((restored.file_token, restored.ticket, restored.doc_token), ('file_1', 'ticket_1', 'doc_1'))
+        self.assertEqual(restored.patched_images, {'blk_2', 'blk_5'})
+        journal.close()
+
+    def test_legacy_index_entries_are_not_replayed(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w', encoding='utf-8') as f:
+            for entry in (
+                {'key': 'a.md', 'stage': 'doc_resolved', 'content_hash': 'h', 'doc_token': 'doc_1'},
+                {'key': 'a.md', 'stage': 'image_patched', 'content_hash': 'h', 'index': 0},
+                {'key': 'a.md', 'stage': 'image_patched', 'content_hash': 'h', 'block_id': 'blk_1'},
+            ):
+                f.write(json.dumps(entry) + '\n')
+
+        journal = Journal(self.path, resume=True)
+        self.assertEqual(journal.checkpoint('a.md', 'h').patched_images, {'blk_1'})
+        journal.close()
+
+    def test_finished_and_reset_documents_are_dropped_on_compaction(self):
+        journal = Journal(self.path)
+        done = journal.checkpoint('done.md', 'h1')
+        done.uploaded('file_done')
+        done.md_deleted()
+        failed = journal.checkpoint('failed.md', 'h2')
+        failed.uploaded('file_failed')
+        failed.reset()
+        pending = journal.checkpoint('pending.md', 'h3')
+        pending.uploaded('file_pending')
+        pending.ticket_created('ticket_pending')
+
+        journal = self.reopen(journal)
+        self.assertEqual(set(journal.unfinished()), {'pending.md'})
+        self.assertEqual(
+            [(entry['key'], entry['stage']) for entry in self.read_entries()],
+            [('pending.md', 'uploaded'), ('pending.md', 'ticket_created')],
+        )
+        journal.close()
+
+    def test_truncated_last_line_is_ignored(self):
+        journal = Journal(self.path)
+        journal.checkpoint('a.md', 'h').uploaded('file_1')
+        journal.close()
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('{"key": "a.md", "stage": "ticket_cre')
+
+        journal = Journal(self.path, resume=True)
+        state = journal.unfinished()['a.md']
+        self.assertEqual(state['file_token'], 'file_1')
+        self.assertNotIn('ticket', state)
+        journal.close()
+
+    def test_changed_content_starts_over(self):
+        journal = Journal(self.path)
+        journal.checkpoint('a.md', 'old').uploaded('file_1')
+
+        journal = self.reopen(journal)
+        checkpoint = journal.checkpoint('a.md', 'new')
+        self.assertIsNone(checkpoint.file_token)
+        self.assertEqual(checkpoint.patched_images, set())
+        journal.close()
+
+    def test_discard_forgets_document(self):
+        journal = Journal(self.path)
+        journal.checkpoint('a.md', 'h').uploaded('file_1')
+
+        journal = self.reopen(journal)
+        journal.discard('a.md')
+        self.assertEqual(journal.unfinished(), {})
+
+        journal = self.reopen(journal)
+        self.assertEqual(journal.unfinished(), {})
+        journal.close()
+
+    def test_without_resume_old_journal_is_cleared(self):
+        journal = Journal(self.path)
+        journal.checkpoint('a.md', 'h').uploaded('file_1')
+
+        journal = self.reopen(journal, resume=False)
+        self.assertEqual(journal.unfinished(), {})
+        self.assertEqual(self.read_entries(), [])
+        journal.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+from urllib.parse import quote, unquote
+
+from lark_oapi.api.docx.v1 import Link, TextElement, TextElementStyle, TextRun
+
+from src.link_index import LinkIndex
+from src.link_rewriter import LinkRewriter
+from src.metrics import Metrics
+
+URL_PREFIX = 'https://x.feishu.cn/docx/'
+SETUP_URL = URL_PREFIX + 'doc_setup'
+GUIDE_URL = URL_PREFIX + 'doc_guide'
+
+
+class FakeClient:
+    def __init__(self):
+        self.metrics = Metrics()
+
+
+def run(content, link=None, bold=False):
+    style = TextElementStyle.builder().bold(bold).build()
+    if link:
+        style.link = Link.builder().url(quote(link, safe='')).build()
+    return TextElement.builder().text_run(TextRun.builder().content(content).text_element_style(style).build()).build()
+
+
+def runs(elements):
+    """[(文字, 链接地址)]"""
+    result = []
+    for element in elements:
+        style = element.text_run.text_element_style
+        result.append((element.text_run.content, unquote(style.link.url) if style.link is not None else None))
+    return result
+
+
+class RewriteElementsTest(unittest.TestCase):
+    def setUp(self):
+        self.rewriter = LinkRewriter(FakeClient(), LinkIndex(URL_PREFIX))
+
+    def rewrite(self, elements, by_href=None, by_old_doc=None, unmatched=None):
+        return self.rewriter._rewrite_elements(elements, by_href or {}, by_old_doc or {}, unmatched if unmatched is not None else [])
+
+    def test_imported_links_are_rewritten_by_href(self):
+        elements, changed = self.rewrite(
+            [run('See '), run('setup', 'setup.md'), run(' and '), run('site', 'https://example.com')],
+            by_href={'setup.md': SETUP_URL},
+        )
+        self.assertTrue(changed)
+        self.assertEqual(runs(elements), [
+            ('See ', None), ('setup', SETUP_URL), (' and ', None), ('site', 'https://example.com'),
+        ])
+
+    def test_links_to_replaced_documents_follow_the_new_document(self):
+        elements, changed = self.rewrite(
+            [run('setup', URL_PREFIX + 'doc_old#heading')],
+            by_old_doc={'doc_old': [('guide', GUIDE_URL), ('setup', SETUP_URL)]},
+        )
+        self.assertTrue(changed)
+        self.assertEqual(runs(elements), [('setup', SETUP_URL)])
+
+    def test_prose_mentioning_link_text_is_not_rewritten(self):
+        unmatched = [('setup', SETUP_URL)]
+        elements, changed = self.rewrite([run('Read the setup guide before starting.')], unmatched=unmatched)
+        self.assertFalse(changed)
+        self.assertEqual(unmatched, [('setup', SETUP_URL)])
+
+        elements, changed = self.rewrite([run('See '), run('setup'), run('.')], unmatched=unmatched)
+        self.assertTrue(changed)
+        self.assertEqual(runs(elements), [('See ', None), ('setup', SETUP_URL), ('.', None)])
+        self.assertEqual(unmatched, [])
+
+    def test_adjacent_styled_runs_form_one_link(self):
+        unmatched = [('the setup guide', SETUP_URL)]
+        elements, changed = self.rewrite(
+            [run('Read '), run('the '), run('setup', bold=True), run(' guide'), run(' first')], unmatched=unmatched,
+        )
+        self.assertTrue(changed)
+        self.assertEqual(runs(elements), [
+            ('Read ', None), ('the ', SETUP_URL), ('setup', SETUP_URL), (' guide', SETUP_URL), (' first', None),
+        ])
+        self.assertTrue(elements[2].text_run.text_element_style.bold)
+
+    def test_links_are_matched_in_document_order(self):
+        unmatched = [('guide', GUIDE_URL), ('setup', SETUP_URL)]
+        elements, _ = self.rewrite([run('setup'), run(' / '), run('guide'), run(' / '), run('setup')], unmatched=unmatched)
+        self.assertEqual(runs(elements), [
+            ('setup', None), (' / ', None), ('guide', GUIDE_URL), (' / ', None), ('setup', SETUP_URL),
+        ])
+
+    def test_already_rewritten_link_consumes_its_entry(self):
+        unmatched = [('setup', SETUP_URL), ('guide', GUIDE_URL)]
+        elements, changed = self.rewrite([run('setup', SETUP_URL), run(' '), run('guide')], unmatched=unmatched)
+        self.assertTrue(changed)
+        self.assertEqual(runs(elements), [('setup', SETUP_URL), (' ', None), ('guide', GUIDE_URL)])
+        self.assertEqual(unmatched, [])
+
+
+class MatchRunsTest(unittest.TestCase):
+    def test_requires_whole_text(self):
+        elements = [run('set'), run('up'), run(' now')]
+        self.assertEqual(LinkRewriter._match_runs(elements, 0, 'setup'), 2)
+        self.assertIsNone(LinkRewriter._match_runs(elements, 0, 'setup now please'))
+        self.assertIsNone(LinkRewriter._match_runs(elements, 1, 'setup'))
+
+    def test_leading_whitespace_run_is_not_part_of_link(self):
+        self.assertIsNone(LinkRewriter._match_runs([run(' '), run('setup')], 0, 'setup'))
+
+    def test_stops_at_linked_runs(self):
+        elements = [run('set'), run('up', 'https://example.com')]
+        self.assertIsNone(LinkRewriter._match_runs(elements, 0, 'setup'))
+
+
+if __name__ == '__main__':
+    unittest.main()
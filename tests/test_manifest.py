@@ -0,0 +1,92 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from src.manifest import Manifest
+
+
+class ManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp, 'state', 'manifest.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_old_schema_gains_engine_column(self):
+        os.makedirs(os.path.dirname(self.db_path))
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            """
+            CREATE TABLE documents (
+                rel_path TEXT PRIMARY KEY,
+                md_hash TEXT NOT NULL,
+                image_hashes TEXT NOT NULL,
+                doc_token TEXT,
+                folder_token TEXT,
+                updated_at REAL
+            )
+            """
+        )
+        conn.execute("INSERT INTO documents VALUES ('docs/old.md', 'h_old', '{}', 'doc_old', 'fld_1', 0)")
+        conn.commit()
+        conn.close()
+
+        manifest = Manifest(self.db_path)
+        old = manifest.get('docs/old.md')
+        self.assertEqual(old['doc_token'], 'doc_old')
+        self.assertIsNone(old['engine'])
+
+        manifest.record('docs/new.md', 'h_new', {}, 'doc_new', 'fld_1', engine='direct')
+        self.assertEqual(manifest.get('docs/new.md')['engine'], 'direct')
+        manifest.close()
+
+        # 再次打开已迁移的清单不会重复添加列
+        manifest = Manifest(self.db_path)
+        self.assertEqual(manifest.get('docs/new.md')['engine'], 'direct')
+        manifest.close()
+
+    def test_record_and_is_unchanged(self):
+        manifest = Manifest(self.db_path)
+        manifest.record(os.path.join('docs', 'a.md'), 'h1', {'img/a.png': 'i1'}, 'doc_a', 'fld_1', engine='import')
+
+        entry = manifest.get('docs/a.md')
+        self.assertEqual(entry['image_hashes'], {'img/a.png': 'i1'})
+        self.assertEqual(entry['engine'], 'import')
+        self.assertTrue(manifest.is_unchanged('docs/a.md', 'h1', {'img/a.png': 'i1'}))
+        self.assertFalse(manifest.is_unchanged('docs/a.md', 'h2', {'img/a.png': 'i1'}))
+        self.assertFalse(manifest.is_unchanged('docs/a.md', 'h1', {'img/a.png': 'i2'}))
+
+        # 上次导入失败(没有文档 token)的记录不算未变化
+        manifest.record('docs/b.md', 'h1', {}, None, 'fld_1')
+        self.assertFalse(manifest.is_unchanged('docs/b.md', 'h1', {}))
+
+        manifest.remove('docs/a.md')
+        self.assertIsNone(manifest.get('docs/a.md'))
+        manifest.close()
+
+    def test_image_blocks_are_replaced_per_document(self):
+        manifest = Manifest(self.db_path)
+        manifest.record_image_blocks('doc_a', {'blk_1': 'i1', 'blk_2': 'i2'})
+        manifest.record_image_blocks('doc_b', {'blk_9': 'i9'})
+        manifest.record_image_blocks('doc_a', {'blk_3': 'i3'})
+
+        self.assertEqual(manifest.image_blocks('doc_a'), {'blk_3': 'i3'})
+        self.assertEqual(manifest.image_blocks('doc_b'), {'blk_9': 'i9'})
+        manifest.remove_image_blocks('doc_a')
+        self.assertEqual(manifest.image_blocks('doc_a'), {})
+        manifest.close()
+
+    def test_document_parts_keep_order(self):
+        manifest = Manifest(self.db_path)
+        manifest.record_document_parts('doc_index', ['part_2', 'part_0', 'part_1'])
+        self.assertEqual(manifest.document_parts('doc_index'), ['part_2', 'part_0', 'part_1'])
+        manifest.remove_document_parts('doc_index')
+        self.assertEqual(manifest.document_parts('doc_index'), [])
+        manifest.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
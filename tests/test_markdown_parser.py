@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+
+from src.markdown_parser import PathCache, scan_image_refs
+
+
+class ScanImageRefsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        os.makedirs(os.path.join(self.dir, 'img'))
+        for name in ('a.png', 'b.png', '中文.png'):
+            open(os.path.join(self.dir, 'img', name), 'wb').close()
+        self.md_path = os.path.join(self.dir, 'doc.md')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def scan(self, content):
+        return scan_image_refs(self.md_path, content, PathCache())
+
+    def test_inline_images_in_document_order(self):
+        refs = self.scan('![one](img/a.png) text ![two](<img/b.png> "title")\n\n![three](img/missing.png)\n')
+        self.assertEqual([ref.src for ref in refs], ['img/a.png', 'img/b.png', 'img/missing.png'])
+        self.assertEqual([ref.kind for ref in refs], ['inline'] * 3)
+        self.assertEqual(refs[0].path, os.path.join(self.dir, 'img', 'a.png'))
+        self.assertIsNone(refs[2].path)
+        self.assertEqual([ref.line for ref in refs], [1, 1, 3])
+
+    def test_skips_fenced_code_blocks(self):
+        content = (
+            '![before](img/a.png)\n'
+            '```markdown\n'
+            '![inside](img/b.png)\n'
+            '```\n'
+            '~~~~\n'
+            '```\n'
+            '![still inside](img/b.png)\n'
+            '~~~~\n'
+            '![after](img/b.png)\n'
+        )
+        self.assertEqual([ref.alt for ref in self.scan(content)], ['before', 'after'])
+
+    def test_closing_fence_must_match_opening(self):
+        # 较短的围栏或带其他内容的行不能结束代码块
+        content = '````\n```\n![inside](img/a.png)\n```not a close\n````\n![after](img/b.png)\n'
+        self.assertEqual([ref.alt for ref in self.scan(content)], ['after'])
+
+    def test_unclosed_fence_hides_rest_of_document(self):
+        self.assertEqual(self.scan('```\n![inside](img/a.png)\n'), [])
+
+    def test_skips_inline_code_and_escapes(self):
+        content = 'use `![x](img/a.png)` or ``![y](img/a.png) ` tick`` and \\![z](img/a.png) ![ok](img/b.png)\n'
+        self.assertEqual([ref.alt for ref in self.scan(content)], ['ok'])
+
+    def test_unmatched_backtick_is_plain_text(self):
+        self.assertEqual([ref.alt for ref in self.scan('a ` b ![ok](img/a.png)\n')], ['ok'])
+
+    def test_reference_images(self):
+        content = (
+            '![full][logo] ![Collapsed][] ![shortcut] ![undefined][nope]\n'
+            '\n'
+            '[LOGO]: img/a.png "Logo"\n'
+            '[collapsed]: <img/b.png>\n'
+            '[shortcut]: img/missing.png\n'
+            '[logo]: img/b.png\n'
+        )
+        refs = self.scan(content)
+        self.assertEqual([(ref.kind, ref.alt, ref.src) for ref in refs], [
+            ('reference', 'full', 'img/a.png'),  # 标签大小写不敏感，重复定义以第一次为准
+            ('reference', 'Collapsed', 'img/b.png'),
+            ('reference', 'shortcut', 'img/missing.png'),
+        ])
+
+    def test_definitions_inside_fences_are_ignored(self):
+        content = '![x][id]\n\n```\n[id]: img/a.png\n```\n'
+        self.assertEqual(self.scan(content), [])
+
+    def test_html_img(self):
+        content = '<img src="img/a.png" width=10> <IMG alt=x src=\'img/b.png\'> <img src=img/missing.png>\n'
+        refs = self.scan(content)
+        self.assertEqual([(ref.kind, ref.src) for ref in refs], [
+            ('html', 'img/a.png'), ('html', 'img/b.png'), ('html', 'img/missing.png'),
+        ])
+
+    def test_remote_and_encoded_paths(self):
+        content = (
+            '![r](https://example.com/a.png) ![p](//cdn.example.com/b.png) '
+            '![c](img/%E4%B8%AD%E6%96%87.png) ![q](img/a.png?v=1#frag) ![w](C:/img/a.png)\n'
+        )
+        refs = self.scan(content)
+        self.assertEqual([ref.remote for ref in refs], [True, True, False, False, False])
+        self.assertIsNone(refs[0].path)
+        self.assertEqual(refs[2].path, os.path.join(self.dir, 'img', '中文.png'))
+        self.assertEqual(refs[3].path, os.path.join(self.dir, 'img', 'a.png'))
+
+    def test_alt_with_brackets_and_parentheses_in_src(self):
+        open(os.path.join(self.dir, 'img', 'c(1).png'), 'wb').close()
+        refs = self.scan('![see [fig]](img/c(1).png)\n')
+        self.assertEqual([(ref.alt, ref.src) for ref in refs], [('see [fig]', 'img/c(1).png')])
+        self.assertIsNotNone(refs[0].path)
+
+
+if __name__ == '__main__':
+    unittest.main()
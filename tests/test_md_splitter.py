@@ -0,0 +1,87 @@
+import unittest
+
+from src.md_splitter import split_markdown
+
+
+def section(title, level=1, paragraphs=3, width=40):
+    body = ''.join(f'{title} paragraph {i} ' + 'x' * width + '\n\n' for i in range(paragraphs))
+    return f'{"#" * level} {title}\n\n{body}'
+
+
+class SplitMarkdownTest(unittest.TestCase):
+    def test_no_limits_or_under_limits(self):
+        text = section('A') + section('B')
+        self.assertEqual(split_markdown(text), [])
+        self.assertEqual(split_markdown(text, max_bytes=len(text.encode('utf-8'))), [])
+        self.assertEqual(split_markdown(text, max_blocks=100), [])
+
+    def test_splits_at_headings_and_keeps_all_text(self):
+        text = section('A') + section('B') + section('C')
+        parts = split_markdown(text, max_blocks=5)
+        self.assertEqual([part.title for part in parts], ['A', 'B', 'C'])
+        self.assertEqual(''.join(part.text for part in parts), text)
+        for part in parts:
+            self.assertEqual(part.size, len(part.text.encode('utf-8')))
+            self.assertLessEqual(part.blocks, 5)
+
+    def test_merges_adjacent_sections_up_to_limit(self):
+        text = ''.join(section(name, paragraphs=1) for name in 'ABCDE')
+        parts = split_markdown(text, max_blocks=4)
+        self.assertEqual([part.title for part in parts], ['A', 'C', 'E'])
+        self.assertEqual([part.blocks for part in parts], [4, 4, 2])
+
+    def test_prefers_higher_level_headings(self):
+        text = section('A') + section('A.1', level=2) + section('B') + section('B.1', level=2)
+        parts = split_markdown(text, max_blocks=8)
+        self.assertEqual([part.title for part in parts], ['A', 'B'])
+
+    def test_falls_back_to_lower_level_headings(self):
+        text = section('A') + section('A.1', level=2) + section('A.2', level=2)
+        parts = split_markdown(text, max_blocks=5)
+        self.assertEqual([part.title for part in parts], ['A', 'A.1', 'A.2'])
+
+    def test_preamble_joins_first_section(self):
+        text = 'intro line\n\n' + section('A') + section('B')
+        parts = split_markdown(text, max_blocks=6)
+        self.assertTrue(parts[0].text.startswith('intro line'))
+        self.assertEqual(parts[0].title, 'A')
+
+    def test_headings_inside_fences_are_not_split_points(self):
+        code = '```\n' + ''.join(f'# not a heading {i}\n' for i in range(20)) + '```\n\n'
+        text = section('A', paragraphs=1) + code + section('B', paragraphs=1)
+        parts = split_markdown(text, max_blocks=4)
+        self.assertEqual([part.title for part in parts], ['A', 'B'])
+        self.assertIn(code, parts[0].text)
+
+    def test_unsplittable_document(self):
+        text = ''.join(f'line {i}\n\n' for i in range(50))
+        self.assertEqual(split_markdown(text, max_blocks=10), [])
+        # 只有一节时同样无法拆分
+        self.assertEqual(split_markdown('# Only\n\n' + text, max_blocks=10), [])
+
+    def test_reference_definitions_copied_to_every_part(self):
+        text = (
+            section('A', paragraphs=2) + '![logo][logo]\n\n'
+            + section('B', paragraphs=2) + '![icon][icon]\n\n'
+            + '[logo]: img/logo.png\n[icon]: img/icon.png\n'
+        )
+        parts = split_markdown(text, max_blocks=5)
+        self.assertEqual(len(parts), 2)
+        for part in parts:
+            self.assertIn('[logo]: img/logo.png\n', part.text)
+            self.assertIn('[icon]: img/icon.png\n', part.text)
+            self.assertEqual(part.text.count('[logo]: img/logo.png'), 1)
+
+    def test_byte_limit_counts_utf8(self):
+        text = '# 一\n\n' + '中' * 100 + '\n\n# 二\n\n' + '文' * 100 + '\n'
+        parts = split_markdown(text, max_bytes=400)
+        self.assertEqual([part.title for part in parts], ['一', '二'])
+        self.assertTrue(all(part.size <= 400 for part in parts))
+
+    def test_heading_title_strips_inline_markup(self):
+        parts = split_markdown(section('**Bold** `code`') + section('B'), max_blocks=5)
+        self.assertEqual(parts[0].title, 'Bold code')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+
+from src.markdown_parser import MarkdownParser
+from src.metrics import Metrics
+from src.migration_engine import MigrationEngine
+from tests.test_folder_tree import FakeDrive
+
+
+class FakeClient:
+    """只实现迁移引擎用到的接口，文档导入由 import_doc 协程函数决定"""
+
+    def __init__(self, import_doc=None):
+        self.metrics = Metrics()
+        self.cleanup_queue = None
+        self.remote_images = None
+        self.image_blocks = {}
+        self.document_parts = {}
+        self.import_doc = import_doc
+        self.imported = []
+
+    async def aimport_md_to_docx(self, file_path, file_name, parent_token, checkpoint=None):
+        if self.import_doc is not None:
+            await self.import_doc(file_path)
+        self.imported.append((file_path, parent_token))
+        return f'doc_{len(self.imported)}'
+
+
+class FakeFolderTree:
+    async def ensure(self, folder_path):
+        return 'fld_root'
+
+    async def materialize(self, folder_paths):
+        pass
+
+    async def evict_if_missing(self, folder_path):
+        return False
+
+
+class FolderClient(FakeDrive, FakeClient):
+    def __init__(self):
+        FakeDrive.__init__(self, delay=0.05)
+        FakeClient.__init__(self)
+
+
+def file_infos(count, folder='', consumed=None):
+    for i in range(count):
+        if consumed is not None:
+            consumed.append(i)
+        yield {'path': f'/md/{folder}/doc{i}.md', 'name': f'doc{i}', 'folder': folder}
+
+
+class MigrationEngineTest(unittest.TestCase):
+    def test_migrates_streamed_files(self):
+        client = FakeClient()
+        engine = MigrationEngine(client, 'fld_root', concurrency=3, folder_tree=FakeFolderTree())
+        result = asyncio.run(engine.run(file_infos(10)))
+        self.assertEqual(len(result['succeeded']), 10)
+        self.assertEqual(result['failed'], [])
+
+    def test_failed_document_does_not_stop_others(self):
+        async def import_doc(file_path):
+            if file_path.endswith('doc3.md'):
+                raise Exception('boom')
+
+        engine = MigrationEngine(FakeClient(import_doc), 'fld_root', concurrency=2, folder_tree=FakeFolderTree())
+        result = asyncio.run(engine.run(file_infos(6)))
+        self.assertEqual(len(result['succeeded']), 5)
+        self.assertEqual([(path.rsplit('/', 1)[1], error) for path, error in result['failed']], [('doc3.md', 'boom')])
+
+    def test_cancelled_run_stops_discovery_thread(self):
+        # 文档迁移卡住、队列已满时取消运行，发现线程必须退出，否则 asyncio.run 关闭线程池时一直等待
+        consumed = []
+
+        async def import_doc(file_path):
+            await asyncio.Event().wait()
+
+        async def main():
+            engine = MigrationEngine(FakeClient(import_doc), 'fld_root', concurrency=1, folder_tree=FakeFolderTree())
+            task = asyncio.ensure_future(engine.run(file_infos(1000, consumed=consumed)))
+            await asyncio.sleep(0.3)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        runner = threading.Thread(target=asyncio.run, args=(main(),), daemon=True)
+        runner.start()
+        runner.join(timeout=10)
+        self.assertFalse(runner.is_alive())
+        self.assertLess(len(consumed), 10)
+
+    def test_streamed_discovery_creates_sibling_folders_concurrently(self):
+        # 与 main.py 相同，传入的是 iter_markdown_files() 生成器
+        with tempfile.TemporaryDirectory() as md_dir:
+            for i in range(8):
+                os.makedirs(os.path.join(md_dir, 'docs', f'part{i}'))
+                open(os.path.join(md_dir, 'docs', f'part{i}', 'index.md'), 'w').close()
+            client = FolderClient()
+            engine = MigrationEngine(client, 'fld_root', concurrency=2)
+            result = asyncio.run(engine.run(MarkdownParser(md_dir).iter_markdown_files()))
+
+        self.assertEqual(len(result['succeeded']), 8)
+        self.assertEqual(sorted(client.created), ['docs'] + [f'part{i}' for i in range(8)])
+        # 文件夹在发现目录时即在后台创建，并发数超过同时迁移的文档数
+        self.assertGreater(client.max_in_flight, engine.concurrency)
+        parents = {parent for _, parent in client.imported}
+        self.assertEqual(len(parents), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
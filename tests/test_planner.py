@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from src.markdown_parser import MarkdownParser
+from src.planner import MigrationPlan
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class MigrationPlanTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel_path, content):
+        path = os.path.join(self.dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        mode = 'wb' if isinstance(content, bytes) else 'w'
+        with open(path, mode) as f:
+            f.write(content)
+
+    def plan(self, **kwargs):
+        return MigrationPlan(MarkdownParser(self.dir), **kwargs).build().summary()
+
+    def test_counts_documents_folders_and_images(self):
+        self.write('a.md', '# A\n\n![x](img/x.png) ![gone](img/missing.png) ![r](https://example.com/r.png)\n')
+        self.write('img/x.png', b'0' * 1000)
+        self.write('guide/setup/b.md', '# B\n\n```\n![in code](img/x.png)\n```\n')
+        self.write('guide/c.md', '# C\n')
+        summary = self.plan()
+        self.assertEqual(summary['documents'], 3)
+        self.assertEqual(summary['folders_to_create'], 2)
+        self.assertEqual((summary['images'], summary['missing_images'], summary['remote_images']), (2, 1, 1))
+        # 三个文档各上传一次 md，再加一张本地图片和一张远程图片
+        self.assertEqual(summary['api_calls']['drive.upload'], 5)
+        self.assertEqual(summary['api_calls']['drive.folder'], 2)
+        self.assertEqual(summary['api_calls']['drive.list'], 1)
+
+    def test_known_folders_are_not_created(self):
+        self.write(os.path.join('guide', 'setup', 'b.md'), '# B\n')
+        summary = self.plan(folder_mapping={'guide': 'fld_guide'})
+        self.assertEqual(summary['folders_to_create'], 1)
+
+    def test_split_documents(self):
+        self.write('big.md', ''.join(f'# Part {i}\n\n' + 'text\n\n' * 20 for i in range(5)))
+        summary = self.plan(split_max_blocks=30)
+        self.assertEqual((summary['split_documents'], summary['split_parts']), (1, 5))
+        self.assertEqual(summary['api_calls']['drive.import_task'], 5 * 4)
+
+    def test_direct_engine_does_not_upload_markdown(self):
+        self.write('a.md', 'one\n\ntwo\n')
+        summary = self.plan(docx_engine='direct')
+        self.assertNotIn('drive.upload', summary['api_calls'])
+        self.assertEqual(summary['upload_bytes'], 0)
+
+    def test_plan_path_does_not_load_sdk(self):
+        # 解析与规划相关的模块不加载 lark_oapi(导入约 1 秒)
+        code = (
+            'import sys\n'
+            'import src.planner, src.docx_writer, src.link_rewriter, src.md_splitter\n'
+            'src.docx_writer.parse_markdown("# a\\n\\n- b\\n")\n'
+            'print("lark_oapi" in sys.modules)\n'
+        )
+        out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.strip(), 'False')
+
+
+if __name__ == '__main__':
+    unittest.main()
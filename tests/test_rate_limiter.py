@@ -0,0 +1,115 @@
+import asyncio
+import time
+import unittest
+
+from src.rate_limiter import (
+    RateLimiter,
+    TokenBucket,
+    get_retry_after,
+    is_rate_limited,
+    parse_rate_limits,
+)
+
+
+class FakeRaw:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeResponse:
+    def __init__(self, code=0, status_code=200, headers=None):
+        self.code = code
+        self.raw = FakeRaw(status_code, headers)
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_burst_then_queue_in_arrival_order(self):
+        bucket = TokenBucket(rate=2, capacity=2)
+        now = bucket.updated
+        waits = [bucket.reserve(now) for _ in range(5)]
+        self.assertEqual(waits, [0.0, 0.0, 0.5, 1.0, 1.5])
+
+    def test_refills_over_time_up_to_capacity(self):
+        bucket = TokenBucket(rate=2, capacity=2)
+        now = bucket.updated
+        for _ in range(2):
+            bucket.reserve(now)
+        self.assertEqual(bucket.reserve(now + 0.5), 0.0)
+        self.assertEqual([bucket.reserve(now + 100) for _ in range(3)], [0.0, 0.0, 0.5])
+
+    def test_penalized_waiters_are_spaced_after_block(self):
+        bucket = TokenBucket(rate=4, capacity=4)
+        now = bucket.updated
+        bucket.block(now, 2.0)
+        waits = [bucket.reserve(now + 0.5) for _ in range(4)]
+        # 暂停结束时只放行一个，其余按 1/rate 间隔依次放行
+        self.assertEqual(waits, [1.5, 1.75, 2.0, 2.25])
+
+    def test_block_extends_but_never_shortens(self):
+        bucket = TokenBucket(rate=1)
+        now = bucket.updated
+        bucket.block(now, 5.0)
+        bucket.block(now + 1, 1.0)
+        self.assertEqual(bucket.reserve(now + 1), 4.0)
+
+    def test_tokens_refill_only_after_block_ends(self):
+        bucket = TokenBucket(rate=2, capacity=2)
+        now = bucket.updated
+        bucket.block(now, 1.0)
+        self.assertEqual([bucket.reserve(now + 3.0) for _ in range(3)], [0.0, 0.0, 0.5])
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_penalize_only_affects_that_endpoint(self):
+        limiter = RateLimiter({'docx.block': 100, 'drive.upload': 100}, base_delay=0.2, max_delay=0.2)
+
+        async def main():
+            await limiter.aacquire('docx.block')
+            await limiter.aacquire('drive.upload')
+            delay = limiter.penalize('docx.block', attempt=0)
+            start = time.monotonic()
+            await limiter.aacquire('drive.upload')
+            upload_wait = time.monotonic() - start
+            await limiter.aacquire('docx.block')
+            return delay, upload_wait, time.monotonic() - start
+
+        delay, upload_wait, block_wait = asyncio.run(main())
+        self.assertLess(upload_wait, 0.05)
+        self.assertGreaterEqual(block_wait, delay - 0.02)
+
+    def test_backoff_delay(self):
+        limiter = RateLimiter(base_delay=1.0, max_delay=8.0)
+        for attempt in range(6):
+            delay = limiter.backoff_delay(attempt)
+            cap = min(8.0, 2 ** attempt)
+            self.assertTrue(cap / 2 <= delay <= cap, (attempt, delay))
+        self.assertTrue(3.0 <= limiter.backoff_delay(0, retry_after=3.0) <= 4.0)
+
+    def test_unknown_endpoint_uses_default(self):
+        limiter = RateLimiter({'default': 7})
+        limiter.acquire('some.endpoint')
+        self.assertEqual(limiter._buckets['some.endpoint'].rate, 7)
+
+
+class HelpersTest(unittest.TestCase):
+    def test_parse_rate_limits(self):
+        self.assertEqual(parse_rate_limits(' drive.upload=5, docx.block=2.5,bad,'), {'drive.upload': 5.0, 'docx.block': 2.5})
+        self.assertEqual(parse_rate_limits(''), {})
+        self.assertEqual(parse_rate_limits(None), {})
+
+    def test_is_rate_limited(self):
+        self.assertTrue(is_rate_limited(FakeResponse(code=99991400)))
+        self.assertTrue(is_rate_limited(FakeResponse(code=1061045)))
+        self.assertTrue(is_rate_limited(FakeResponse(code=1, status_code=429)))
+        self.assertFalse(is_rate_limited(FakeResponse(code=1, status_code=500)))
+
+    def test_get_retry_after(self):
+        self.assertEqual(get_retry_after(FakeResponse(headers={'x-ogw-ratelimit-reset': '3'})), 3.0)
+        self.assertEqual(get_retry_after(FakeResponse(headers={'retry-after': '1.5'})), 1.5)
+        self.assertIsNone(get_retry_after(FakeResponse(headers={'Retry-After': 'soon'})))
+        self.assertIsNone(get_retry_after(FakeResponse()))
+
+
+if __name__ == '__main__':
+    unittest.main()
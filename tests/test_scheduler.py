@@ -0,0 +1,132 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from src.migration_engine import MigrationEngine
+from src.scheduler import SKIP_COST, CostModel
+from tests.test_migration_engine import FakeClient, FakeFolderTree
+
+
+def features(md_bytes, images=0, image_bytes=0, mtime_ns=1):
+    return {'md_bytes': md_bytes, 'images': images, 'image_bytes': image_bytes, 'mtime_ns': mtime_ns}
+
+
+class CostModelTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'state', 'costs.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_larger_documents_cost_more(self):
+        model = CostModel()
+        small = model.estimate('a.md', features(1024))
+        self.assertLess(small, model.estimate('b.md', features(100 * 1024)))
+        self.assertLess(small, model.estimate('c.md', features(1024, images=5, image_bytes=10 * 1024 * 1024)))
+
+    def test_features_count_local_image_bytes(self):
+        with open(os.path.join(self.tmp, 'a.png'), 'wb') as f:
+            f.write(b'\0' * 3000)
+        md_path = os.path.join(self.tmp, 'a.md')
+        with open(md_path, 'w', encoding='utf-8') as f:
+            f.write('# A\n\n![](a.png)\n\n![](https://example.com/b.png)\n')
+
+        result = CostModel.features(md_path)
+        self.assertEqual(result['md_bytes'], os.path.getsize(md_path))
+        self.assertEqual(result['images'], 2)
+        self.assertEqual(result['image_bytes'], 3000)
+
+    def test_save_calibrates_scale_and_history(self):
+        model = CostModel(self.path)
+        base = CostModel.base_cost(features(10 * 1024))
+        model.observe(os.path.join('docs', 'a.md'), features(10 * 1024), base * 3)
+        model.save()
+
+        reloaded = CostModel(self.path)
+        self.assertAlmostEqual(reloaded.scale, 3.0, places=3)
+        # 未迁移过的文档按校准系数估算
+        self.assertAlmostEqual(reloaded.estimate('new.md', features(10 * 1024)), base * 3, places=2)
+        # 迁移过的文档按规模变化换算上次的实际耗时
+        doubled = features(20 * 1024, mtime_ns=2)
+        expected = base * 3 * CostModel.base_cost(doubled) / base
+        self.assertAlmostEqual(reloaded.estimate('docs/a.md', doubled), expected, places=2)
+
+    def test_scale_is_smoothed_across_runs(self):
+        model = CostModel(self.path)
+        base = CostModel.base_cost(features(1024))
+        model.observe('a.md', features(1024), base * 2)
+        model.save()
+        model.observe('a.md', features(1024), base * 4)
+        model.save()
+        self.assertAlmostEqual(CostModel(self.path).scale, 3.0, places=3)
+
+    def test_unchanged_documents_are_cheap_in_incremental_mode(self):
+        model = CostModel()
+        model.observe('a.md', features(1024, mtime_ns=5), 10.0)
+        model.save()
+        self.assertEqual(model.estimate('a.md', features(1024, mtime_ns=5), incremental=True), SKIP_COST)
+        self.assertAlmostEqual(model.estimate('a.md', features(1024, mtime_ns=5)), 10.0)
+        self.assertGreater(model.estimate('a.md', features(1024, mtime_ns=6), incremental=True), SKIP_COST)
+
+    def test_corrupt_history_falls_back_to_default_model(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('{not json')
+        model = CostModel(self.path)
+        self.assertIsNone(model.scale)
+        self.assertEqual(model.estimate('a.md', features(1024)), CostModel.base_cost(features(1024)))
+
+
+class CostOrderedDispatchTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.files = []
+        for name, size in (('small', 1), ('large', 200), ('medium', 50), ('tiny', 0), ('huge', 400)):
+            path = os.path.join(self.tmp, f'{name}.md')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('# title\n\n' + 'x' * size * 1024)
+            self.files.append({'path': path, 'name': name, 'folder': ''})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def migration_order(self, schedule_window, wait_for_discovery=True):
+        discovered = threading.Event()
+
+        def file_infos():
+            yield from self.files
+            discovered.set()
+
+        async def import_doc(file_path):
+            # 第一个文档迁移期间等待遍历结束，之后从窗口内的全部文档中挑选
+            if wait_for_discovery:
+                await asyncio.get_running_loop().run_in_executor(None, discovered.wait, 5)
+
+        client = FakeClient(import_doc)
+        engine = MigrationEngine(
+            client, 'fld_root', concurrency=1, folder_tree=FakeFolderTree(),
+            cost_model=CostModel(), schedule_window=schedule_window,
+        )
+        result = asyncio.run(engine.run(file_infos()))
+        self.assertEqual(len(result['succeeded']), len(self.files))
+        self.assertEqual(set(engine.cost_model._observed), {f"{info['name']}.md" for info in self.files})
+        return [os.path.splitext(os.path.basename(path))[0] for path, _ in client.imported]
+
+    def test_longest_documents_are_dispatched_first(self):
+        order = self.migration_order(schedule_window=10)
+        # 第一个文档在其余文档被发现前即已派发，其余的按预计耗时从长到短
+        by_size = [name for name in ('huge', 'large', 'medium', 'small', 'tiny') if name != order[0]]
+        self.assertEqual(order[1:], by_size)
+
+    def test_window_bounds_how_far_discovery_runs_ahead(self):
+        # 窗口只能容纳一个文档时，只能按发现顺序派发
+        self.assertEqual(self.migration_order(schedule_window=1, wait_for_discovery=False), ['small', 'large', 'medium', 'tiny', 'huge'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import multiprocessing
+import os
+import stat
+import tempfile
+import threading
+import time
+import unittest
+
+from src.token_manager import TenantTokenManager
+
+
+class Fetcher:
+    def __init__(self, expire=7200, delay=0.0):
+        self.expire = expire
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        time.sleep(self.delay)
+        return f't-{calls}', self.expire
+
+
+def _refresh_repeatedly(cache_path, rounds):
+    manager = TenantTokenManager('app', lambda: (f't-{os.getpid()}', 7200), cache_path)
+    for _ in range(rounds):
+        manager.invalidate()
+        manager.get()
+
+
+class TenantTokenManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp.name, 'state', 'token.json')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_caches_in_memory(self):
+        fetch = Fetcher()
+        manager = TenantTokenManager('app', fetch)
+        self.assertEqual(manager.get(), 't-1')
+        self.assertEqual(manager.get(), 't-1')
+        self.assertEqual(fetch.calls, 1)
+
+    def test_disk_cache_is_reused_by_next_process(self):
+        TenantTokenManager('app', Fetcher(), self.cache_path).get()
+        if os.name == 'posix':
+            self.assertEqual(stat.S_IMODE(os.stat(self.cache_path).st_mode), 0o600)
+        fetch = Fetcher()
+        self.assertEqual(TenantTokenManager('app', fetch, self.cache_path).get(), 't-1')
+        self.assertEqual(fetch.calls, 0)
+        self.assertEqual(os.listdir(os.path.dirname(self.cache_path)), ['token.json'])
+
+    def test_disk_cache_is_per_app_and_expires(self):
+        TenantTokenManager('app', Fetcher(), self.cache_path).get()
+        fetch = Fetcher()
+        TenantTokenManager('other', fetch, self.cache_path).get()
+        self.assertEqual(fetch.calls, 1)
+
+        # 已进入提前刷新窗口的缓存令牌不再使用
+        TenantTokenManager('app', Fetcher(expire=100), self.cache_path, refresh_margin=300).get()
+        fetch = Fetcher()
+        TenantTokenManager('app', fetch, self.cache_path, refresh_margin=300).get()
+        self.assertEqual(fetch.calls, 0)  # 有效期 100 秒时提前量只取一半
+
+    def test_corrupt_cache_is_ignored(self):
+        os.makedirs(os.path.dirname(self.cache_path))
+        with open(self.cache_path, 'w') as f:
+            f.write('{not json')
+        fetch = Fetcher()
+        self.assertEqual(TenantTokenManager('app', fetch, self.cache_path).get(), 't-1')
+        self.assertEqual(fetch.calls, 1)
+
+    def test_short_lived_token_is_not_refreshed_on_every_get(self):
+        fetch = Fetcher(expire=60)
+        manager = TenantTokenManager('app', fetch, refresh_margin=300)
+        for _ in range(5):
+            manager.get()
+        self.assertEqual(fetch.calls, 1)
+
+    def test_invalidate_only_drops_the_rejected_token(self):
+        fetch = Fetcher()
+        manager = TenantTokenManager('app', fetch)
+        manager.get()
+        manager.invalidate('t-old')
+        self.assertEqual(manager.get(), 't-1')
+        manager.invalidate('t-1')
+        self.assertEqual(manager.get(), 't-2')
+
+    def test_concurrent_gets_share_one_refresh(self):
+        fetch = Fetcher(delay=0.1)
+        manager = TenantTokenManager('app', fetch)
+        threads = [threading.Thread(target=manager.get) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(fetch.calls, 1)
+
+    def test_failed_cache_write_still_returns_token(self):
+        blocker = os.path.join(self.tmp.name, 'file')
+        open(blocker, 'w').close()
+        manager = TenantTokenManager('app', Fetcher(), os.path.join(blocker, 'token.json'))
+        self.assertEqual(manager.get(), 't-1')
+
+    def test_processes_sharing_cache_refresh_concurrently(self):
+        context = multiprocessing.get_context('fork' if os.name == 'posix' else 'spawn')
+        processes = [context.Process(target=_refresh_repeatedly, args=(self.cache_path, 10)) for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(timeout=60)
+        self.assertEqual([process.exitcode for process in processes], [0] * 4)
+        self.assertTrue(TenantTokenManager('app', Fetcher(), self.cache_path).get().startswith('t-'))
+
+
+if __name__ == '__main__':
+    unittest.main()